@@ -0,0 +1,200 @@
+import os
+import time
+import warnings
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from statsmodels.tsa.adfvalues import mackinnonp
+from statsmodels.tsa.stattools import adfuller
+
+# ── 컬럼 묶음 단위 ADF 검정 (statsmodels adfuller(regression='c', autolag='AIC')와 같은 결정) ──
+# 컬럼마다 maxlag 설계행렬 [상수, 수준, Δ시차 1..maxlag | Δx]를 한 번 만들고 컬럼 묶음을 배치 QR(R만)로 풉니다.
+# 시차 선택에 필요한 1..maxlag 중첩 회귀의 SSR은 모두 같은 QR의 Qᵀy 꼬리 제곱합으로 얻어
+# (statsmodels는 시차마다 OLS를 다시 적합) AIC 최소 시차를 고른 뒤, 그 시차로 한 번 더 회귀해 t 통계량을 구합니다.
+# 랭크 부족(이산 피처 등) 컬럼은 statsmodels adfuller로 되돌아갑니다.
+
+ADF_BLOCK_SIZE = 8 # 배치 QR 한 번에 묶는 컬럼 수 (3년치 1h 기준 묶음당 수백 MB 이하)
+RANK_TOL = 1e-10
+
+
+def _adf_maxlag(n: int) -> int:
+    """statsmodels 기본 maxlag (Schwert 1989, regression='c')"""
+    maxlag = int(np.ceil(12.0 * np.power(n / 100.0, 1 / 4.0)))
+    return min(n // 2 - 1 - 1, maxlag)
+
+
+def _design(values: np.ndarray, dx: np.ndarray, lag: int, level_last: bool) -> np.ndarray:
+    """
+    (C, nobs, lag+3) 확장 행렬 [X | y]. X 열 순서: 상수, [수준], Δ시차 1..lag, [수준] / y = Δx
+    """
+    n, c = values.shape
+    nobs = n - 1 - lag
+    A = np.empty((c, nobs, lag + 3))
+    A[:, :, 0] = 1.0
+    level_col = lag + 1 if level_last else 1
+    A[:, :, level_col] = values[lag:lag + nobs].T
+    first_lag = 1 if level_last else 2
+    for j in range(1, lag + 1):
+        A[:, :, first_lag + j - 1] = dx[lag - j:lag - j + nobs].T
+    A[:, :, -1] = dx[lag:].T
+    return A
+
+
+def _qr_fit(A: np.ndarray):
+    """
+    확장 행렬 [X | y]의 배치 QR (R만 계산, Q는 만들지 않음)
+    → (Qᵀy, 전체 모형 SSR, X의 R 대각, 랭크 부족 여부)
+    """
+    R = np.linalg.qr(A, mode='r')
+    k = A.shape[2] - 1
+    diag = np.diagonal(R, axis1=1, axis2=2)[:, :k]
+    scale = np.abs(diag)
+    deficient = (scale <= RANK_TOL * np.maximum(scale.max(axis=1, keepdims=True), 1e-300)).any(axis=1)
+    return R[:, :k, k], R[:, k, k] ** 2, diag, deficient
+
+
+def _adf_block(values: np.ndarray) -> list:
+    """
+    길이가 같은 컬럼 묶음 (n, C)의 ADF 결과 [(adf_stat, p_value, used_lag), ...]
+    실패한 컬럼은 (nan, nan, -1) (호출 측에서 기존 except 분기와 같이 처리)
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n, c = values.shape
+    maxlag = _adf_maxlag(n)
+    results = [None] * c
+    if maxlag < 0:
+        return [(np.nan, np.nan, -1)] * c
+    dx = np.diff(values, axis=0)
+
+    # 1) maxlag 설계행렬 QR 한 번 → 시차 k(열 수)별 중첩 SSR = 전체 SSR + Σ_{j>=k} (Qᵀy)_j²
+    with np.errstate(divide='ignore', invalid='ignore'):
+        A = _design(values, dx, maxlag, level_last=False)
+        qty, ssr_full, _, deficient = _qr_fit(A)
+        nobs = A.shape[1]
+        tail = np.cumsum((qty * qty)[:, ::-1], axis=1)[:, ::-1] # tail[:, k] = Σ_{j>=k}
+        ks = np.arange(2, maxlag + 3) # 상수+수준 이후 시차 0..maxlag
+        ssr_k = ssr_full[:, None] + np.append(tail, np.zeros((c, 1)), axis=1)[:, ks]
+        aic = nobs * np.log(ssr_k / nobs) + 2 * ks # 상수항(nobs·log2π + nobs)은 비교에 영향 없음
+        used_lags = np.argmin(aic, axis=1) # 동률이면 작은 시차 (statsmodels min((aic, k)))
+    del A
+
+    # 2) 선택 시차별로 다시 회귀 (수준 열을 마지막에 두면 t = sign(R_KK)·(Qᵀy)_K / s)
+    for lag in np.unique(used_lags[~deficient]):
+        cols = np.flatnonzero((used_lags == lag) & ~deficient)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            A = _design(values[:, cols], dx[:, cols], int(lag), level_last=True)
+            qty, ssr, diag, bad = _qr_fit(A)
+            dof = A.shape[1] - (A.shape[2] - 1)
+            stats = np.sign(diag[:, -1]) * qty[:, -1] / np.sqrt(ssr / dof)
+        for k, col in enumerate(cols):
+            if bad[k] or not np.isfinite(stats[k]):
+                continue
+            results[col] = (float(stats[k]), float(mackinnonp(stats[k], regression='c', N=1)), int(lag))
+
+    # 3) 랭크 부족/수치 실패 컬럼은 statsmodels로 계산
+    for col in range(c):
+        if results[col] is not None:
+            continue
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                stat, p_value, used_lag = adfuller(values[:, col])[:3]
+            results[col] = (float(stat), float(p_value), int(used_lag))
+        except Exception:
+            results[col] = (np.nan, np.nan, -1)
+    return results
+
+
+def adf_test_columns(df: pd.DataFrame, columns=None, workers: int = None,
+                     block_size: int = ADF_BLOCK_SIZE) -> pd.DataFrame:
+    """
+    여러 컬럼의 ADF 검정을 묶음 단위로 계산 (컬럼별 NaN 제거 후 길이가 같은 컬럼끼리 묶음)
+    - workers: 프로세스 수 (None이면 CPU 수, 1이면 현재 프로세스에서 계산)
+    반환: index=컬럼, columns=['adf_stat', 'p_value', 'used_lag'] (실패 컬럼은 NaN)
+    """
+    columns = list(df.columns if columns is None else columns)
+    series = {col: df[col].dropna().to_numpy(dtype=np.float64) for col in columns}
+    by_len = {}
+    for col in columns:
+        by_len.setdefault(len(series[col]), []).append(col)
+    blocks = []
+    for cols in by_len.values():
+        for i in range(0, len(cols), block_size):
+            chunk = cols[i:i + block_size]
+            blocks.append((chunk, np.column_stack([series[col] for col in chunk])))
+
+    workers = os.cpu_count() if workers is None else workers
+    workers = max(1, min(workers, len(blocks)))
+    if workers == 1:
+        outputs = [_adf_block(values) for _, values in blocks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            outputs = list(pool.map(_adf_block, [values for _, values in blocks]))
+
+    rows = {}
+    for (cols, _), out in zip(blocks, outputs):
+        rows.update(zip(cols, out))
+    return pd.DataFrame([rows[col] for col in columns], index=columns, columns=['adf_stat', 'p_value', 'used_lag'])
+
+
+def check_against_statsmodels(df: pd.DataFrame, columns=None, significance: float = 0.05,
+                              p_tol: float = 1e-6) -> pd.DataFrame:
+    """
+    adf_test_columns와 컬럼별 statsmodels adfuller 비교 (통계량/p-value/선택 시차, 유의수준 판정)
+    판정이 다르거나 p-value 차이가 p_tol을 넘으면 AssertionError
+    """
+    ours = adf_test_columns(df, columns, workers=1)
+    ref = {}
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        for col in ours.index:
+            stat, p_value, used_lag = adfuller(df[col].dropna().to_numpy(dtype=np.float64))[:3]
+            ref[col] = (stat, p_value, used_lag)
+    ref = pd.DataFrame.from_dict(ref, orient='index', columns=['adf_stat', 'p_value', 'used_lag'])
+    report = pd.DataFrame({
+        'p_diff': (ours['p_value'] - ref['p_value']).abs(),
+        'stat_diff': (ours['adf_stat'] - ref['adf_stat']).abs(),
+        'lag_match': ours['used_lag'] == ref['used_lag'],
+        'decision_match': (ours['p_value'] > significance) == (ref['p_value'] > significance),
+    })
+    print(f"🧪 ADF 비교: {len(report)}컬럼 | 판정 일치 {int(report['decision_match'].sum())}/{len(report)} | "
+          f"시차 일치 {int(report['lag_match'].sum())}/{len(report)} | 최대 p 차이 {report['p_diff'].max():.2e}")
+    bad = report[~report['decision_match'] | (report['p_diff'] > p_tol)]
+    assert bad.empty, f"statsmodels와 다른 컬럼: {bad.to_dict('index')}"
+    return report
+
+
+def _feature_frame(n_bars: int) -> pd.DataFrame:
+    """벤치마크용: 랜덤 워크 봉으로 만든 build_features 결과의 숫자 컬럼"""
+    from indicators_np import random_walk_bars
+    from feature_engineering import build_features
+    feats = build_features(random_walk_bars(n_bars))
+    numeric = feats.select_dtypes(include=[np.number])
+    return numeric.loc[:, numeric.nunique() > 1]
+
+
+def benchmark(n_bars: int = 3 * 365 * 24, workers: int = None):
+    """3년치 1h 피처 전체에서 기존 컬럼별 adfuller 루프와 비교"""
+    df = _feature_frame(n_bars)
+    t0 = time.time()
+    ours = adf_test_columns(df, workers=workers)
+    t_ours = time.time() - t0
+
+    t0 = time.time()
+    ref = {}
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        for col in df.columns:
+            ref[col] = adfuller(df[col].dropna())[1]
+    t_sm = time.time() - t0
+    match = int(((ours['p_value'] > 0.05) == (pd.Series(ref) > 0.05)).sum())
+    print(f"⏱️ [{len(df):,}행 x {df.shape[1]}컬럼] 배치 ADF {t_ours:.2f}초 (프로세스 {workers or os.cpu_count()}) | "
+          f"statsmodels 루프 {t_sm:.2f}초 | {t_sm / t_ours:.1f}배 | 판정 일치 {match}/{df.shape[1]}")
+
+
+if __name__ == "__main__":
+    import sys
+    if "--bench" in sys.argv:
+        benchmark()
+    else:
+        check_against_statsmodels(_feature_frame(3000))
@@ -0,0 +1,227 @@
+import os
+import json
+import time
+import shutil
+import threading
+import requests
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from binance.helpers import interval_to_milliseconds, date_to_milliseconds
+from ohlcv_store import OHLCVStore, DATA_DIR
+from data_sync import _format_klines
+from binance_pool import get_session
+
+SPOT_BASE_URL = "https://api.binance.com"
+FUTURES_BASE_URL = "https://fapi.binance.com"
+KLINES_LIMIT = 1000 # 요청 1회당 최대 봉 수
+
+# 요청 가중치 (limit=1000 기준) 및 분당 한도 - 실제 한도보다 보수적으로 설정
+SPOT_KLINES_WEIGHT = 2
+FUTURES_KLINES_WEIGHT = 5
+DEFAULT_WEIGHT_LIMIT = 1200
+
+
+class WeightLimiter:
+    """
+    분당 요청 가중치 제한기 (스레드 안전)
+    - 로컬에서 사용량을 누적하고, 서버 응답의 X-MBX-USED-WEIGHT-1M 값으로 보정합니다.
+    """
+
+    def __init__(self, weight_limit: int = DEFAULT_WEIGHT_LIMIT):
+        self.weight_limit = weight_limit
+        self._lock = threading.Lock()
+        self._minute = None
+        self._used = 0
+
+    def _roll(self):
+        minute = int(time.time() // 60)
+        if minute != self._minute:
+            self._minute, self._used = minute, 0
+
+    def acquire(self, weight: int):
+        while True:
+            with self._lock:
+                self._roll()
+                if self._used + weight <= self.weight_limit:
+                    self._used += weight
+                    return
+                wait = 60 - time.time() % 60
+            time.sleep(min(wait, 1.0) + 0.01)
+
+    def update_from_server(self, used_weight):
+        if used_weight is None:
+            return
+        with self._lock:
+            self._roll()
+            self._used = max(self._used, int(used_weight))
+
+
+def _kline_endpoint(symbol: str, spot_base_url: str, futures_base_url: str):
+    """data_sync와 동일한 규칙: 심볼에 'USD'가 있으면 선물 K-라인"""
+    if 'USD' in symbol:
+        return futures_base_url + "/fapi/v1/klines", FUTURES_KLINES_WEIGHT
+    return spot_base_url + "/api/v3/klines", SPOT_KLINES_WEIGHT
+
+
+class ParallelBackfill:
+    """
+    여러 심볼/인터벌의 과거 K-라인을 시간 청크로 나누어 병렬 수집합니다.
+    - 청크는 완료되는 순서대로 작업 폴더에 개별 Parquet 파일로 저장 (순서 무관)
+    - 작업 폴더에 남은 청크 파일이 체크포인트 역할을 하므로, 중단 후 재실행 시 남은 청크만 수집
+    - 모든 청크가 모이면 순서대로 이어 붙여 OHLCVStore에 반영하고 작업 폴더를 정리
+    """
+
+    def __init__(self, store: OHLCVStore = None, max_workers: int = 8,
+                 weight_limit: int = DEFAULT_WEIGHT_LIMIT, max_retries: int = 3,
+                 spot_base_url: str = SPOT_BASE_URL, futures_base_url: str = FUTURES_BASE_URL,
+                 session: requests.Session = None):
+        self.store = store or OHLCVStore(DATA_DIR)
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.limiter = WeightLimiter(weight_limit)
+        self.spot_base_url = spot_base_url
+        self.futures_base_url = futures_base_url
+        self.session = session or get_session() # 프로세스 공유 keep-alive 세션
+        self.request_count = 0
+        self._count_lock = threading.Lock()
+
+    def work_dir(self, symbol: str, interval: str) -> str:
+        return os.path.join(self.store.root, "_backfill", f"{symbol}_{interval}")
+
+    def _plan_chunks(self, interval: str, start_ms: int, end_ms: int) -> list:
+        step = interval_to_milliseconds(interval)
+        span = step * KLINES_LIMIT
+        first = start_ms - start_ms % step
+        return [(s, min(s + span, end_ms + 1) - 1) for s in range(first, end_ms + 1, span)]
+
+    def _prepare_work_dir(self, symbol: str, interval: str, start_ms: int, end_ms: int, restart: bool = False):
+        """
+        작업 폴더와 manifest 준비
+        미완료 작업이 남아 있으면 (restart=False일 때) 그 작업의 원래 구간으로 이어서 진행합니다.
+        반환값: (work_dir, start_ms, end_ms)
+        """
+        work_dir = self.work_dir(symbol, interval)
+        manifest_path = os.path.join(work_dir, "manifest.json")
+        if os.path.exists(manifest_path):
+            if not restart:
+                with open(manifest_path, 'r') as f:
+                    manifest = json.load(f)
+                print(f"🔄 [{symbol} {interval}] 중단된 백필 작업을 이어서 진행합니다.")
+                return work_dir, manifest['start_ms'], manifest['end_ms']
+            shutil.rmtree(work_dir)
+        os.makedirs(work_dir, exist_ok=True)
+        manifest = {'symbol': symbol, 'interval': interval, 'start_ms': start_ms, 'end_ms': end_ms}
+        with open(manifest_path + ".tmp", 'w') as f:
+            json.dump(manifest, f)
+        os.replace(manifest_path + ".tmp", manifest_path)
+        return work_dir, start_ms, end_ms
+
+    def _chunk_path(self, work_dir: str, chunk_start: int) -> str:
+        return os.path.join(work_dir, f"{chunk_start}.parquet")
+
+    def _fetch_chunk(self, symbol: str, interval: str, chunk: tuple, work_dir: str) -> int:
+        url, weight = _kline_endpoint(symbol, self.spot_base_url, self.futures_base_url)
+        params = {'symbol': symbol, 'interval': interval, 'startTime': chunk[0],
+                  'endTime': chunk[1], 'limit': KLINES_LIMIT}
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire(weight)
+            try:
+                resp = self.session.get(url, params=params, timeout=10)
+                with self._count_lock:
+                    self.request_count += 1
+                self.limiter.update_from_server(resp.headers.get('X-MBX-USED-WEIGHT-1M'))
+                if resp.status_code in (418, 429):
+                    time.sleep(float(resp.headers.get('Retry-After', 1)))
+                    continue
+                resp.raise_for_status()
+                klines = resp.json()
+                break
+            except requests.RequestException:
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(2 ** attempt)
+        else:
+            raise RuntimeError(f"요청 한도 초과로 청크 수집 실패: {symbol} {interval} {chunk[0]}")
+
+        df = _format_klines(klines) if klines else pd.DataFrame(columns=['Open time'])
+        path = self._chunk_path(work_dir, chunk[0])
+        df.to_parquet(path + ".tmp", index=False)
+        os.replace(path + ".tmp", path) # 완성된 청크 파일 = 체크포인트
+        return len(df)
+
+    def _stitch(self, symbol: str, interval: str, work_dir: str, chunks: list) -> int:
+        """청크 파일을 시간 순서대로 이어 붙여 저장소에 반영"""
+        frames = [pd.read_parquet(self._chunk_path(work_dir, c[0])) for c in chunks]
+        frames = [f for f in frames if not f.empty]
+        rows = 0
+        if frames:
+            rows = self.store.append(symbol, interval, pd.concat(frames, ignore_index=True))
+        shutil.rmtree(work_dir)
+        return rows
+
+    def run(self, jobs: list, start_str='3 years ago UTC', end_str=None, restart: bool = False) -> dict:
+        """
+        jobs: [(symbol, interval), ...]
+        restart=True이면 남아 있는 체크포인트를 버리고 처음부터 수집
+        반환값: 수집 통계 (bars, requests, seconds, bars_per_sec)
+        """
+        start_ms = start_str if isinstance(start_str, int) else date_to_milliseconds(start_str)
+        end_ms = int(time.time() * 1000) if end_str is None else (
+            end_str if isinstance(end_str, int) else date_to_milliseconds(end_str))
+
+        plans = []
+        for symbol, interval in jobs:
+            work_dir, job_start, job_end = self._prepare_work_dir(symbol, interval, start_ms, end_ms, restart)
+            chunks = self._plan_chunks(interval, job_start, job_end)
+            pending = [c for c in chunks if not os.path.exists(self._chunk_path(work_dir, c[0]))]
+            plans.append((symbol, interval, work_dir, chunks, pending))
+            print(f"📥 [{symbol} {interval}] 청크 {len(chunks)}개 중 {len(pending)}개 수집 예정")
+
+        t0 = time.time()
+        fetched_bars = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = [pool.submit(self._fetch_chunk, symbol, interval, chunk, work_dir)
+                       for symbol, interval, work_dir, _, pending in plans for chunk in pending]
+            for future in as_completed(futures):
+                fetched_bars += future.result()
+        elapsed = time.time() - t0
+
+        stored = 0
+        for symbol, interval, work_dir, chunks, _ in plans:
+            rows = self._stitch(symbol, interval, work_dir, chunks)
+            stored += rows
+            print(f"💾 [{symbol} {interval}] 백필 저장 완료: {rows}건")
+
+        stats = {
+            'bars': fetched_bars,
+            'stored': stored,
+            'requests': self.request_count,
+            'seconds': elapsed,
+            'bars_per_sec': fetched_bars / elapsed if elapsed > 0 else 0.0,
+        }
+        print(f"✅ 백필 완료: {fetched_bars}봉 / {elapsed:.2f}초 ({stats['bars_per_sec']:,.0f} bars/sec)")
+        return stats
+
+
+def benchmark_offline(max_workers_list=(1, 4, 8, 16), latency=0.05, interval='1h', start_str='3 years ago UTC'):
+    """가짜 REST 서버를 상대로 워커 수별 bars/sec 측정"""
+    import tempfile
+    from fake_binance_server import start_fake_server
+    server = start_fake_server(latency=latency)
+    try:
+        for workers in max_workers_list:
+            with tempfile.TemporaryDirectory() as tmp:
+                engine = ParallelBackfill(OHLCVStore(tmp), max_workers=workers, weight_limit=100_000,
+                                          spot_base_url=server.base_url, futures_base_url=server.base_url)
+                stats = engine.run([('XRPUSDT', interval), ('BTCUSDT', interval)], start_str)
+                print(f"🧪 workers={workers:>2}: {stats['bars_per_sec']:,.0f} bars/sec ({stats['requests']} requests)")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    import sys
+    if "--bench" in sys.argv:
+        benchmark_offline()
+    else:
+        ParallelBackfill().run([('XRPUSDT', '1h'), ('XRPUSDT', '15m')])
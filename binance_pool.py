@@ -0,0 +1,104 @@
+import os
+import time
+import threading
+import requests
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+from binance.client import Client
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# ── 프로세스 전역 바이낸스 클라이언트 / 커넥션 풀 ─────────────────
+# 봇 사이클마다 Client와 TLS 세션을 새로 만들지 않도록 하나의 keep-alive 세션을 공유합니다.
+POOL_CONNECTIONS = 4 # 호스트별 커넥션 풀 개수 (api, fapi, ...)
+POOL_MAXSIZE = 16 # 풀당 최대 동시 커넥션 (백필 스레드 수 이상)
+
+_lock = threading.Lock()
+_session = None
+_client = None
+_stats = {}
+_stats_lock = threading.Lock()
+_created = {'sessions': 0, 'clients': 0}
+
+
+def _record_response(resp, *args, **kwargs):
+    """응답 훅: 엔드포인트(경로)별 요청 수와 지연 시간 누적"""
+    endpoint = urlparse(resp.request.url).path
+    latency = resp.elapsed.total_seconds()
+    with _stats_lock:
+        stat = _stats.setdefault(endpoint, {'count': 0, 'errors': 0, 'total_sec': 0.0, 'max_sec': 0.0})
+        stat['count'] += 1
+        stat['total_sec'] += latency
+        stat['max_sec'] = max(stat['max_sec'], latency)
+        if resp.status_code >= 400:
+            stat['errors'] += 1
+
+
+def get_session() -> requests.Session:
+    """공유 keep-alive 세션 (대시보드 시세 조회, 백필 등 직접 REST 호출용)"""
+    global _session
+    with _lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.hooks['response'].append(_record_response)
+            _session = session
+            _created['sessions'] += 1
+        return _session
+
+
+def get_client() -> Client:
+    """프로세스 전역 python-binance Client (공유 세션 사용, 최초 1회만 생성)"""
+    global _client
+    session = get_session()
+    with _lock:
+        if _client is None:
+            client = Client(os.getenv('BINANCE_API_KEY'), os.getenv('BINANCE_API_SECRET'), ping=False)
+            # Client가 만든 세션의 헤더(API 키 등)를 공유 세션으로 옮기고 교체
+            session.headers.update(client.session.headers)
+            client.session.close()
+            client.session = session
+            _client = client
+            _created['clients'] += 1
+        return _client
+
+
+def get_stats() -> dict:
+    """엔드포인트별 통계 스냅샷 {path: {count, errors, avg_ms, max_ms}}"""
+    with _stats_lock:
+        return {
+            endpoint: {
+                'count': s['count'],
+                'errors': s['errors'],
+                'avg_ms': s['total_sec'] / s['count'] * 1000 if s['count'] else 0.0,
+                'max_ms': s['max_sec'] * 1000,
+            }
+            for endpoint, s in _stats.items()
+        }
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def report_stats():
+    """엔드포인트별 요청 수/지연 시간 출력"""
+    stats = get_stats()
+    print(f"🌐 [바이낸스 커넥션 풀] 클라이언트 {_created['clients']}개 / 세션 {_created['sessions']}개")
+    if not stats:
+        print("  - 기록된 요청이 없습니다.")
+        return
+    for endpoint, s in sorted(stats.items(), key=lambda kv: -kv[1]['count']):
+        print(f"  - {endpoint}: {s['count']}회 (오류 {s['errors']}) | 평균 {s['avg_ms']:.1f}ms | 최대 {s['max_ms']:.1f}ms")
+
+
+if __name__ == "__main__":
+    t0 = time.time()
+    for _ in range(5):
+        get_client().get_symbol_ticker(symbol='XRPUSDT')
+    print(f"5회 시세 조회: {time.time() - t0:.2f}초")
+    report_stats()
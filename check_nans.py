@@ -2,9 +2,10 @@ import pandas as pd
 import numpy as np
 import feature_engineering
 import inspect
+from mmap_store import load_frame
 
-# Read data exactly like data_sync
-df = pd.read_csv('/home/jeong-kihun/.openclaw/workspace/Binance_Signal_Predictor/data_storage/XRPUSDT_15m.csv')
+# Read data from the shared memmap kline file (see data_sync)
+df = load_frame('XRPUSDT', '15m')
 if 'Open time' in df.columns:
     df.rename(columns={'Open time': 'open time'}, inplace=True)
 df.columns = [c.lower() for c in df.columns]
@@ -24,8 +25,8 @@ print('--- NaN Counts from build_features ---')
 bad_cols = nans[nans > len(df_feat) * 0.5]
 print(bad_cols)
 
-# Hack ensure_stationarity
-source2 = inspect.getsource(feature_engineering.ensure_stationarity)
+# Hack apply_stationarity (used by ensure_stationarity)
+source2 = inspect.getsource(feature_engineering.apply_stationarity)
 source2 = source2.replace('return df.dropna()', 'return df')
 exec(source2, feature_engineering.__dict__)
 
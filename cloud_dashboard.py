@@ -6,6 +6,7 @@ from datetime import datetime, timedelta
 import plotly.express as px
 import plotly.graph_objects as go
 from dotenv import load_dotenv
+from binance_pool import get_session
 
 # [V6.0] VM 기반 데이터 연동 및 클라우드 배포 최적화 버전
 st.set_page_config(page_title="CHLOE AI Premium", layout="wide", page_icon="💎")
@@ -46,7 +47,7 @@ def load_data():
 # 3. 바이낸스 실시간 가격 (가장 검증된 공용 API)
 def get_live_price():
     try:
-        r = requests.get("https://api.binance.com/api/v3/ticker/price?symbol=XRPUSDT", timeout=5)
+        r = get_session().get("https://api.binance.com/api/v3/ticker/price?symbol=XRPUSDT", timeout=5)
         return float(r.json()['price'])
     except: return 0.0
 
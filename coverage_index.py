@@ -0,0 +1,136 @@
+import os
+import json
+import numpy as np
+from binance.helpers import interval_to_milliseconds
+
+# ── 시계열별 보유 구간 인덱스 (결측 봉 탐지용) ─────────────────────
+# {series_dir}/_coverage.json 에 연속 구간 목록 [[첫 봉 open ms, 마지막 봉 open ms], ...]을 저장합니다.
+# 저장소 append 때마다 새 봉의 구간만 병합하므로 전체 시계열을 다시 읽지 않습니다.
+COVERAGE_FILENAME = "_coverage.json"
+
+
+def runs_from_open_times(open_ms: np.ndarray, step: int) -> list:
+    """정렬된 open time 배열을 연속 구간 [[start, end], ...] 목록으로 압축 (벡터화)"""
+    open_ms = np.unique(np.asarray(open_ms, dtype=np.int64))
+    if len(open_ms) == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(open_ms) != step)
+    starts = np.r_[open_ms[0], open_ms[breaks + 1]]
+    ends = np.r_[open_ms[breaks], open_ms[-1]]
+    return [[int(a), int(b)] for a, b in zip(starts, ends)]
+
+
+def merge_runs(runs: list, new_runs: list, step: int) -> list:
+    """두 구간 목록을 합쳐 맞닿거나 겹치는 구간을 하나로 병합"""
+    merged = []
+    for a, b in sorted(runs + new_runs):
+        if merged and a <= merged[-1][1] + step:
+            merged[-1][1] = max(merged[-1][1], b)
+        else:
+            merged.append([a, b])
+    return merged
+
+
+class CoverageIndex:
+    """
+    한 시계열의 보유 구간 목록과 확인된 거래소 공백(재요청해도 데이터가 없는 구간) 목록
+    gaps()는 구간 수에 비례하는 비용으로 빠진 봉 구간을 반환합니다.
+    """
+
+    def __init__(self, series_dir: str, interval: str):
+        self.path = os.path.join(series_dir, COVERAGE_FILENAME)
+        self.interval = interval
+        self.step = interval_to_milliseconds(interval)
+        self.runs = []
+        self.confirmed_empty = []
+        self.synced_ms = None # 마지막으로 성공한 동기화 요청 시각 (이 시각 전에 마감된 봉은 확정값)
+        self.loaded = False
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                data = json.load(f)
+            if data.get('step') == self.step:
+                self.runs = data.get('runs', [])
+                self.confirmed_empty = data.get('confirmed_empty', [])
+                self.synced_ms = data.get('synced_ms')
+                self.loaded = True
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'interval': self.interval, 'step': self.step,
+                       'runs': self.runs, 'confirmed_empty': self.confirmed_empty, 'synced_ms': self.synced_ms}, f)
+        os.replace(tmp_path, self.path)
+
+    def add(self, open_ms: np.ndarray):
+        """새로 기록된 봉의 open time을 구간 목록에 병합"""
+        self.runs = merge_runs(self.runs, runs_from_open_times(open_ms, self.step), self.step)
+
+    def mark_empty(self, start_ms: int, end_ms: int):
+        """재수집해도 봉이 없는 구간(거래소 점검 등)으로 기록하여 다음 탐지에서 제외"""
+        self.confirmed_empty = merge_runs(self.confirmed_empty, [[int(start_ms), int(end_ms)]], self.step)
+
+    def mark_synced(self, request_ms: int):
+        """request_ms에 보낸 동기화 요청이 성공했음을 기록 (그 전에 마감된 봉은 더 바뀌지 않음)"""
+        self.synced_ms = max(int(request_ms), self.synced_ms or 0)
+
+    def first_open_time(self):
+        return self.runs[0][0] if self.runs else None
+
+    def last_open_time(self):
+        return self.runs[-1][1] if self.runs else None
+
+    def bar_count(self) -> int:
+        return sum((b - a) // self.step + 1 for a, b in self.runs)
+
+    def gaps(self, start_ms: int = None, end_ms: int = None, include_confirmed: bool = False) -> list:
+        """
+        [start_ms, end_ms] 안에서 빠진 봉 구간 [[첫 빠진 open ms, 마지막 빠진 open ms], ...]
+        기본값은 저장된 첫 봉 ~ 마지막 봉 사이의 내부 공백만 봅니다.
+        """
+        if not self.runs:
+            return []
+        step = self.step
+        lo = self.runs[0][0] if start_ms is None else -(-int(start_ms) // step) * step
+        hi = self.runs[-1][1] if end_ms is None else int(end_ms) // step * step
+        if lo > hi:
+            return []
+
+        # 연속 구간 사이가 곧 공백이므로 구간 목록만 순회 (봉 수와 무관)
+        gaps = []
+        cursor = lo
+        for a, b in self.runs:
+            if b < cursor:
+                continue
+            if a > hi:
+                break
+            if a > cursor:
+                gaps.append([cursor, a - step])
+            cursor = b + step
+        if cursor <= hi:
+            gaps.append([cursor, hi])
+
+        if not include_confirmed and self.confirmed_empty:
+            gaps = _subtract_runs(gaps, self.confirmed_empty, step)
+        return gaps
+
+    def missing_bars(self, start_ms: int = None, end_ms: int = None) -> int:
+        return sum((b - a) // self.step + 1 for a, b in self.gaps(start_ms, end_ms))
+
+
+def _subtract_runs(runs: list, remove: list, step: int) -> list:
+    """runs 구간들에서 remove 구간들을 뺀 나머지 (둘 다 정렬된 목록)"""
+    out = []
+    j = 0
+    for a, b in runs:
+        while j < len(remove) and remove[j][1] < a:
+            j += 1
+        k = j
+        cursor = a
+        while k < len(remove) and remove[k][0] <= b:
+            if remove[k][0] > cursor:
+                out.append([cursor, remove[k][0] - step])
+            cursor = max(cursor, remove[k][1] + step)
+            k += 1
+        if cursor <= b:
+            out.append([cursor, b])
+    return out
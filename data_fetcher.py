@@ -14,21 +14,40 @@ def fetch_historical_data(symbol='BTCUSDT', interval='1h', start_str='1 year ago
     """
     로컬 저장소에서 데이터를 로드하고, 필요시 최신 데이터만 바이낸스에서 동기화하여 반환합니다.
     """
-    from data_sync import sync_historical_data, sync_funding_rates
+    from data_sync import sync_historical_data, store, _parse_start_ms
+    from resampler import Resampler, BASE_INTERVAL, can_resample
     
     # 1. 로컬 데이터 동기화 및 로드
-    df = sync_historical_data(symbol, interval, start_str)
+    if can_resample(interval, BASE_INTERVAL):
+        # 상위 타임프레임은 기본 봉만 동기화하고 로컬에서 집계 (같은 구간을 두 번 받지 않음)
+        sync_historical_data(symbol, BASE_INTERVAL, start_str)
+        start_ms = _parse_start_ms(start_str)
+        df = Resampler(store, BASE_INTERVAL).load(symbol, interval, start_ms)
+    else:
+        df = sync_historical_data(symbol, interval, start_str)
     
     # 2. 선물일 경우 펀딩비 추가
-    if 'PERP' in symbol or symbol.endswith('USDT'):
-        funding_df = sync_funding_rates(symbol.replace('USD_PERP', 'USDT'), start_str)
-        if not funding_df.empty and not df.empty:
-            df = pd.merge_asof(df.sort_values('Open time'), funding_df.sort_values('timestamp'), 
-                              left_on='Open time', right_on='timestamp', direction='backward')
-            df['fundingRate'] = df['fundingRate'].fillna(0)
+    add_funding_column(df, symbol, interval, start_str)
     
     if df.empty:
         print(f"❌ [{symbol}] 데이터를 확보하지 못했습니다.")
         return pd.DataFrame()
 
     return df
+
+def add_funding_column(df, symbol, interval, start_str):
+    """
+    선물 심볼이면 봉별 펀딩비(fundingRate) 컬럼을 df에 직접 추가합니다 (fetch_historical_data와 스트리밍 봉이 공유).
+    펀딩비 이력은 증분 동기화하고, 봉별 값은 캐시에서 읽어 캐시에 없는 봉만 searchsorted로 정렬합니다.
+    """
+    if df.empty or not ('PERP' in symbol or symbol.endswith('USDT')):
+        return df
+    from data_sync import sync_funding_rates
+    from funding_store import AlignedFundingCache
+    funding_df = sync_funding_rates(symbol.replace('USD_PERP', 'USDT'), start_str)
+    if not funding_df.empty:
+        funding_ms = funding_df['timestamp'].to_numpy(dtype='datetime64[ms]').astype('int64')
+        open_ms = df['Open time'].to_numpy(dtype='datetime64[ms]').astype('int64')
+        cache = AlignedFundingCache(symbol, interval, DATA_DIR)
+        df['fundingRate'] = cache.column(open_ms, funding_ms, funding_df['fundingRate'].to_numpy(dtype='float64'))
+    return df
@@ -3,8 +3,13 @@ import pandas as pd
 import time
 from binance.client import Client
 from binance.enums import HistoricalKlinesType
+from binance.helpers import date_to_milliseconds
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
+from ohlcv_store import OHLCVStore
+from mmap_store import export_from_store
+from binance_pool import get_client
+from funding_store import load_funding, save_funding
 
 load_dotenv()
 
@@ -13,86 +18,228 @@ DATA_DIR = "/home/jeong-kihun/.openclaw/workspace/Binance_Signal_Predictor/data_
 if not os.path.exists(DATA_DIR):
     os.makedirs(DATA_DIR)
 
+# K-라인 저장소 (일 단위 Parquet 파티션)
+store = OHLCVStore(DATA_DIR)
+
+# 펀딩비 페이지 수집 설정 (1000건 = 8시간 간격 약 333일)
+FUNDING_PAGE_LIMIT = 1000
+FUNDING_MAX_PAGES = 50
+
 def sync_historical_data(symbol='XRPUSDT', interval='15m', start_str='3 years ago UTC'):
     """
     바이낸스에서 데이터를 가져와 로컬에 저장하고, 최신 데이터만 증분 업데이트합니다.
+    반환값은 start_str 이후 구간만 포함합니다 (저장소 전체를 읽지 않음).
     """
-    api_key = os.getenv('BINANCE_API_KEY')
-    api_secret = os.getenv('BINANCE_API_SECRET')
-    client = Client(api_key, api_secret)
+    client = get_client() # 프로세스 전역 클라이언트 (keep-alive 세션 재사용)
     
-    file_path = os.path.join(DATA_DIR, f"{symbol}_{interval}.csv")
-    
-    # 1. 기존 데이터 로드
-    existing_df = pd.DataFrame()
-    if os.path.exists(file_path):
-        try:
-            existing_df = pd.read_csv(file_path)
-            existing_df['Open time'] = pd.to_datetime(existing_df['Open time'])
-            print(f"✅ 로컬 데이터 로드 성공: {len(existing_df)}건")
-        except Exception as e:
-            print(f"⚠️ 로컬 데이터 로드 실패: {e}")
+    # 요청 구간 시작 시점(ms) - 반환 데이터는 이 시점 이후만 로드
+    start_ms = _parse_start_ms(start_str)
+
+    # 1. 기존 데이터 확인 (일 단위 Parquet 저장소의 첫/마지막 파티션만 읽음)
+    first_ms, last_ms = None, None
+    try:
+        first_ms = store.first_open_time(symbol, interval)
+        last_ms = store.last_open_time(symbol, interval)
+    except Exception as e:
+        print(f"⚠️ 로컬 데이터 로드 실패: {e}")
+
+    # 선물 심볼 처리 보완
+    k_type = _kline_type(symbol)
 
     # 2. 시작 시점 결정
-    if not existing_df.empty:
-        # 마지막 데이터의 다음 시간부터 수집
-        last_ts = existing_df['Open time'].max()
-        start_ts = int(last_ts.timestamp() * 1000) + 1
-        print(f"🔄 증분 업데이트 시작: {last_ts}")
+    if last_ms is not None:
+        # 요청 시작 시점이 저장된 첫 봉보다 앞서면 앞쪽 구간을 먼저 보충
+        # (상장 전처럼 봉이 없다고 확인된 구간은 거래소 공백으로 기록되어 다시 요청하지 않음)
+        if start_ms is not None and start_ms < first_ms and _older_pending(symbol, interval, start_ms, first_ms):
+            print(f"📥 과거 구간 보충 수집: {start_str} ~ {pd.Timestamp(first_ms, unit='ms')}")
+            try:
+                older = client.get_historical_klines(symbol, interval, start_ms, first_ms - 1, klines_type=k_type)
+                if older:
+                    store.append(symbol, interval, _format_klines(older))
+                _mark_missing_empty(symbol, interval, start_ms, first_ms - 1)
+            except Exception as e:
+                print(f"❌ 과거 구간 보충 중 오류 발생: {e}")
+
+        # 마지막 봉은 미완성일 수 있으므로 마지막 봉부터 다시 수집하여 덮어씀
+        start_ts = last_ms
+        print(f"🔄 증분 업데이트 시작: {pd.Timestamp(last_ms, unit='ms')}")
     else:
-        # 데이터가 없으면 처음부터 수집
-        start_ts = start_str
+        # 데이터가 없으면 처음부터 수집 (시간 청크 병렬 백필, 중단 시 이어받기 가능)
         print(f"📥 전체 데이터 수집 시작: {start_str}")
+        try:
+            from backfill import ParallelBackfill
+            request_ms = int(time.time() * 1000)
+            ParallelBackfill(store).run([(symbol, interval)], start_ms if start_ms is not None else start_str)
+            _mark_synced(symbol, interval, request_ms)
+            _export_mmap(symbol, interval)
+        except Exception as e:
+            print(f"❌ 병렬 백필 중 오류 발생: {e}")
+        return _load_existing(symbol, interval, start_ms)
 
     # 3. 데이터 수집 (재시도 로직 포함)
     try:
-        # 선물 심볼 처리 보완
-        k_type = HistoricalKlinesType.SPOT
-        if 'USD' in symbol:
-            k_type = HistoricalKlinesType.FUTURES
-            
+        request_ms = int(time.time() * 1000) # 이 시각 전에 마감된 봉은 응답에서 확정값
         klines = client.get_historical_klines(symbol, interval, start_ts, klines_type=k_type)
         if not klines:
             print("ℹ️ 추가할 새로운 데이터가 없습니다.")
-            return existing_df
+            return _load_existing(symbol, interval, start_ms)
 
         new_df = _format_klines(klines)
         print(f"✅ 신규 데이터 수집 완료: {len(new_df)}건")
 
-        # 4. 합치기 및 저장
-        final_df = pd.concat([existing_df, new_df]).drop_duplicates(subset=['Open time']).sort_values('Open time')
-        final_df.to_csv(file_path, index=False)
-        print(f"💾 최종 데이터 저장 완료: {len(final_df)}건 ({file_path})")
+        # 4. 변경된 날짜 파티션만 저장 후 요청 구간만 로드
+        store.append(symbol, interval, new_df)
+        _mark_synced(symbol, interval, request_ms)
+        repair_gaps(symbol, interval, start_ms)
+        _export_mmap(symbol, interval)
+        final_df = store.load_range(symbol, interval, start_ms, None)
+        print(f"💾 최종 데이터 저장 완료: {len(final_df)}건 ({store.series_dir(symbol, interval)})")
         return final_df
 
     except Exception as e:
         print(f"❌ 데이터 수집 중 오류 발생: {e}")
+        _report_gaps(symbol, interval, start_ms)
+        return _load_existing(symbol, interval, start_ms)
+
+def _kline_type(symbol):
+    return HistoricalKlinesType.FUTURES if 'USD' in symbol else HistoricalKlinesType.SPOT
+
+def _report_gaps(symbol, interval, start_ms=None):
+    """저장된 시계열의 결측 구간 요약 출력 (동기화 실패 시 구멍을 바로 알 수 있도록)"""
+    try:
+        coverage = store.coverage(symbol, interval)
+        gaps = coverage.gaps(start_ms) if coverage is not None else []
+    except Exception as e:
+        print(f"⚠️ 결측 구간 확인 실패: {e}")
+        return []
+    if gaps:
+        print(f"⚠️ [{symbol} {interval}] 결측 구간 {len(gaps)}개 / 빠진 봉 {coverage.missing_bars(start_ms)}개")
+    return gaps
+
+def repair_gaps(symbol='XRPUSDT', interval='15m', start=None, end=None, max_gaps=100):
+    """
+    보유 구간 인덱스에서 찾은 결측 구간만 다시 받아 저장합니다 (전체 재수집 없음).
+    재요청해도 봉이 없는 구간은 거래소 공백으로 기록하여 다음부터 건너뜁니다.
+    반환값: 보충한 봉 수
+    """
+    coverage = store.coverage(symbol, interval)
+    if coverage is None:
+        return 0
+    gaps = coverage.gaps(_parse_start_ms(start), _parse_start_ms(end))
+    if not gaps:
+        return 0
+    print(f"🩹 [{symbol} {interval}] 결측 구간 {len(gaps)}개 보충 수집")
+    client = get_client()
+    filled = 0
+    for gap_start, gap_end in gaps[:max_gaps]:
+        try:
+            klines = client.get_historical_klines(symbol, interval, gap_start, gap_end + coverage.step - 1,
+                                                  klines_type=_kline_type(symbol))
+        except Exception as e:
+            print(f"❌ 결측 구간 보충 실패 ({pd.Timestamp(gap_start, unit='ms')}): {e}")
+            continue
+        if klines:
+            filled += store.append(symbol, interval, _format_klines(klines))
+            # 이 구간으로 집계해 둔 상위 봉은 다시 집계 (구멍 난 기본 봉으로 만든 값일 수 있음)
+            _invalidate_resampled(symbol, interval, gap_start, gap_end)
+        # 응답에 없던 봉은 거래소 쪽 공백으로 확정
+        _mark_missing_empty(symbol, interval, gap_start, gap_end)
+    print(f"✅ [{symbol} {interval}] 결측 봉 {filled}개 보충")
+    if filled:
+        _export_mmap(symbol, interval) # 바이너리 파일도 보충 시각부터 다시 기록
+    return filled
+
+def _invalidate_resampled(symbol, interval, start_ms, end_ms):
+    """기본 봉 [start_ms, end_ms]가 바뀌었을 때 그 구간의 리샘플 캐시 상위 봉을 다시 집계 대상으로 표시"""
+    try:
+        from resampler import Resampler
+        marked = Resampler(store, interval).invalidate(symbol, start_ms, end_ms)
+        if marked:
+            print(f"🔁 [{symbol}] 보충 구간의 상위 타임프레임 봉 {marked}개 재집계 예정")
+    except Exception as e:
+        print(f"⚠️ 리샘플 캐시 무효화 실패: {e}")
+
+def _mark_synced(symbol, interval, request_ms):
+    """동기화 성공 시각 기록 (리샘플러가 마지막 기본 봉의 마감 확정 여부를 판단하는 기준)"""
+    coverage = store.coverage(symbol, interval)
+    if coverage is not None:
+        coverage.mark_synced(request_ms)
+        coverage.save()
+
+def _mark_missing_empty(symbol, interval, start_ms, end_ms):
+    """요청에 성공했는데도 [start_ms, end_ms]에 남은 빈 구간을 거래소 공백으로 기록"""
+    coverage = store.coverage(symbol, interval)
+    if coverage is None:
+        return
+    for a, b in coverage.gaps(start_ms, end_ms):
+        coverage.mark_empty(a, b)
+    coverage.save()
+
+def _older_pending(symbol, interval, start_ms, first_ms):
+    """저장된 첫 봉 이전 구간 중 아직 요청하지 않은(공백으로 확정되지 않은) 봉이 있는지"""
+    try:
+        coverage = store.coverage(symbol, interval)
+    except Exception:
+        return True
+    return coverage is None or bool(coverage.gaps(start_ms, first_ms - 1))
+
+def _export_mmap(symbol, interval):
+    """마감된 봉을 memmap 바이너리 파일에도 반영 (학습/백테스트/봇 공유 읽기용)"""
+    try:
+        export_from_store(symbol, interval, store)
+    except Exception as e:
+        print(f"⚠️ 바이너리 K-라인 파일 갱신 실패: {e}")
+
+def _parse_start_ms(start_str):
+    """'60 days ago UTC' 같은 시작 시점 문자열(또는 ms 정수)을 ms로 변환"""
+    if start_str is None:
+        return None
+    if isinstance(start_str, (int, float)):
+        return int(start_str)
+    try:
+        return date_to_milliseconds(start_str)
+    except Exception:
+        return None
+
+def _load_existing(symbol, interval, start_ms=None):
+    """로컬 저장소의 기존 데이터(요청 구간)를 로드 (실패 시 빈 DataFrame)"""
+    try:
+        existing_df = store.load_range(symbol, interval, start_ms, None)
+        if not existing_df.empty:
+            print(f"✅ 로컬 데이터 로드 성공: {len(existing_df)}건")
         return existing_df
+    except Exception as e:
+        print(f"⚠️ 로컬 데이터 로드 실패: {e}")
+        return pd.DataFrame()
 
 def sync_funding_rates(symbol='XRPUSDT', start_str='3 years ago UTC'):
     """
     바이낸스 선물 펀딩비를 가져와 로컬에 저장하고 업데이트합니다.
+    응답 한도(1000건)를 넘는 구간은 startTime을 옮겨 가며 페이지 단위로 모두 수집합니다.
     """
-    api_key = os.getenv('BINANCE_API_KEY')
-    api_secret = os.getenv('BINANCE_API_SECRET')
-    client = Client(api_key, api_secret)
-    
-    file_path = os.path.join(DATA_DIR, f"{symbol}_funding.csv")
-    
+    client = get_client() # 프로세스 전역 클라이언트 (keep-alive 세션 재사용)
+
     existing_df = pd.DataFrame()
-    if os.path.exists(file_path):
-        try:
-            existing_df = pd.read_csv(file_path)
-            existing_df['timestamp'] = pd.to_datetime(existing_df['timestamp'])
-        except: pass
+    try:
+        existing_df = load_funding(symbol, DATA_DIR)
+    except Exception as e:
+        print(f"⚠️ 로컬 펀딩비 로드 실패: {e}")
 
-    start_ts = int(existing_df['timestamp'].max().timestamp() * 1000) + 1 if not existing_df.empty else start_str
+    start_ms = _parse_start_ms(start_str)
     
     try:
-        # 펀딩비 API 호출 (USD-M용)
-        funding = client.futures_funding_rate(symbol=symbol, startTime=start_ts, limit=1000)
-        
-        if not funding or not isinstance(funding, list):
+        # 펀딩비 API 호출 (USD-M용) - 페이지 단위 반복
+        if not existing_df.empty:
+            first_ms = int(existing_df['timestamp'].min().timestamp() * 1000)
+            last_ms = int(existing_df['timestamp'].max().timestamp() * 1000)
+            funding = _fetch_funding_pages(client, symbol, last_ms + 1)
+            # 요청 시작 시점이 저장된 첫 펀딩보다 앞서면 앞쪽 구간도 보충
+            if start_ms is not None and start_ms < first_ms:
+                funding += _fetch_funding_pages(client, symbol, start_ms, first_ms - 1)
+        else:
+            funding = _fetch_funding_pages(client, symbol, start_ms)
+
+        if not funding:
             return existing_df
             
         new_df = pd.DataFrame(funding)
@@ -102,17 +249,41 @@ def sync_funding_rates(symbol='XRPUSDT', start_str='3 years ago UTC'):
             print(f"❌ 펀딩비 응답에 시간 컬럼이 없습니다. 컬럼들: {new_df.columns}")
             return existing_df
             
-        new_df['timestamp'] = pd.to_datetime(new_df[time_col], unit='ms')
+        new_df['timestamp'] = pd.to_datetime(new_df[time_col].astype('int64'), unit='ms')
         new_df['fundingRate'] = new_df['fundingRate'].astype(float)
         new_df = new_df[['timestamp', 'fundingRate']]
+        print(f"✅ 펀딩비 신규 수집: {len(new_df)}건")
         
         final_df = pd.concat([existing_df, new_df]).drop_duplicates(subset=['timestamp']).sort_values('timestamp')
-        final_df.to_csv(file_path, index=False)
-        return final_df
+        save_funding(symbol, final_df, DATA_DIR)
+        return final_df.reset_index(drop=True)
     except Exception as e:
         print(f"❌ 펀딩비 수집 오류: {e}")
         return existing_df
 
+def _fetch_funding_pages(client, symbol, start_ms, end_ms=None):
+    """startTime을 마지막 펀딩 시각 뒤로 옮겨 가며 [start_ms, end_ms] 구간의 펀딩비를 모두 수집"""
+    funding = []
+    cursor = start_ms
+    for _ in range(FUNDING_MAX_PAGES):
+        params = {'symbol': symbol, 'limit': FUNDING_PAGE_LIMIT}
+        if cursor is not None:
+            params['startTime'] = cursor
+        if end_ms is not None:
+            params['endTime'] = end_ms
+        page = client.futures_funding_rate(**params)
+        if not page or not isinstance(page, list):
+            break
+        funding.extend(page)
+        time_col = 'fundingTime' if 'fundingTime' in page[-1] else 'time'
+        if time_col not in page[-1] or len(page) < FUNDING_PAGE_LIMIT:
+            break
+        next_cursor = int(page[-1][time_col]) + 1
+        if cursor is not None and next_cursor <= cursor:
+            break
+        cursor = next_cursor
+    return funding
+
 def _format_klines(klines):
     df = pd.DataFrame(klines, columns=[
         'Open time', 'Open', 'High', 'Low', 'Close', 'Volume',
@@ -131,4 +302,8 @@ def _format_klines(klines):
     return df
 
 if __name__ == "__main__":
-    sync_historical_data()
+    import sys
+    if "--repair" in sys.argv:
+        repair_gaps('XRPUSDT', '15m')
+    else:
+        sync_historical_data()
@@ -0,0 +1,198 @@
+import json
+import time
+import asyncio
+import threading
+import numpy as np
+import websockets
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from binance.helpers import interval_to_milliseconds
+
+# ── 오프라인 테스트용 바이낸스 REST 대역 서버 ──────────────────
+# 실제 API 없이 백필/동기화 성능(bars/sec)을 측정하기 위한 결정적(deterministic) 가짜 K-라인 서버
+KLINES_PATHS = ('/api/v3/klines', '/fapi/v1/klines')
+MAX_LIMIT = 1000
+BASE_TIME_MS = 1_577_836_800_000 # 2020-01-01 00:00 UTC
+
+
+def synthetic_klines(interval: str, start_ms: int, end_ms: int, limit: int = MAX_LIMIT) -> list:
+    """startTime~endTime 구간의 가짜 K-라인 (바이낸스 응답 형식: 문자열 가격 리스트)"""
+    step = interval_to_milliseconds(interval)
+    first = -(-max(start_ms, BASE_TIME_MS) // step) * step # 인터벌 격자로 올림
+    open_ms = np.arange(first, end_ms + 1, step, dtype=np.int64)[:limit]
+    if len(open_ms) == 0:
+        return []
+    # 시각만으로 결정되는 가격 경로 (어느 청크에서 요청해도 같은 값)
+    t = (open_ms - BASE_TIME_MS) / 3_600_000.0
+    close = 0.5 + 0.1 * np.sin(t / 24.0) + 0.01 * np.sin(t * 1.7)
+    open_ = 0.5 + 0.1 * np.sin((t - step / 3_600_000.0) / 24.0) + 0.01 * np.sin((t - step / 3_600_000.0) * 1.7)
+    high = np.maximum(open_, close) * 1.002
+    low = np.minimum(open_, close) * 0.998
+    volume = 1000.0 + 500.0 * (1 + np.sin(t * 0.37))
+    rows = []
+    for k in range(len(open_ms)):
+        rows.append([
+            int(open_ms[k]), f"{open_[k]:.6f}", f"{high[k]:.6f}", f"{low[k]:.6f}", f"{close[k]:.6f}",
+            f"{volume[k]:.2f}", int(open_ms[k] + step - 1), f"{volume[k] * close[k]:.4f}",
+            100 + k % 50, f"{volume[k] * 0.5:.2f}", f"{volume[k] * close[k] * 0.5:.4f}", "0"
+        ])
+    return rows
+
+
+class _FakeBinanceHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass # 요청 로그 출력 생략
+
+    def _send_json(self, status: int, payload, extra_headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (extra_headers or {}).items():
+            self.send_header(key, str(value))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        if server.latency > 0:
+            time.sleep(server.latency)
+
+        used = server.add_weight(2 if url.path.startswith('/api') else 5)
+        headers = {'X-MBX-USED-WEIGHT-1M': used}
+        if server.weight_limit and used > server.weight_limit:
+            self._send_json(429, {'code': -1003, 'msg': 'Too many requests.'}, {**headers, 'Retry-After': 1})
+            return
+
+        if url.path in KLINES_PATHS:
+            now_ms = int(time.time() * 1000)
+            start_ms = int(params.get('startTime', BASE_TIME_MS))
+            end_ms = int(params.get('endTime', now_ms))
+            limit = min(int(params.get('limit', 500)), MAX_LIMIT)
+            self._send_json(200, synthetic_klines(params['interval'], start_ms, min(end_ms, now_ms), limit), headers)
+        else:
+            self._send_json(404, {'code': -1, 'msg': f'Unknown path {url.path}'}, headers)
+
+
+class FakeBinanceServer(ThreadingHTTPServer):
+    """요청 가중치(X-MBX-USED-WEIGHT-1M)와 지연, 429 제한을 흉내내는 로컬 서버"""
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, weight_limit=None):
+        super().__init__((host, port), _FakeBinanceHandler)
+        self.latency = latency
+        self.weight_limit = weight_limit
+        self.request_count = 0
+        self._weight_lock = threading.Lock()
+        self._weight_minute = None
+        self._weight_used = 0
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def add_weight(self, weight: int) -> int:
+        with self._weight_lock:
+            minute = int(time.time() // 60)
+            if minute != self._weight_minute:
+                self._weight_minute, self._weight_used = minute, 0
+            self._weight_used += weight
+            self.request_count += 1
+            return self._weight_used
+
+
+def start_fake_server(port: int = 0, latency: float = 0.0, weight_limit=None) -> FakeBinanceServer:
+    """백그라운드 스레드에서 가짜 서버를 시작하고 서버 객체를 반환 (종료: server.shutdown())"""
+    server = FakeBinanceServer(port=port, latency=latency, weight_limit=weight_limit)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class ReplayStreamServer:
+    """
+    웹소켓 스트림 리플레이 대역 서버 (Combined stream 형식)
+    봉마다 진행 중 kline 이벤트 2개, markPriceUpdate 1개, 마감(x=True) kline 이벤트 1개를 보냅니다.
+    closed_at[(symbol, close_ms)]에 마감 이벤트 송신 시각을 기록하여 수신 측 지연 시간을 잴 수 있습니다.
+    """
+
+    def __init__(self, symbols, interval='1m', n_bars=100, bar_interval_sec=0.05, start_ms=None):
+        step = interval_to_milliseconds(interval)
+        start_ms = start_ms if start_ms is not None else BASE_TIME_MS
+        self.symbols = [s.upper() for s in symbols]
+        self.interval = interval
+        self.bars = synthetic_klines(interval, start_ms, start_ms + step * n_bars - 1, limit=n_bars)
+        self.bar_interval_sec = bar_interval_sec
+        self.closed_at = {}
+        self.base_url = None
+        self._loop = None
+        self._server = None
+        self._ready = threading.Event()
+
+    def _kline_event(self, symbol: str, row: list, closed: bool) -> str:
+        k = {
+            't': row[0], 'T': row[6], 's': symbol, 'i': self.interval, 'f': 0, 'L': 0,
+            'o': row[1], 'c': row[4], 'h': row[2], 'l': row[3], 'v': row[5], 'n': row[8],
+            'x': closed, 'q': row[7], 'V': row[9], 'Q': row[10], 'B': '0'
+        }
+        data = {'e': 'kline', 'E': int(time.time() * 1000), 's': symbol, 'k': k}
+        return json.dumps({'stream': f"{symbol.lower()}@kline_{self.interval}", 'data': data})
+
+    def _mark_event(self, symbol: str, row: list) -> str:
+        data = {'e': 'markPriceUpdate', 'E': int(time.time() * 1000), 's': symbol,
+                'p': row[4], 'r': '0.0001', 'T': row[6] + 1}
+        return json.dumps({'stream': f"{symbol.lower()}@markPrice@1s", 'data': data})
+
+    async def _handler(self, ws, *args):
+        try:
+            for row in self.bars:
+                for symbol in self.symbols:
+                    await ws.send(self._kline_event(symbol, row, False))
+                    await ws.send(self._mark_event(symbol, row))
+                    await ws.send(self._kline_event(symbol, row, False))
+                await asyncio.sleep(self.bar_interval_sec)
+                for symbol in self.symbols:
+                    self.closed_at[(symbol, row[6])] = time.time()
+                    await ws.send(self._kline_event(symbol, row, True))
+            await asyncio.sleep(3600) # 리플레이가 끝나도 연결 유지
+        except Exception:
+            pass
+
+    def _run(self, port: int):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+
+        async def _start():
+            self._server = await websockets.serve(self._handler, '127.0.0.1', port)
+            sock_port = list(self._server.sockets)[0].getsockname()[1]
+            self.base_url = f"ws://127.0.0.1:{sock_port}"
+            self._ready.set()
+
+        self._loop.run_until_complete(_start())
+        self._loop.run_forever()
+
+    def start(self, port: int = 0):
+        threading.Thread(target=self._run, args=(port,), daemon=True).start()
+        self._ready.wait(timeout=10)
+        return self
+
+    def shutdown(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._server.close)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+def start_replay_server(symbols, interval='1m', n_bars=100, bar_interval_sec=0.05, port=0) -> ReplayStreamServer:
+    """백그라운드 스레드에서 리플레이 서버 시작 (종료: server.shutdown())"""
+    return ReplayStreamServer(symbols, interval, n_bars, bar_interval_sec).start(port)
+
+
+if __name__ == "__main__":
+    server = FakeBinanceServer(port=8765)
+    print(f"🧪 가짜 바이낸스 REST 서버 실행 중: {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -1,13 +1,86 @@
 import pandas as pd
 import numpy as np
-from ta import add_all_ta_features
-from ta.momentum import RSIIndicator, StochasticOscillator, WilliamsRIndicator, ROCIndicator
-from ta.trend import MACD, EMAIndicator, ADXIndicator, CCIIndicator, IchimokuIndicator, TRIXIndicator, PSARIndicator
-from ta.volatility import BollingerBands, AverageTrueRange, KeltnerChannel, DonchianChannel, UlcerIndex
-from ta.volume import OnBalanceVolumeIndicator, VolumeWeightedAveragePrice, MFIIndicator, ChaikinMoneyFlowIndicator, EaseOfMovementIndicator, ForceIndexIndicator, NegativeVolumeIndexIndicator
-from statsmodels.tsa.stattools import adfuller
-
-def build_features(df: pd.DataFrame) -> pd.DataFrame:
+from indicators_np import INDICATOR_REGISTRY, INDICATOR_COLUMNS, shift
+from rolling_moments import rolling_moments, FEATURE_WINDOWS
+from adf_batch import adf_test_columns
+
+# ── build_features 피처 레지스트리 (지표 레지스트리 + 거래량/수익률/캔들/롤링 통계/시간 피처) ──
+# 입력: OHLCV + funding(펀딩비, 없으면 0) + time(봉 시각 DatetimeIndex, 없으면 시간 피처 생략)
+FEATURE_REGISTRY = INDICATOR_REGISTRY.extend(inputs=('funding', 'time'))
+_reg = FEATURE_REGISTRY.add
+
+_reg('ema_cross_7_25', ('ema_7', 'ema_25'), lambda fast, slow: fast - slow)
+_reg('ema_cross_25_99', ('ema_25', 'ema_99'), lambda fast, slow: fast - slow)
+_reg('volume_sma_20', 'volume', lambda v: pd.Series(v).rolling(20).mean().to_numpy())
+_reg('volume_ratio', ('volume', 'volume_sma_20'), lambda v, sma: v / sma)
+_reg('funding_rate', 'funding', lambda funding: funding)
+for _w in [1, 3, 7, 14, 21]:
+    _reg(f'return_{_w}', 'close', lambda c, w=_w: c / shift(c, w) - 1) # pct_change(w)
+
+
+def _return_moments(returns, outputs):
+    """수익률 롤링 통계는 공유 엔진으로 요청된 윈도우/통계만 한 번에 계산 (vol_w = return_1의 w봉 표준편차)"""
+    spec = {}
+    for name in outputs:
+        stat, w = ('std', name[4:]) if name.startswith('vol_') else name[5:].rsplit('_', 1)
+        spec.setdefault(int(w), []).append(stat)
+    moments = rolling_moments(returns, spec, dtype=np.float64)
+    return {name: moments[f"std_{name[4:]}" if name.startswith('vol_') else name[5:]].to_numpy() for name in outputs}
+
+
+_MOMENT_OUTPUTS = [f'vol_{w}' for w in [3, 7, 14, 21]] + \
+                  [f'roll_{stat}_{w}' for w in [7, 14, 30] for stat in ['mean', 'std', 'max', 'min', 'skew', 'kurt']]
+_reg(_MOMENT_OUTPUTS, 'return_1', _return_moments, select=True)
+_reg('high_low_ratio', ('high', 'low', 'close'), lambda h, l, c: (h - l) / c)
+_reg('close_open_ratio', ('open', 'close'), lambda o, c: (c - o) / o)
+_reg('upper_shadow', ('open', 'high', 'close'), lambda o, h, c: (h - np.maximum(o, c)) / c)
+_reg('lower_shadow', ('open', 'low', 'close'), lambda o, l, c: (np.minimum(o, c) - l) / c)
+
+# 시간 피처 (삼각함수 변환으로 주기성 강조)
+_reg('hour', 'time', lambda t: t.hour.to_numpy())
+_reg('dayofweek', 'time', lambda t: t.dayofweek.to_numpy())
+_reg('is_weekend', 'time', lambda t: (t.dayofweek >= 5).astype(int))
+_reg('sin_hour', 'hour', lambda hour: np.sin(2 * np.pi * hour / 24))
+_reg('cos_hour', 'hour', lambda hour: np.cos(2 * np.pi * hour / 24))
+
+# build_features 출력 컬럼 순서 (EMA 교차는 ema_99 바로 뒤)
+FEATURE_COLUMNS = []
+for _name in INDICATOR_COLUMNS:
+    FEATURE_COLUMNS.append(_name)
+    if _name == 'ema_99':
+        FEATURE_COLUMNS += ['ema_cross_7_25', 'ema_cross_25_99']
+FEATURE_COLUMNS += ['volume_sma_20', 'volume_ratio', 'funding_rate']
+for _w in [1, 3, 7, 14, 21]:
+    FEATURE_COLUMNS += [f'return_{_w}'] + ([f'vol_{_w}'] if _w > 1 else []) # vol_1은 계산 불가라 제외
+FEATURE_COLUMNS += ['high_low_ratio', 'close_open_ratio', 'upper_shadow', 'lower_shadow']
+FEATURE_COLUMNS += [f'roll_{stat}_{w}' for w in [7, 14, 30] for stat in ['mean', 'std', 'max', 'min', 'skew', 'kurt']]
+FEATURE_COLUMNS += ['hour', 'dayofweek', 'is_weekend', 'sin_hour', 'cos_hour']
+assert sorted(FEATURE_COLUMNS) == sorted(FEATURE_REGISTRY.columns), "FEATURE_COLUMNS와 레지스트리 출력이 다릅니다"
+
+
+def compute_feature_arrays(df: pd.DataFrame, columns=None) -> dict:
+    """
+    build_features의 피처 배열 {컬럼: ndarray} (dropna 전, FEATURE_REGISTRY 등록 순서)
+    df 컬럼명은 소문자 (open, high, low, close, volume, [fundingrate], [open time])
+    """
+    inputs = {name: df[name].to_numpy(dtype=np.float64) for name in ('open', 'high', 'low', 'close', 'volume')}
+    # 펀딩비 피처 (data_fetcher에서 로드된 경우)
+    if 'fundingrate' in df.columns:
+        inputs['funding'] = df['fundingrate'].to_numpy()
+    else:
+        inputs['funding'] = np.zeros(len(df))
+    if isinstance(df.index, pd.DatetimeIndex):
+        inputs['time'] = df.index
+    elif 'open time' in df.columns:
+        inputs['time'] = pd.DatetimeIndex(pd.to_datetime(df['open time']))
+
+    if columns is not None:
+        columns = [c for c in columns if c in FEATURE_REGISTRY.producer]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return FEATURE_REGISTRY.compute(inputs, columns)
+
+
+def build_features(df: pd.DataFrame, columns=None) -> pd.DataFrame:
     """
     입력: OHLCV DataFrame (columns: open, high, low, close, volume)
     출력: 피처 엔지니어링된 DataFrame (총 80+ 피처 생성 목표)
@@ -17,137 +90,28 @@ def build_features(df: pd.DataFrame) -> pd.DataFrame:
     3. 변동성 (Volatility)
     4. 거래량 (Volume)
     5. 통계 및 시간 (Statistical & Temporal)
+    columns: 필요한 피처 목록 (예: 모델 패키지의 features). 주면 FEATURE_REGISTRY 의존 그래프로
+    그 피처와 의존 지표만 계산 (레지스트리에 없는 이름은 원본 컬럼으로 보고 무시, dropna도 그 피처 기준)
     """
     df = df.copy()
     
     # 컬럼명을 소문자로 통일 (ta 라이브러리 호환성)
     df.columns = [col.lower() for col in df.columns]
 
-    # ── 1. 모멘텀 지표 (Momentum) ──────────────────────────
-    df['rsi_14'] = RSIIndicator(df['close'], window=14).rsi()
-    df['rsi_7'] = RSIIndicator(df['close'], window=7).rsi()
-    df['rsi_21'] = RSIIndicator(df['close'], window=21).rsi()
-    
-    stoch = StochasticOscillator(df['high'], df['low'], df['close'])
-    df['stoch_k'] = stoch.stoch()
-    df['stoch_d'] = stoch.stoch_signal()
-    
-    df['williams_r'] = WilliamsRIndicator(df['high'], df['low'], df['close']).williams_r()
-    df['roc_10'] = ROCIndicator(df['close'], window=10).roc()
-    df['roc_20'] = ROCIndicator(df['close'], window=20).roc()
-    df['trix'] = TRIXIndicator(df['close']).trix()
-
-    # ── 2. 트렌드 지표 (Trend) ─────────────────────────────
-    macd = MACD(df['close'])
-    df['macd'] = macd.macd()
-    df['macd_signal'] = macd.macd_signal()
-    df['macd_diff'] = macd.macd_diff()
-    
-    df['ema_7'] = EMAIndicator(df['close'], window=7).ema_indicator()
-    df['ema_25'] = EMAIndicator(df['close'], window=25).ema_indicator()
-    df['ema_99'] = EMAIndicator(df['close'], window=99).ema_indicator()
-    
-    df['ema_cross_7_25'] = df['ema_7'] - df['ema_25']
-    df['ema_cross_25_99'] = df['ema_25'] - df['ema_99']
-    
-    adx_ind = ADXIndicator(df['high'], df['low'], df['close'])
-    df['adx'] = adx_ind.adx()
-    df['adx_pos'] = adx_ind.adx_pos()
-    df['adx_neg'] = adx_ind.adx_neg()
-    
-    df['cci'] = CCIIndicator(df['high'], df['low'], df['close']).cci()
-    
-    ichi = IchimokuIndicator(df['high'], df['low'])
-    df['ichi_a'] = ichi.ichimoku_a()
-    df['ichi_b'] = ichi.ichimoku_b()
-    df['ichi_base'] = ichi.ichimoku_base_line()
-    df['ichi_conv'] = ichi.ichimoku_conversion_line()
-    
-    df['psar'] = PSARIndicator(df['high'], df['low'], df['close']).psar()
-
-    # ── 3. 변동성 지표 (Volatility) ─────────────────────────
-    bb = BollingerBands(df['close'])
-    df['bb_upper'] = bb.bollinger_hband()
-    df['bb_lower'] = bb.bollinger_lband()
-    df['bb_width'] = bb.bollinger_wband()
-    df['bb_pct'] = bb.bollinger_pband()
-    
-    df['atr_14'] = AverageTrueRange(df['high'], df['low'], df['close'], window=14).average_true_range()
-    
-    kc = KeltnerChannel(df['high'], df['low'], df['close'])
-    df['kc_upper'] = kc.keltner_channel_hband()
-    df['kc_lower'] = kc.keltner_channel_lband()
-    
-    dc = DonchianChannel(df['high'], df['low'], df['close'])
-    df['dc_upper'] = dc.donchian_channel_hband()
-    df['dc_lower'] = dc.donchian_channel_lband()
-    
-    df['ulcer'] = UlcerIndex(df['close']).ulcer_index()
-
-    # ── 4. 거래량 지표 (Volume) ────────────────────────────
-    df['obv'] = OnBalanceVolumeIndicator(df['close'], df['volume']).on_balance_volume()
-    df['mfi'] = MFIIndicator(df['high'], df['low'], df['close'], df['volume']).money_flow_index()
-    df['cmf'] = ChaikinMoneyFlowIndicator(df['high'], df['low'], df['close'], df['volume']).chaikin_money_flow()
-    df['em'] = EaseOfMovementIndicator(df['high'], df['low'], df['volume']).ease_of_movement()
-    df['force_index'] = ForceIndexIndicator(df['close'], df['volume']).force_index()
-    df['nvi'] = NegativeVolumeIndexIndicator(df['close'], df['volume']).negative_volume_index()
-    
-    df['volume_sma_20'] = df['volume'].rolling(20).mean()
-    df['volume_ratio'] = df['volume'] / df['volume_sma_20']
-
-    # ── 5. 바이낸스 선물 및 수익률 파생 피처 ────────────────
-    # 펀딩비 피처 추가 (data_fetcher에서 로드된 경우)
-    if 'fundingrate' in df.columns:
-        df['funding_rate'] = df['fundingrate']
-    elif 'fundingRate' in df.columns:
-        df['funding_rate'] = df['fundingRate']
-    else:
-        df['funding_rate'] = 0.0
-
-    # 수익률 및 변동성 (Rolling Std)
-    for w in [1, 3, 7, 14, 21]:
-        df[f'return_{w}'] = df['close'].pct_change(w)
-        if w > 1:
-            df[f'vol_{w}'] = df['close'].pct_change(1).rolling(w).std()
-        # FIX: vol_1 (window 1)은 계산 불가능하므로 0이 아닌 제외
-    
-    df['high_low_ratio'] = (df['high'] - df['low']) / df['close']
-    df['close_open_ratio'] = (df['close'] - df['open']) / df['open']
-    df['upper_shadow'] = (df['high'] - df[['open','close']].max(axis=1)) / df['close']
-    df['lower_shadow'] = (df[['open','close']].min(axis=1) - df['low']) / df['close']
-
-    # 고차 모멘트 롤링 통계 (왜도, 첨도)
-    for w in [7, 14, 30]:
-        df[f'roll_mean_{w}'] = df['return_1'].rolling(w).mean()
-        df[f'roll_std_{w}'] = df['return_1'].rolling(w).std()
-        df[f'roll_max_{w}'] = df['return_1'].rolling(w).max()
-        df[f'roll_min_{w}'] = df['return_1'].rolling(w).min()
-        df[f'roll_skew_{w}'] = df['return_1'].rolling(w).skew()
-        df[f'roll_kurt_{w}'] = df['return_1'].rolling(w).kurt()
-
-    # 시간 피처 (삼각함수 변환으로 주기성 강조)
-    if isinstance(df.index, pd.DatetimeIndex):
-        df['hour'] = df.index.hour
-        df['dayofweek'] = df.index.dayofweek
-        df['is_weekend'] = (df.index.dayofweek >= 5).astype(int)
-        df['sin_hour'] = np.sin(2 * np.pi * df['hour']/24)
-        df['cos_hour'] = np.cos(2 * np.pi * df['hour']/24)
-    elif 'open time' in df.columns:
-        temp_dt = pd.to_datetime(df['open time'])
-        df['hour'] = temp_dt.dt.hour
-        df['dayofweek'] = temp_dt.dt.dayofweek
-        df['is_weekend'] = (temp_dt.dt.dayofweek >= 5).astype(int)
-        df['sin_hour'] = np.sin(2 * np.pi * df['hour']/24)
-        df['cos_hour'] = np.cos(2 * np.pi * df['hour']/24)
+    values = compute_feature_arrays(df, columns)
+    features = pd.DataFrame({name: values[name] for name in FEATURE_COLUMNS if name in values}, index=df.index)
+    df[list(features.columns)] = features
     
     return df.dropna()
 
-def ensure_stationarity(df: pd.DataFrame, significance: float = 0.05) -> pd.DataFrame:
+def fit_stationarity(df: pd.DataFrame, significance: float = 0.05, workers: int = None) -> dict:
     """
-    ADF 검정으로 비정상성 피처를 퍼센트 변화율로 변환
-    금융 시계열의 핵심 전처리 단계 - XGBoost 성능에 직접 영향
+    ADF 검정으로 비정상성 피처를 골라 변환 계획(plan)을 만듭니다 (학습 시 1회).
+    반환: {'significance', 'diff_columns': 퍼센트 변화율로 바꿀 컬럼 목록, 'p_values': 컬럼별 p-value}
+    계획은 모델 패키지에 저장하고 추론에서는 apply_stationarity로 ADF 없이 그대로 적용합니다.
+    ADF는 adf_batch로 컬럼 묶음 단위 계산 (workers: 프로세스 수, None이면 CPU 수)
     """
-    df = df.copy()
+    candidates = []
     for col in df.select_dtypes(include=[np.number]).columns:
         if col == 'target':
             continue
@@ -157,19 +121,40 @@ def ensure_stationarity(df: pd.DataFrame, significance: float = 0.05) -> pd.Data
         if df[col].nunique() <= 1:
             continue
             
-        vals = df[col].dropna()
-        if len(vals) < 30: # 샘플 수가 너무 적어도 건너뜀
+        if df[col].count() < 30: # 샘플 수가 너무 적어도 건너뜀
             continue
-            
-        try:
-            p_value = adfuller(vals)[1]
-            if p_value > significance: # 비정상 시계열
-                changed = df[col].pct_change()
-                changed = changed.replace([np.inf, -np.inf], np.nan)
-                df[col] = changed
-        except Exception:
-            changed = df[col].pct_change()
-            changed = changed.replace([np.inf, -np.inf], np.nan)
-            df[col] = changed
+        candidates.append(col)
+    
+    results = adf_test_columns(df, candidates, workers=workers)
+    diff_columns = []
+    p_values = {}
+    for col in candidates:
+        p_value = results.at[col, 'p_value']
+        if np.isnan(p_value): # 검정 실패 → 변환 (기존 except 분기)
+            diff_columns.append(col)
+            continue
+        p_values[col] = float(p_value)
+        if p_value > significance: # 비정상 시계열
+            diff_columns.append(col)
+    
+    return {'significance': significance, 'diff_columns': diff_columns, 'p_values': p_values}
+
+def apply_stationarity(df: pd.DataFrame, plan: dict) -> pd.DataFrame:
+    """fit_stationarity 계획대로 컬럼을 퍼센트 변화율로 변환 (ADF 검정 없음)"""
+    df = df.copy()
+    for col in plan['diff_columns']:
+        if col not in df.columns:
+            continue
+        changed = df[col].pct_change()
+        changed = changed.replace([np.inf, -np.inf], np.nan)
+        df[col] = changed
     
     return df.dropna()
+
+def ensure_stationarity(df: pd.DataFrame, significance: float = 0.05) -> pd.DataFrame:
+    """
+    ADF 검정으로 비정상성 피처를 퍼센트 변화율로 변환
+    금융 시계열의 핵심 전처리 단계 - XGBoost 성능에 직접 영향
+    (검정과 변환을 한 번에 수행. 학습/추론 일관성이 필요하면 fit_stationarity 계획을 저장해 apply_stationarity 사용)
+    """
+    return apply_stationarity(df, fit_stationarity(df, significance))
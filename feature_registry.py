@@ -0,0 +1,88 @@
+# ── 선언형 피처 레지스트리 (출력 컬럼 → 계산 함수 + 의존 노드) ──────────
+# 노드 하나가 출력 컬럼 1개 이상을 만들고, 의존 노드(입력 배열 또는 다른 노드의 출력)를 인자로 받습니다.
+# 요청한 컬럼에서 의존 그래프를 거슬러 올라가 필요한 노드만 등록 순서(= 위상 순서)대로 계산합니다.
+# 이름이 '_'로 시작하는 출력은 중간값 (직전 종가, TR, TP 등)으로 결과에 포함하지 않습니다.
+
+
+class FeatureRegistry:
+    """
+    registry.add(outputs, deps, fn): fn(*deps 값) → 출력 1개면 배열, 여러 개면 outputs 순서의 튜플
+    registry.add(outputs, deps, fn, select=True): fn(*deps 값, outputs=[요청된 출력]) → {출력: 배열}
+      (롤링 통계처럼 출력 일부만 계산할 수 있는 묶음 노드)
+    registry.compute(inputs, columns): 요청 컬럼(None이면 전체)만 계산해 {컬럼: 배열} 반환 (등록 순서)
+    """
+
+    def __init__(self, inputs=()):
+        self.inputs = tuple(inputs)
+        self.nodes = [] # (outputs, deps, fn, select)
+        self.producer = {} # 출력 이름 → 노드 번호
+
+    def add(self, outputs, deps, fn, select: bool = False):
+        outputs = (outputs,) if isinstance(outputs, str) else tuple(outputs)
+        deps = (deps,) if isinstance(deps, str) else tuple(deps)
+        for dep in deps:
+            if dep not in self.producer and dep not in self.inputs:
+                raise KeyError(f"등록되지 않은 의존 노드: {dep} (출력 {outputs})")
+        for name in outputs:
+            if name in self.producer or name in self.inputs:
+                raise KeyError(f"이미 등록된 출력: {name}")
+            self.producer[name] = len(self.nodes)
+        self.nodes.append((outputs, deps, fn, select))
+        return fn
+
+    def extend(self, inputs=()) -> 'FeatureRegistry':
+        """이 레지스트리의 노드를 그대로 가진 새 레지스트리 (입력 추가 가능)"""
+        other = FeatureRegistry(self.inputs + tuple(i for i in inputs if i not in self.inputs))
+        other.nodes = list(self.nodes)
+        other.producer = dict(self.producer)
+        return other
+
+    @property
+    def columns(self) -> list:
+        """결과 컬럼 전체 (등록 순서, 중간값 제외)"""
+        return [name for outputs, _, _, _ in self.nodes for name in outputs if not name.startswith('_')]
+
+    def resolve(self, columns=None, available=None) -> dict:
+        """
+        요청 컬럼 계산에 필요한 {노드 번호: 필요한 출력 집합}
+        available(제공된 입력)이 있으면 없는 입력에 의존하는 컬럼은 건너뜀 (columns=None일 때만)
+        """
+        if columns is None:
+            columns = [c for c in self.columns if available is None or self.reachable(c, available)]
+        needed = {}
+        stack = list(columns)
+        while stack:
+            name = stack.pop()
+            if name in self.inputs:
+                continue
+            if name not in self.producer:
+                raise KeyError(f"레지스트리에 없는 피처: {name}")
+            idx = self.producer[name]
+            wanted = needed.setdefault(idx, set())
+            if name in wanted:
+                continue
+            first = not wanted
+            wanted.add(name)
+            if first:
+                stack.extend(self.nodes[idx][1])
+        return needed
+
+    def reachable(self, name: str, available) -> bool:
+        """name이 available 입력만으로 계산 가능한지"""
+        if name in self.inputs:
+            return name in available
+        return all(self.reachable(dep, available) for dep in self.nodes[self.producer[name]][1])
+
+    def compute(self, inputs: dict, columns=None) -> dict:
+        needed = self.resolve(columns, available=inputs.keys())
+        values = dict(inputs)
+        for idx in sorted(needed):
+            outputs, deps, fn, select = self.nodes[idx]
+            args = [values[dep] for dep in deps]
+            if select:
+                values.update(fn(*args, outputs=[o for o in outputs if o in needed[idx]]))
+            else:
+                result = fn(*args)
+                values.update(zip(outputs, result) if len(outputs) > 1 else [(outputs[0], result)])
+        wanted = set().union(*needed.values()) if needed else set()
+        return {name: values[name] for name in self.columns if name in wanted and (columns is None or name in columns)}
@@ -0,0 +1,286 @@
+import os
+import glob
+import json
+import time
+import shutil
+import hashlib
+import inspect
+import importlib
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as pads
+from binance.helpers import interval_to_milliseconds
+from ohlcv_store import DATA_DIR, to_epoch_ms_array
+
+# ── 증분 피처 저장소 (build_features 결과를 디스크에 보관하고 새 봉의 꼬리만 계산) ──
+# 경로: {root}/{symbol}_{interval}/{YYYY 또는 YYYY-MM}.parquet (+ 증분 조각 {키}_{첫 봉 ms}.parquet) + _meta.json
+# 메타: 피처 코드 버전 해시 / 마지막으로 처리한 봉 / 마지막 저장 행 / 마지막 행의 누적 지표 값
+# 증분 행은 기간 파티션을 다시 쓰지 않고 조각 파일로 덧붙이며, 조각이 DELTA_PARTS_MAX개를 넘으면 파티션에 합칩니다.
+# 피처 코드(아래 모듈 소스)가 바뀌면 버전이 달라져 자동으로 전체 재계산합니다.
+
+FEATURE_STORE_DIR = os.path.join(DATA_DIR, "_feature_store")
+FEATURE_CODE_MODULES = ('feature_engineering', 'feature_registry', 'indicators_np', 'rolling_moments')
+TAIL_LOOKBACK_TOL = 1e-10 # 꼬리 재계산 lookback 허용 오차 (lookback.required_bars, 피처 표준편차 단위)
+VERIFY_BARS = 24 # verify=True일 때 저장된 마지막 구간과 재계산 값을 비교하는 봉 수
+VERIFY_RTOL = 1e-6
+CUMULATIVE_ADD = ('obv',) # 누적합 지표: 구간 시작 차이만큼 평행 이동
+CUMULATIVE_MUL = ('nvi',) # 누적곱 지표: 구간 시작 비율만큼 배율 보정
+META_FILE = "_meta.json"
+PARTITION_YEAR_MS = 3_600_000 # 이 간격 이상의 봉은 연 단위 파티션
+DELTA_PARTS_MAX = 24 # 파티션별 증분 조각 파일 수 상한 (넘으면 파티션에 합침)
+
+
+def feature_code_version(modules=FEATURE_CODE_MODULES) -> str:
+    """피처 계산 모듈 소스의 해시 (정의가 바뀌면 저장된 피처를 무효화)"""
+    digest = hashlib.sha1()
+    for name in modules:
+        digest.update(name.encode('utf-8'))
+        digest.update(inspect.getsource(importlib.import_module(name)).encode('utf-8'))
+    return digest.hexdigest()[:12]
+
+
+def _partition_key(open_ms: np.ndarray, interval: str) -> np.ndarray:
+    """파티션 이름: 1h 이상은 연 단위(YYYY), 그보다 짧은 봉은 월 단위(YYYY-MM) (파티션당 수만 행)"""
+    unit = 'datetime64[Y]' if interval_to_milliseconds(interval) >= PARTITION_YEAR_MS else 'datetime64[M]'
+    return open_ms.astype('datetime64[ms]').astype(unit).astype(str)
+
+
+def _path_key(path: str) -> str:
+    """파티션/조각 파일 경로의 기간 키 ('2024.parquet', '2024_1704067200000.parquet' → '2024')"""
+    return os.path.basename(path)[:-len(".parquet")].split('_')[0]
+
+
+class FeatureStore:
+    """
+    심볼/인터벌별 피처 행렬 저장소
+    - update(symbol, interval, bars): 원본 봉에서 저장 이후의 마감 봉만 피처를 계산해 덧붙이고 전체 피처 반환
+      (꼬리 계산은 lookback봉을 앞에 붙여 build_features를 돌린 뒤, 누적 지표를 메타의 저장값에 이어 붙임)
+    - verify=True면 재계산한 마지막 VERIFY_BARS행을 저장값과 비교해 다르면 전체 재계산 (점검용, 저장 구간을 읽어 느림)
+    - load(symbol, interval, start_ms): 저장된 피처 로드
+    """
+
+    def __init__(self, root: str = FEATURE_STORE_DIR, build=None, lookback: int = None, version: str = None, verify: bool = False):
+        if build is None:
+            from feature_engineering import build_features
+            build = build_features
+        self.root = root
+        self.build = build
+        if lookback is None:
+            # 누적 지표(OBV/NVI)는 저장값에 이어 붙이므로 제외
+            from lookback import required_bars
+            lookback = required_bars(tol=TAIL_LOOKBACK_TOL, skip=CUMULATIVE_ADD + CUMULATIVE_MUL, verbose=False)
+        self.lookback = lookback
+        self.verify = verify
+        self.window = lookback + (VERIFY_BARS if verify else 0) # 검증 구간의 첫 행도 같은 이력을 갖도록
+        self.version = version or feature_code_version()
+        os.makedirs(self.root, exist_ok=True)
+
+    def series_dir(self, symbol: str, interval: str) -> str:
+        return os.path.join(self.root, f"{symbol}_{interval}")
+
+    def read_meta(self, symbol: str, interval: str):
+        path = os.path.join(self.series_dir(symbol, interval), META_FILE)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"⚠️ [{symbol} {interval}] 피처 저장소 메타 로드 실패: {e}")
+            return None
+
+    def _write_meta(self, symbol: str, interval: str, first_open_ms: int, last_open_ms: int, last_row: pd.Series, columns: list):
+        path = os.path.join(self.series_dir(symbol, interval), META_FILE)
+        meta = {
+            'version': self.version,
+            'first_open_ms': int(first_open_ms),
+            'last_open_ms': int(last_open_ms),
+            'last_row_ms': int(to_epoch_ms_array(pd.Series([last_row['open time']]))[0]),
+            'anchor': {c: float(last_row[c]) for c in CUMULATIVE_ADD + CUMULATIVE_MUL if c in last_row.index},
+            'columns': list(columns),
+            'updated_at': int(time.time() * 1000),
+        }
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, path) # 원자적 교체
+
+    def clear(self, symbol: str, interval: str):
+        shutil.rmtree(self.series_dir(symbol, interval), ignore_errors=True)
+
+    def load(self, symbol: str, interval: str, start_ms: int = None) -> pd.DataFrame:
+        """저장된 피처 (open time 오름차순, RangeIndex). start_ms가 있으면 그 봉부터"""
+        paths = sorted(glob.glob(os.path.join(self.series_dir(symbol, interval), "*.parquet")))
+        if start_ms is not None: # 시작 봉 이전 달 파티션은 읽지 않음
+            first_key = _partition_key(np.array([start_ms], dtype=np.int64), interval)[0]
+            paths = [p for p in paths if _path_key(p) >= first_key]
+        if not paths:
+            return pd.DataFrame()
+        df = pads.dataset(paths, format='parquet').to_table().to_pandas()
+        open_ms = to_epoch_ms_array(df['open time'])
+        if len(open_ms) > 1 and (np.diff(open_ms) <= 0).any(): # 조각 합치기 도중 중단되어 남은 중복 행
+            df = df.drop_duplicates(subset=['open time'], keep='last').sort_values('open time', kind='stable')
+            open_ms = to_epoch_ms_array(df['open time'])
+        if start_ms is not None:
+            df = df[open_ms >= start_ms]
+        return df.reset_index(drop=True)
+
+    def _append(self, symbol: str, interval: str, feats: pd.DataFrame):
+        """
+        피처 행(저장된 마지막 행 이후)을 기간 파티션에 덧붙임
+        파티션이 이미 있으면 조각 파일만 새로 쓰고, 조각이 DELTA_PARTS_MAX개를 넘으면 파티션 하나로 합침
+        """
+        series_dir = self.series_dir(symbol, interval)
+        os.makedirs(series_dir, exist_ok=True)
+        feats = feats.reset_index(drop=True)
+        open_ms = to_epoch_ms_array(feats['open time'])
+        keys = _partition_key(open_ms, interval)
+        for key in np.unique(keys):
+            part = feats[keys == key]
+            path = os.path.join(series_dir, f"{key}.parquet")
+            if os.path.exists(path):
+                path = os.path.join(series_dir, f"{key}_{int(open_ms[keys == key][0])}.parquet")
+            tmp_path = path + ".tmp"
+            part.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, path)
+            deltas = sorted(glob.glob(os.path.join(series_dir, f"{key}_*.parquet")))
+            if len(deltas) > DELTA_PARTS_MAX:
+                self._compact(series_dir, key, deltas)
+
+    def _compact(self, series_dir: str, key: str, deltas: list):
+        """기간 파티션과 조각 파일을 한 파일로 합침 (파티션을 먼저 교체한 뒤 조각 삭제)"""
+        path = os.path.join(series_dir, f"{key}.parquet")
+        merged = pd.concat([pd.read_parquet(p) for p in [path] + deltas], ignore_index=True)
+        merged = merged.drop_duplicates(subset=['open time'], keep='last').sort_values('open time', kind='stable')
+        tmp_path = path + ".tmp"
+        merged.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+        for p in deltas:
+            os.remove(p)
+
+    def _rebuild(self, symbol: str, interval: str, bars: pd.DataFrame, open_ms: np.ndarray) -> None:
+        feats = self.build(bars)
+        self.clear(symbol, interval)
+        self._append(symbol, interval, feats)
+        self._write_meta(symbol, interval, open_ms[0], open_ms[-1], feats.iloc[-1], feats.columns)
+        print(f"🧮 [{symbol} {interval}] 피처 전체 계산: {len(bars)}봉 → {len(feats)}행 (버전 {self.version})")
+
+    def _extend(self, symbol: str, interval: str, bars: pd.DataFrame, open_ms: np.ndarray, meta: dict) -> bool:
+        """
+        저장 이후 봉의 피처만 계산해 덧붙임. 이어 붙일 기준이 없거나 (verify=True에서) 재계산한 겹침 구간이
+        저장값과 다르면 False (전체 재계산 필요)
+        """
+        last_ms, anchor_ms = meta['last_open_ms'], meta['last_row_ms']
+        anchor_pos = int(np.searchsorted(open_ms, anchor_ms))
+        window = bars.iloc[anchor_pos - self.window:]
+        local = self.build(window).reset_index(drop=True)
+        local_ms = to_epoch_ms_array(local['open time'])
+        at_local = np.flatnonzero(local_ms == anchor_ms)
+        if len(at_local) == 0:
+            return False
+        i = at_local[0]
+
+        anchor, stored = meta.get('anchor'), None
+        if self.verify or anchor is None: # 누적 지표 기준값이 없는 이전 형식 메타는 저장 구간에서 읽음
+            stored = self.load(symbol, interval, start_ms=int(open_ms[max(anchor_pos - VERIFY_BARS + 1, 0)]))
+            stored_ms = to_epoch_ms_array(stored['open time'])
+            at_stored = np.flatnonzero(stored_ms == anchor_ms)
+            if len(at_stored) == 0:
+                return False
+            anchor = {c: float(stored[c].iloc[at_stored[0]]) for c in CUMULATIVE_ADD + CUMULATIVE_MUL if c in stored.columns}
+
+        # 누적 지표는 구간 시작점이 달라 생긴 차이를 기준 행(마지막 저장 행)에서 맞춤
+        for col in CUMULATIVE_ADD:
+            if col in local.columns and col in anchor:
+                local[col] = local[col] + (anchor[col] - local[col].iloc[i])
+        for col in CUMULATIVE_MUL:
+            if col in local.columns and col in anchor and local[col].iloc[i] != 0:
+                local[col] = local[col] * (anchor[col] / local[col].iloc[i])
+
+        if self.verify: # 겹치는 저장 구간 검증 (lookback이 부족하거나 데이터가 바뀌었으면 다시 계산)
+            overlap = np.isin(local_ms, stored_ms)
+            numeric = [c for c in stored.select_dtypes(include=[np.number]).columns if c in local.columns]
+            a = local.loc[overlap, numeric].to_numpy(dtype=np.float64)
+            b = stored.set_index(stored_ms).loc[local_ms[overlap], numeric].to_numpy(dtype=np.float64)
+            if not np.allclose(a, b, rtol=VERIFY_RTOL, atol=1e-9, equal_nan=True):
+                worst = numeric[int(np.nanargmax(np.nanmax(np.abs(a - b) / (np.abs(b) + 1e-9), axis=0)))]
+                print(f"⚠️ [{symbol} {interval}] 꼬리 재계산 값이 저장값과 다릅니다 ({worst}).")
+                return False
+
+        columns = meta['columns']
+        new = local[local_ms > last_ms]
+        if new.empty:
+            last_row = pd.Series(anchor | {'open time': local['open time'].iloc[i]})
+        else:
+            self._append(symbol, interval, new[columns])
+            last_row = new.iloc[-1]
+        self._write_meta(symbol, interval, meta['first_open_ms'], open_ms[-1], last_row, columns)
+        print(f"🧮 [{symbol} {interval}] 피처 증분 계산: 새 봉 {int((open_ms > last_ms).sum())}개 (+앞 {self.window}봉) → {len(new)}행 추가")
+        return True
+
+    def update(self, symbol: str, interval: str, bars: pd.DataFrame, now_ms: int = None) -> pd.DataFrame:
+        """
+        bars(바이낸스 K-라인 DataFrame, 'Open time' 포함)의 마감 봉까지 피처를 저장하고
+        bars 구간에 해당하는 저장 피처를 반환 (미마감 봉은 값이 바뀌므로 저장/반환하지 않음)
+        """
+        if bars is None or bars.empty:
+            return pd.DataFrame()
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        open_ms = to_epoch_ms_array(bars['Open time'])
+        closed = open_ms + interval_to_milliseconds(interval) <= now_ms
+        bars, open_ms = bars[closed], open_ms[closed]
+        if bars.empty:
+            return pd.DataFrame()
+
+        meta = self.read_meta(symbol, interval)
+        if meta is None or meta.get('version') != self.version:
+            if meta is not None:
+                print(f"ℹ️ [{symbol} {interval}] 피처 코드가 바뀌어 저장된 피처를 다시 계산합니다. ({meta.get('version')} → {self.version})")
+            self._rebuild(symbol, interval, bars, open_ms)
+        elif open_ms[0] < meta['first_open_ms']: # 저장 구간보다 과거 봉이 추가됨
+            self._rebuild(symbol, interval, bars, open_ms)
+        elif open_ms[-1] > meta['last_open_ms']:
+            anchor_pos = int(np.searchsorted(open_ms, meta['last_row_ms']))
+            usable = anchor_pos < len(open_ms) and open_ms[anchor_pos] == meta['last_row_ms'] and anchor_pos >= self.window
+            if not (usable and self._extend(symbol, interval, bars, open_ms, meta)):
+                self._rebuild(symbol, interval, bars, open_ms)
+        return self.load(symbol, interval, start_ms=int(open_ms[0]))
+
+
+def check_incremental(n_bars: int = 6000, new_bars: int = 168, interval: str = '1h', root: str = None, repeat: int = 3) -> pd.Series:
+    """
+    앞 n_bars-new_bars봉으로 저장소를 만든 뒤 new_bars봉을 증분 추가한 결과를
+    전체 봉으로 한 번에 계산한 build_features와 비교 (컬럼별 최대 상대 오차)
+    """
+    import tempfile
+    from indicators_np import random_walk_bars
+    from feature_engineering import build_features
+    bars = random_walk_bars(n_bars, freq='1min' if interval == '1m' else interval)
+    bars.loc[bars.index[::50], 'Volume'] *= 0.2 # NVI가 움직이도록 거래량 감소 봉 포함
+    with tempfile.TemporaryDirectory() as tmp:
+        base, t_inc, t_full = os.path.join(root or tmp, "_base"), [], []
+        FeatureStore(base).update('TEST', interval, bars.iloc[:n_bars - new_bars], now_ms=2**62)
+        for k in range(repeat): # 같은 저장 상태를 복사해 반복 측정 (최솟값)
+            fs = FeatureStore(shutil.copytree(base, os.path.join(root or tmp, f"_run{k}")))
+            t0 = time.time()
+            got = fs.update('TEST', interval, bars, now_ms=2**62)
+            t_inc.append(time.time() - t0)
+            t0 = time.time()
+            ref = build_features(bars).reset_index(drop=True)
+            t_full.append(time.time() - t0)
+    assert len(got) == len(ref) and (got['open time'].to_numpy() == ref['open time'].to_numpy()).all(), "행 구성이 다릅니다"
+    numeric = ref.select_dtypes(include=[np.number]).columns
+    a, b = got[numeric].to_numpy(dtype=np.float64), ref[numeric].to_numpy(dtype=np.float64)
+    errors = pd.Series(np.nanmax(np.abs(a - b) / (np.abs(b) + 1e-9), axis=0), index=numeric).sort_values(ascending=False)
+    print(f"🧪 증분 피처: {n_bars - new_bars}봉 저장 + {new_bars}봉 추가 | 최대 상대 오차 {errors.iloc[0]:.2e} ({errors.index[0]}) | "
+          f"증분 {min(t_inc):.2f}초 vs 전체 {min(t_full):.2f}초")
+    return errors
+
+
+if __name__ == "__main__":
+    import sys
+    if "--bench" in sys.argv:
+        check_incremental(n_bars=3 * 365 * 24) # 주간 재학습: 3년치 1h + 새 168봉
+        check_incremental(n_bars=365 * 24 * 60, interval='1m')
+    else:
+        check_incremental()
@@ -0,0 +1,137 @@
+import os
+import numpy as np
+import pandas as pd
+from ohlcv_store import DATA_DIR, to_epoch_ms_array
+
+# K-라인 봉별로 정렬된 펀딩비 캐시 레코드 (open time ms, fundingRate)
+ALIGNED_DTYPE = np.dtype([('open_time', '<i8'), ('funding_rate', '<f8')])
+ALIGNED_CACHE_VERSION = 2 # v1은 불완전한 펀딩 이력으로 계산한 값도 확정했으므로 버림
+# 이웃한 두 펀딩 시각의 간격이 이보다 크면 그 사이 이력이 빠진 것으로 보고 확정하지 않음 (8시간 주기 + 여유)
+FUNDING_MAX_GAP_MS = int(8 * 3600 * 1000 * 1.01)
+
+
+def funding_path(symbol: str, root: str = DATA_DIR) -> str:
+    return os.path.join(root, f"{symbol}_funding.parquet")
+
+
+def load_funding(symbol: str, root: str = DATA_DIR) -> pd.DataFrame:
+    """
+    저장된 펀딩비 이력 로드 (timestamp: datetime64[ms], fundingRate: float64)
+    Parquet 파일이 없고 예전 CSV만 있으면 1회 이전합니다.
+    """
+    path = funding_path(symbol, root)
+    if not os.path.exists(path):
+        csv_path = os.path.join(root, f"{symbol}_funding.csv")
+        if not os.path.exists(csv_path):
+            return pd.DataFrame()
+        legacy = pd.read_csv(csv_path)
+        legacy['timestamp'] = pd.to_datetime(legacy['timestamp'])
+        save_funding(symbol, legacy, root)
+        print(f"✅ [{symbol}] 펀딩비 CSV → Parquet 이전 완료: {len(legacy)}건")
+    df = pd.read_parquet(path)
+    df['timestamp'] = df['timestamp'].to_numpy(dtype=np.int64).astype('datetime64[ms]')
+    return df
+
+
+def save_funding(symbol: str, df: pd.DataFrame, root: str = DATA_DIR):
+    """펀딩비 이력 저장 (timestamp는 int64 ms로 기록, 중복 제거 및 정렬)"""
+    typed = pd.DataFrame({
+        'timestamp': to_epoch_ms_array(df['timestamp']),
+        'fundingRate': pd.to_numeric(df['fundingRate'], errors='coerce').to_numpy(dtype=np.float64),
+    })
+    typed = typed.drop_duplicates(subset=['timestamp'], keep='last').sort_values('timestamp')
+    path = funding_path(symbol, root)
+    typed.to_parquet(path + ".tmp", index=False)
+    os.replace(path + ".tmp", path)
+
+
+def align_funding(open_ms: np.ndarray, funding_ms: np.ndarray, funding_rate: np.ndarray) -> np.ndarray:
+    """
+    각 봉의 Open time 시점에 유효한(직전) 펀딩비
+    pd.merge_asof(direction='backward') + fillna(0)과 동일한 결과
+    """
+    idx = np.searchsorted(funding_ms, open_ms, side='right') - 1
+    out = np.zeros(len(open_ms), dtype=np.float64)
+    valid = idx >= 0
+    out[valid] = funding_rate[idx[valid]]
+    return out
+
+
+def _covered(open_ms: np.ndarray, funding_ms: np.ndarray) -> np.ndarray:
+    """봉 open time이 빠짐없는 펀딩 이력 구간 안에 있는지 (직전 펀딩과 다음 펀딩이 모두 있고 간격이 정상)"""
+    if len(funding_ms) < 2:
+        return np.zeros(len(open_ms), dtype=bool)
+    idx = np.searchsorted(funding_ms, open_ms, side='right') - 1
+    ok = (idx >= 0) & (idx + 1 < len(funding_ms))
+    gap = funding_ms[np.minimum(idx + 1, len(funding_ms) - 1)] - funding_ms[np.maximum(idx, 0)]
+    return ok & (gap <= FUNDING_MAX_GAP_MS)
+
+
+class AlignedFundingCache:
+    """
+    심볼/인터벌별로 봉에 정렬된 펀딩비 컬럼을 바이너리 파일에 누적 저장합니다 (open_time 오름차순).
+    - 직전/다음 펀딩이 모두 있고 그 간격이 FUNDING_MAX_GAP_MS 이하인(연속 이력 안의) 봉만 캐시에 확정 기록
+      (페이지 실패 등으로 이력에 구멍이 있거나 첫 펀딩 이전인 봉은 매번 새로 계산 → 이력이 보충되면 바로 반영)
+    - 그 밖의 봉과 캐시에 없는 봉만 searchsorted로 새로 계산
+    - 새 확정 행이 캐시 끝 이후뿐이면 꼬리에 추가하고, 캐시 앞/중간 구간이면 병합해 파일을 교체 (과거 구간도 한 번만 계산)
+    - 캐시 조회는 요청 구간 [첫 봉, 마지막 봉]에 해당하는 캐시 범위 안에서만 이분 탐색
+    """
+
+    def __init__(self, symbol: str, interval: str, root: str = DATA_DIR):
+        self.path = os.path.join(root, f"{symbol}_{interval}_funding.v{ALIGNED_CACHE_VERSION}.bin")
+
+    def _read(self) -> np.ndarray:
+        if not os.path.exists(self.path):
+            return np.empty(0, dtype=ALIGNED_DTYPE)
+        n_rows = os.path.getsize(self.path) // ALIGNED_DTYPE.itemsize # 기록 중 끊긴 꼬리 레코드는 무시
+        if n_rows == 0:
+            return np.empty(0, dtype=ALIGNED_DTYPE)
+        return np.memmap(self.path, dtype=ALIGNED_DTYPE, mode='r', shape=(n_rows,))
+
+    def _append(self, records: np.ndarray):
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        with open(self.path, 'ab') as f:
+            f.truncate(size - size % ALIGNED_DTYPE.itemsize)
+            f.write(records.tobytes())
+
+    def _merge(self, cache: np.ndarray, records: np.ndarray):
+        """캐시 앞/중간에 들어갈 확정 행을 병합해 파일 전체를 원자적으로 교체"""
+        merged = np.concatenate([np.asarray(cache), records])
+        merged = merged[np.argsort(merged['open_time'], kind='stable')]
+        tmp_path = self.path + ".tmp"
+        merged.tofile(tmp_path)
+        os.replace(tmp_path, self.path)
+
+    def column(self, open_ms: np.ndarray, funding_ms: np.ndarray, funding_rate: np.ndarray) -> np.ndarray:
+        """open_ms(오름차순) 각 봉의 펀딩비. 캐시에 없는 행만 정렬 계산 후 확정분을 캐시에 추가"""
+        open_ms = np.asarray(open_ms, dtype=np.int64)
+        out = np.zeros(len(open_ms), dtype=np.float64)
+        if len(open_ms) == 0:
+            return out
+        cache = self._read()
+        full_open = cache['open_time']
+
+        # 요청 구간에 해당하는 캐시 범위만 잘라 탐색 (memmap에서 그 범위 페이지만 읽음)
+        lo = int(np.searchsorted(full_open, open_ms[0], side='left'))
+        hi = int(np.searchsorted(full_open, open_ms[-1], side='right'))
+        window = cache[lo:hi]
+        cache_open = window['open_time']
+        pos = np.searchsorted(cache_open, open_ms)
+        hit = pos < len(cache_open)
+        hit[hit] = cache_open[pos[hit]] == open_ms[hit]
+        out[hit] = window['funding_rate'][pos[hit]]
+
+        miss = ~hit
+        if miss.any():
+            out[miss] = align_funding(open_ms[miss], funding_ms, funding_rate)
+            # 확정된 값(연속 펀딩 이력 안의 봉)만 캐시에 기록
+            final = miss & _covered(open_ms, np.asarray(funding_ms, dtype=np.int64))
+            if final.any():
+                records = np.empty(int(final.sum()), dtype=ALIGNED_DTYPE)
+                records['open_time'] = open_ms[final]
+                records['funding_rate'] = out[final]
+                if len(full_open) == 0 or records['open_time'][0] > full_open[-1]:
+                    self._append(records)
+                else:
+                    self._merge(cache, records)
+        return out
@@ -0,0 +1,434 @@
+import time
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from feature_registry import FeatureRegistry
+
+# ── NumPy 전용 기술적 지표 커널 (build_features의 ta 호출 대체) ──────────
+# ta 라이브러리와 같은 정의(초기값, min_periods, 0 나눗셈 결과 포함)를 배열 연산으로 계산합니다.
+# 공통 중간값은 한 번만 만듭니다: 직전 종가 / TR(ATR·ADX) / 전형가격 TP(CCI·MFI·KC) / EMA 커널(MACD·TRIX·EMA·RSI·Force)
+
+# build_features가 만드는 지표 컬럼 (생성 순서 그대로)
+INDICATOR_COLUMNS = [
+    'rsi_14', 'rsi_7', 'rsi_21', 'stoch_k', 'stoch_d', 'williams_r', 'roc_10', 'roc_20', 'trix',
+    'macd', 'macd_signal', 'macd_diff', 'ema_7', 'ema_25', 'ema_99',
+    'adx', 'adx_pos', 'adx_neg', 'cci', 'ichi_a', 'ichi_b', 'ichi_base', 'ichi_conv', 'psar',
+    'bb_upper', 'bb_lower', 'bb_width', 'bb_pct', 'atr_14', 'kc_upper', 'kc_lower', 'dc_upper', 'dc_lower', 'ulcer',
+    'obv', 'mfi', 'cmf', 'em', 'force_index', 'nvi',
+]
+
+
+# ── 공통 커널 ──────────────────────────────────────────────
+def linear_recurrence(x: np.ndarray, beta: float, gain: float, start: int, seed: float) -> np.ndarray:
+    """
+    y[start] = seed, y[t] = beta * y[t-1] + gain * x[t] (t > start), start 이전은 NaN
+    블록 단위 닫힌 식으로 계산합니다: 블록 안에서 y = beta^j * (y_prev + cumsum(gain * x / beta^j)).
+    블록 길이는 beta^-j가 넘치지 않도록(약 e^300) 정하므로 파이썬 반복은 n / 블록 길이 번뿐입니다.
+    """
+    n = len(x)
+    y = np.full(n, np.nan)
+    if start >= n:
+        return y
+    y[start] = seed
+    if beta <= 0:
+        y[start + 1:] = gain * x[start + 1:]
+        return y
+    block = int(min(4096, max(1, 300.0 / -np.log(beta)))) if beta < 1 else 4096
+    powers = beta ** np.arange(1, block + 1)
+    prev = seed
+    t = start + 1
+    while t < n:
+        e = min(t + block, n)
+        p = powers[:e - t]
+        y[t:e] = p * (prev + np.cumsum(gain * x[t:e] / p))
+        prev = y[e - 1]
+        t = e
+    return y
+
+
+def ewm_mean(x: np.ndarray, alpha: float, min_periods: int) -> np.ndarray:
+    """pandas ewm(alpha, adjust=False, min_periods).mean(): 첫 유효값에서 시작, min_periods개 전까지 NaN"""
+    valid = np.flatnonzero(~np.isnan(x))
+    if len(valid) == 0:
+        return np.full(len(x), np.nan)
+    first = int(valid[0])
+    y = linear_recurrence(x, 1.0 - alpha, alpha, first, x[first])
+    y[:first + max(min_periods, 1) - 1] = np.nan
+    return y
+
+
+def ema(x: np.ndarray, span: int) -> np.ndarray:
+    """ta.utils._ema (span, adjust=False, min_periods=span)"""
+    return ewm_mean(x, 2.0 / (span + 1.0), span)
+
+
+def shift(x: np.ndarray, k: int = 1) -> np.ndarray:
+    out = np.full(len(x), np.nan)
+    if k < len(x):
+        out[k:] = x[:len(x) - k]
+    return out
+
+
+def _windows(x: np.ndarray, w: int, pad_value: float = np.nan) -> np.ndarray:
+    """길이 n의 (n, w) 슬라이딩 윈도우 뷰 (앞쪽은 pad_value로 채워 행 수를 맞춤)"""
+    padded = np.concatenate([np.full(w - 1, pad_value), x])
+    return sliding_window_view(padded, w)
+
+
+def rolling_sum(x: np.ndarray, w: int) -> np.ndarray:
+    """rolling(w).sum() (윈도우가 차지 않았거나 NaN이 있으면 NaN)"""
+    return _windows(x, w).sum(axis=1)
+
+
+def rolling_mean(x: np.ndarray, w: int, min_periods: int = None) -> np.ndarray:
+    """rolling(w, min_periods).mean() (min_periods < w면 앞쪽은 있는 값만으로 평균)"""
+    out = _windows(x, w).mean(axis=1)
+    if min_periods is not None and min_periods < w:
+        head = min(w - 1, len(x))
+        counts = np.arange(1, head + 1)
+        out[:head] = np.cumsum(x[:head]) / counts
+        if min_periods > 1:
+            out[:min_periods - 1] = np.nan
+    return out
+
+
+def rolling_std(x: np.ndarray, w: int, ddof: int = 1) -> np.ndarray:
+    return _windows(x, w).std(axis=1, ddof=ddof)
+
+
+def rolling_max(x: np.ndarray, w: int, min_periods: int = None) -> np.ndarray:
+    if min_periods is not None and min_periods < w:
+        out = _windows(x, w, -np.inf).max(axis=1)
+        out[:max(min_periods, 1) - 1] = np.nan
+        return out
+    return _windows(x, w).max(axis=1)
+
+
+def rolling_min(x: np.ndarray, w: int, min_periods: int = None) -> np.ndarray:
+    if min_periods is not None and min_periods < w:
+        out = _windows(x, w, np.inf).min(axis=1)
+        out[:max(min_periods, 1) - 1] = np.nan
+        return out
+    return _windows(x, w).min(axis=1)
+
+
+# ── 지표 (ta 구현과 같은 정의) ──────────────────────────────────
+def rsi(diff: np.ndarray, window: int) -> np.ndarray:
+    """ta.momentum.RSIIndicator (Wilder EWM, alpha=1/window)"""
+    up = np.where(diff > 0, diff, 0.0)
+    dn = np.where(diff < 0, -diff, 0.0)
+    emaup = ewm_mean(up, 1.0 / window, window)
+    emadn = ewm_mean(dn, 1.0 / window, window)
+    return np.where(emadn == 0, 100.0, 100 - (100 / (1 + emaup / emadn)))
+
+
+def adx(high: np.ndarray, low: np.ndarray, dm: np.ndarray, window: int = 14):
+    """
+    ta.trend.ADXIndicator: 첫 window개 합 → Wilder 누적(y - y/w + x), DX 평균 → Wilder 평활
+    dm은 TR과 같은 max(high, 직전 종가) - min(low, 직전 종가) 배열
+    """
+    n, w = len(high), window
+    adx_out, pos_out, neg_out = np.zeros(n), np.zeros(n), np.zeros(n)
+    if n <= w:
+        return adx_out, pos_out, neg_out
+    diff_up = high - shift(high)
+    diff_down = shift(low) - low
+    pos = np.where((diff_up > diff_down) & (diff_up > 0), diff_up, 0.0)
+    neg = np.where((diff_down > diff_up) & (diff_down > 0), diff_down, 0.0)
+
+    beta = 1.0 - 1.0 / w
+    trs = linear_recurrence(dm, beta, 1.0, w, dm[1:w + 1].sum())
+    dip_s = linear_recurrence(pos, beta, 1.0, w, pos[1:w + 1].sum())
+    din_s = linear_recurrence(neg, beta, 1.0, w, neg[1:w + 1].sum())
+    safe = np.where(trs[w:] != 0, trs[w:], 1.0)
+    dip = np.where(trs[w:] != 0, 100 * (dip_s[w:] / safe), 0.0)
+    din = np.where(trs[w:] != 0, 100 * (din_s[w:] / safe), 0.0)
+    total = dip + din
+    dx = np.where(total != 0, 100 * np.abs((dip - din) / np.where(total != 0, total, 1.0)), 0.0)
+
+    pos_out[w + 1:] = dip[1:]
+    neg_out[w + 1:] = din[1:]
+    if n > 2 * w - 1:
+        seed = dx[:w].mean()
+        adx_out[2 * w - 1:] = linear_recurrence(dx, beta, 1.0 / w, w - 1, seed)[w - 1:]
+    return adx_out, pos_out, neg_out
+
+
+def psar(high: np.ndarray, low: np.ndarray, close: np.ndarray, step: float = 0.02, max_step: float = 0.20) -> np.ndarray:
+    """ta.trend.PSARIndicator (분기가 있는 순차 재귀라 파이썬 float 리스트로 1회 순회)"""
+    h, l = high.tolist(), low.tolist()
+    out = close.astype(np.float64).tolist()
+    up_trend = True
+    af = step
+    up_high, down_low = h[0], l[0]
+    for i in range(2, len(out)):
+        reversal = False
+        if up_trend:
+            p = out[i - 1] + af * (up_high - out[i - 1])
+            if l[i] < p:
+                reversal = True
+                p = up_high
+                down_low = l[i]
+                af = step
+            else:
+                if h[i] > up_high:
+                    up_high = h[i]
+                    af = min(af + step, max_step)
+                if l[i - 2] < p:
+                    p = l[i - 2]
+                elif l[i - 1] < p:
+                    p = l[i - 1]
+        else:
+            p = out[i - 1] - af * (out[i - 1] - down_low)
+            if h[i] > p:
+                reversal = True
+                p = down_low
+                up_high = h[i]
+                af = step
+            else:
+                if l[i] < down_low:
+                    down_low = l[i]
+                    af = min(af + step, max_step)
+                if h[i - 2] > p:
+                    p = h[i - 2]
+                elif h[i - 1] > p:
+                    p = h[i - 1]
+        up_trend = up_trend != reversal
+        out[i] = p
+    return np.asarray(out)
+
+
+def atr(tr: np.ndarray, window: int = 14) -> np.ndarray:
+    """ta.volatility.AverageTrueRange (window-1 번째 봉에 TR 평균, 이후 Wilder. 그 전은 0)"""
+    out = np.zeros(len(tr))
+    if len(tr) < window:
+        return out
+    w = window
+    out[w - 1:] = linear_recurrence(tr, 1.0 - 1.0 / w, 1.0 / w, w - 1, tr[:w].mean())[w - 1:]
+    return out
+
+
+# ── 지표 레지스트리 (컬럼별 계산 함수 + 의존 노드) ──────────────────
+# 공통 중간값(_pc, _tr, _tp 등)은 노드로 두어 여러 지표가 공유하고, 요청한 컬럼에 필요한 노드만 계산합니다.
+INDICATOR_REGISTRY = FeatureRegistry(inputs=('open', 'high', 'low', 'close', 'volume'))
+_reg = INDICATOR_REGISTRY.add
+
+# 공통 중간값
+_reg('_pc', 'close', lambda c: shift(c))
+_reg('_diff', ('close', '_pc'), lambda c, pc: c - pc)
+_reg('_tr', ('high', 'low', '_pc'), lambda h, l, pc: np.fmax(h - l, np.fmax(np.abs(h - pc), np.abs(l - pc)))) # 첫 봉은 high - low
+_reg('_dm', ('high', 'low', '_pc'), lambda h, l, pc: np.maximum(h, pc) - np.minimum(l, pc)) # ADX용 (첫 봉 NaN)
+_reg('_tp', ('high', 'low', 'close'), lambda h, l, c: (h + l + c) / 3.0)
+
+# 1. 모멘텀
+for _w in (14, 7, 21):
+    _reg(f'rsi_{_w}', '_diff', lambda diff, w=_w: rsi(diff, w))
+_reg(('_low14', '_high14'), ('low', 'high'), lambda l, h: (rolling_min(l, 14), rolling_max(h, 14)))
+_reg('stoch_k', ('close', '_low14', '_high14'), lambda c, low14, high14: 100 * (c - low14) / (high14 - low14))
+_reg('stoch_d', 'stoch_k', lambda k: rolling_mean(k, 3))
+_reg('williams_r', ('close', '_low14', '_high14'), lambda c, low14, high14: -100 * (high14 - c) / (high14 - low14))
+for _w in (10, 20):
+    _reg(f'roc_{_w}', 'close', lambda c, w=_w: ((c - shift(c, w)) / shift(c, w)) * 100)
+
+
+def _trix(c):
+    ema3 = ema(ema(ema(c, 15), 15), 15)
+    prev3 = shift(ema3)
+    return (ema3 - prev3) / prev3 * 100
+
+
+_reg('trix', 'close', _trix)
+
+# 2. 트렌드
+_reg('macd', 'close', lambda c: ema(c, 12) - ema(c, 26))
+_reg('macd_signal', 'macd', lambda macd: ema(macd, 9))
+_reg('macd_diff', ('macd', 'macd_signal'), lambda macd, signal: macd - signal)
+for _w in (7, 25, 99):
+    _reg(f'ema_{_w}', 'close', lambda c, w=_w: ema(c, w))
+_reg(('adx', 'adx_pos', 'adx_neg'), ('high', 'low', '_dm'), lambda h, l, dm: adx(h, l, dm, 14))
+
+
+def _cci(tp):
+    tp_windows = _windows(tp, 20)
+    tp_mean = tp_windows.mean(axis=1)
+    mad = np.abs(tp_windows - tp_mean[:, None]).mean(axis=1)
+    return (tp - tp_mean) / (0.015 * mad)
+
+
+_reg('cci', '_tp', _cci)
+_reg('_conv', ('high', 'low'), lambda h, l: 0.5 * (rolling_max(h, 9) + rolling_min(l, 9)))
+_reg('_base', ('high', 'low'), lambda h, l: 0.5 * (rolling_max(h, 26) + rolling_min(l, 26)))
+_reg('ichi_a', ('_conv', '_base'), lambda conv, base: 0.5 * (conv + base))
+_reg('ichi_b', ('high', 'low'), lambda h, l: 0.5 * (rolling_max(h, 52, min_periods=0) + rolling_min(l, 52, min_periods=0)))
+_reg('ichi_base', '_base', lambda base: base)
+_reg('ichi_conv', '_conv', lambda conv: conv)
+_reg('psar', ('high', 'low', 'close'), psar)
+
+# 3. 변동성
+_reg(('bb_upper', 'bb_lower', '_bb_mavg'), 'close',
+     lambda c: (lambda mavg, mstd: (mavg + 2 * mstd, mavg - 2 * mstd, mavg))(rolling_mean(c, 20), rolling_std(c, 20, ddof=0)))
+_reg('bb_width', ('bb_upper', 'bb_lower', '_bb_mavg'), lambda hband, lband, mavg: ((hband - lband) / mavg) * 100)
+_reg('bb_pct', ('close', 'bb_upper', 'bb_lower'), lambda c, hband, lband: (c - lband) / np.where(hband != lband, hband - lband, np.nan))
+_reg('atr_14', '_tr', lambda tr: atr(tr, 14))
+_reg('kc_upper', ('high', 'low', 'close'), lambda h, l, c: rolling_mean(((4 * h) - (2 * l) + c) / 3.0, 20, min_periods=0))
+_reg('kc_lower', ('high', 'low', 'close'), lambda h, l, c: rolling_mean(((-2 * h) + (4 * l) + c) / 3.0, 20, min_periods=0))
+_reg('dc_upper', 'high', lambda h: rolling_max(h, 20))
+_reg('dc_lower', 'low', lambda l: rolling_min(l, 20))
+
+
+def _ulcer(c):
+    ui_max = rolling_max(c, 14, min_periods=1)
+    r_i = 100 * (c - ui_max) / ui_max
+    return np.sqrt((_windows(r_i, 14) ** 2 / 14).sum(axis=1))
+
+
+_reg('ulcer', 'close', _ulcer)
+
+# 4. 거래량
+_reg('obv', ('close', '_pc', 'volume'), lambda c, pc, v: np.cumsum(np.where(c < pc, -v, v)))
+
+
+def _mfi(tp, v):
+    prev_tp = shift(tp)
+    mfr = tp * v * np.where(tp > prev_tp, 1, np.where(tp < prev_tp, -1, 0))
+    mfr_windows = _windows(mfr, 14)
+    pos_mf = np.where(mfr_windows >= 0.0, mfr_windows, 0.0).sum(axis=1)
+    neg_mf = np.abs(np.where(mfr_windows < 0.0, mfr_windows, 0.0).sum(axis=1))
+    pos_mf[np.isnan(mfr_windows).any(axis=1)] = np.nan
+    return 100 - (100 / (1 + pos_mf / neg_mf))
+
+
+def _cmf(h, l, c, v):
+    mfv = ((c - l) - (h - c)) / (h - l)
+    mfv = np.where(np.isnan(mfv), 0.0, mfv) * v
+    return rolling_sum(mfv, 20) / rolling_sum(v, 20)
+
+
+def _nvi(c, pc, v):
+    factor = np.where(shift(v) > v, 1.0 + (c / pc - 1), 1.0)
+    factor[0] = 1.0
+    return 1000 * np.cumprod(factor)
+
+
+_reg('mfi', ('_tp', 'volume'), _mfi)
+_reg('cmf', ('high', 'low', 'close', 'volume'), _cmf)
+_reg('em', ('high', 'low', 'volume'), lambda h, l, v: (np.diff(h, prepend=np.nan) + np.diff(l, prepend=np.nan)) * (h - l) / (2 * v) * 100000000)
+_reg('force_index', ('_diff', 'volume'), lambda diff, v: ema(diff * v, 13))
+_reg('nvi', ('close', '_pc', 'volume'), _nvi)
+
+
+def compute_indicators(open_, high, low, close, volume, columns=None) -> dict:
+    """
+    build_features의 기술적 지표 {컬럼명: ndarray} (INDICATOR_COLUMNS 순서)
+    입력은 pandas Series 또는 ndarray (같은 길이). columns를 주면 그 지표와 의존 노드만 계산
+    """
+    names = ('open', 'high', 'low', 'close', 'volume')
+    inputs = {name: np.asarray(a, dtype=np.float64) for name, a in zip(names, (open_, high, low, close, volume))}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return INDICATOR_REGISTRY.compute(inputs, columns)
+
+
+# ── ta 대비 패리티 / 벤치마크 ──────────────────────────────────
+def ta_reference(df: pd.DataFrame) -> dict:
+    """같은 지표를 ta 라이브러리로 계산 (기존 build_features 코드 그대로)"""
+    from ta.momentum import RSIIndicator, StochasticOscillator, WilliamsRIndicator, ROCIndicator
+    from ta.trend import MACD, EMAIndicator, ADXIndicator, CCIIndicator, IchimokuIndicator, TRIXIndicator, PSARIndicator
+    from ta.volatility import BollingerBands, AverageTrueRange, KeltnerChannel, DonchianChannel, UlcerIndex
+    from ta.volume import OnBalanceVolumeIndicator, MFIIndicator, ChaikinMoneyFlowIndicator, EaseOfMovementIndicator, ForceIndexIndicator, NegativeVolumeIndexIndicator
+    df = df.reset_index(drop=True)
+    df.columns = [col.lower() for col in df.columns]
+    high, low, close, volume = df['high'], df['low'], df['close'], df['volume']
+    out = {}
+    for w in (14, 7, 21):
+        out[f'rsi_{w}'] = RSIIndicator(close, window=w).rsi()
+    stoch = StochasticOscillator(high, low, close)
+    out['stoch_k'], out['stoch_d'] = stoch.stoch(), stoch.stoch_signal()
+    out['williams_r'] = WilliamsRIndicator(high, low, close).williams_r()
+    out['roc_10'] = ROCIndicator(close, window=10).roc()
+    out['roc_20'] = ROCIndicator(close, window=20).roc()
+    out['trix'] = TRIXIndicator(close).trix()
+    macd = MACD(close)
+    out['macd'], out['macd_signal'], out['macd_diff'] = macd.macd(), macd.macd_signal(), macd.macd_diff()
+    for w in (7, 25, 99):
+        out[f'ema_{w}'] = EMAIndicator(close, window=w).ema_indicator()
+    adx_ind = ADXIndicator(high, low, close)
+    out['adx'], out['adx_pos'], out['adx_neg'] = adx_ind.adx(), adx_ind.adx_pos(), adx_ind.adx_neg()
+    out['cci'] = CCIIndicator(high, low, close).cci()
+    ichi = IchimokuIndicator(high, low)
+    out['ichi_a'], out['ichi_b'] = ichi.ichimoku_a(), ichi.ichimoku_b()
+    out['ichi_base'], out['ichi_conv'] = ichi.ichimoku_base_line(), ichi.ichimoku_conversion_line()
+    out['psar'] = PSARIndicator(high, low, close).psar()
+    bb = BollingerBands(close)
+    out['bb_upper'], out['bb_lower'] = bb.bollinger_hband(), bb.bollinger_lband()
+    out['bb_width'], out['bb_pct'] = bb.bollinger_wband(), bb.bollinger_pband()
+    out['atr_14'] = AverageTrueRange(high, low, close, window=14).average_true_range()
+    kc = KeltnerChannel(high, low, close)
+    out['kc_upper'], out['kc_lower'] = kc.keltner_channel_hband(), kc.keltner_channel_lband()
+    dc = DonchianChannel(high, low, close)
+    out['dc_upper'], out['dc_lower'] = dc.donchian_channel_hband(), dc.donchian_channel_lband()
+    out['ulcer'] = UlcerIndex(close).ulcer_index()
+    out['obv'] = OnBalanceVolumeIndicator(close, volume).on_balance_volume()
+    out['mfi'] = MFIIndicator(high, low, close, volume).money_flow_index()
+    out['cmf'] = ChaikinMoneyFlowIndicator(high, low, close, volume).chaikin_money_flow()
+    out['em'] = EaseOfMovementIndicator(high, low, volume).ease_of_movement()
+    out['force_index'] = ForceIndexIndicator(close, volume).force_index()
+    out['nvi'] = NegativeVolumeIndexIndicator(close, volume).negative_volume_index()
+    return {k: s.to_numpy(dtype=np.float64) for k, s in out.items()}
+
+
+def check_parity(df: pd.DataFrame, rtol: float = 1e-6, atol: float = 1e-9) -> pd.Series:
+    """
+    compute_indicators와 ta 결과를 컬럼별로 비교 (NaN 위치 일치 + 최대 상대 오차)
+    허용 오차를 넘는 컬럼이 있으면 AssertionError
+    """
+    ref = ta_reference(df)
+    ours = compute_indicators(df['Open'], df['High'], df['Low'], df['Close'], df['Volume'])
+    errors = {}
+    for col in INDICATOR_COLUMNS:
+        a, b = ours[col], ref[col]
+        with np.errstate(invalid='ignore'):
+            err = np.where((a == b) | (np.isnan(a) & np.isnan(b)), 0.0, np.abs(a - b) / (np.abs(b) + atol / rtol))
+        errors[col] = float(np.max(np.nan_to_num(err, nan=np.inf))) if len(b) else 0.0
+    errors = pd.Series(errors).sort_values(ascending=False)
+    print(f"🧪 ta 패리티: {len(df)}봉 x {len(errors)}지표 | 최대 상대 오차 {errors.iloc[0]:.2e} ({errors.index[0]})")
+    bad = errors[errors > rtol]
+    assert bad.empty, f"허용 오차 초과 지표: {bad.to_dict()}"
+    return errors
+
+
+def random_walk_bars(n_bars: int, freq: str = '1h', seed: int = 0) -> pd.DataFrame:
+    """벤치마크/패리티용 랜덤 워크 OHLCV"""
+    rng = np.random.default_rng(seed)
+    close = 0.5 * np.exp(np.cumsum(rng.normal(0, 0.01, n_bars)))
+    open_ = np.r_[close[0], close[:-1]] * (1 + rng.normal(0, 0.001, n_bars))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.004, n_bars)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.004, n_bars)))
+    return pd.DataFrame({
+        'Open time': pd.date_range('2022-01-01', periods=n_bars, freq=freq),
+        'Open': open_, 'High': high, 'Low': low, 'Close': close,
+        'Volume': rng.lognormal(8, 0.5, n_bars),
+    })
+
+
+def benchmark(sizes=(('1h', 3 * 365 * 24), ('1m', 3 * 365 * 24 * 60)), ta_max_bars: int = 200_000):
+    """3년치 1h / 1m 봉에서 ta 대비 계산 시간 비교 (ta는 ta_max_bars봉까지만 재고 봉 수에 비례해 환산)"""
+    for freq, n_bars in sizes:
+        df = random_walk_bars(n_bars, freq='1min' if freq == '1m' else freq)
+        t0 = time.time()
+        compute_indicators(df['Open'], df['High'], df['Low'], df['Close'], df['Volume'])
+        t_np = time.time() - t0
+
+        n_ta = min(n_bars, ta_max_bars)
+        t0 = time.time()
+        ta_reference(df.iloc[:n_ta])
+        t_ta = (time.time() - t0) * n_bars / n_ta
+        note = "" if n_ta == n_bars else f" (ta는 {n_ta:,}봉 측정 후 환산)"
+        print(f"⏱️ [{freq} {n_bars:,}봉] NumPy {t_np:.2f}초 | ta {t_ta:.2f}초 | {t_ta / t_np:.1f}배{note}")
+
+
+if __name__ == "__main__":
+    import sys
+    if "--bench" in sys.argv:
+        benchmark()
+    else:
+        check_parity(random_walk_bars(5000))
@@ -0,0 +1,244 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+from binance.helpers import interval_to_milliseconds
+from ohlcv_store import DATA_DIR, to_epoch_ms_array
+from mmap_store import MmapOHLCV, FIELD_TO_COLUMN, mmap_path
+
+# ── 봉 내부(intrabar) 배리어 판정 (하위 타임프레임 memmap 파일 사용) ─────────
+# 상위 봉(예: 1h) 하나에서 고가가 TP, 저가가 SL을 모두 넘으면 봉 데이터만으로는 어느 쪽이 먼저인지 알 수 없습니다.
+# 그런 봉만 골라 같은 시간대의 1m 레코드를 보고 먼저 닿은 배리어를 정합니다.
+# 상위 봉 → 1m 행 범위 인덱스(버킷 경계의 행 번호)를 파일 옆에 저장해 두므로,
+# 판정할 때 읽는 것은 충돌 봉에 해당하는 1m 레코드뿐입니다 (전체 open_time 스캔 없음).
+# 1m 데이터가 없거나 같은 1m 봉에서 둘 다 닿으면 기존처럼 익절 우선으로 둡니다.
+INDEX_SUFFIX = ".{interval}.idx.npz"
+
+
+class IntrabarIndex:
+    """
+    하위 봉 memmap 파일의 상위 봉 버킷 → [lo, hi) 행 범위 인덱스
+    starts[k] = open_time >= base + k*step 인 첫 행 (k번째 상위 봉의 행 범위 = starts[k]:starts[k+1])
+    인덱스를 만든 뒤 추가된 행만 읽어 꼬리 경계를 갱신합니다.
+    """
+
+    def __init__(self, symbol: str, interval: str = '1h', minute_interval: str = '1m', root: str = DATA_DIR):
+        self.symbol, self.interval, self.minute_interval = symbol, interval, minute_interval
+        self.step = interval_to_milliseconds(interval)
+        self.path = mmap_path(symbol, minute_interval, root) + INDEX_SUFFIX.format(interval=interval)
+        self.file = None
+        self.base, self.n_rows, self.starts = None, 0, np.zeros(1, dtype=np.int64)
+        minute_path = mmap_path(symbol, minute_interval, root)
+        if not os.path.exists(minute_path): # 빈 파일을 만들지 않도록 존재 여부 먼저 확인
+            print(f"⚠️ [{symbol}] {minute_interval} 바이너리 파일이 없어 봉 내부 판정을 건너뜁니다: {minute_path}")
+            return
+        self.file = MmapOHLCV(minute_path)
+        self.inode = os.stat(minute_path).st_ino # 보충 봉 반영으로 파일이 다시 쓰이면 바뀜 → 인덱스 재생성
+        self._load()
+        self.refresh()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path) as saved:
+                if int(saved['step']) == self.step and 'inode' in saved and int(saved['inode']) == self.inode:
+                    self.base, self.n_rows, self.starts = int(saved['base']), int(saved['n_rows']), saved['starts']
+        except Exception as e:
+            print(f"⚠️ [{self.symbol}] intrabar 인덱스 로드 실패, 다시 만듭니다: {e}")
+
+    def _save(self):
+        tmp_path = self.path + ".tmp.npz"
+        np.savez(tmp_path, step=self.step, inode=self.inode, base=self.base, n_rows=self.n_rows, starts=self.starts)
+        os.replace(tmp_path, self.path) # 원자적 교체
+
+    def refresh(self) -> int:
+        """인덱스 이후 추가된 하위 봉을 반영 (추가 행의 open_time만 읽음). 반환: 반영한 행 수"""
+        if self.file is None:
+            return 0
+        records = self.file.read()
+        n = len(records)
+        if n < self.n_rows: # 파일이 다시 만들어짐 → 처음부터
+            self.base, self.n_rows = None, 0
+        if n <= self.n_rows:
+            return 0
+        tail = np.asarray(records['open_time'][self.n_rows:])
+        if self.base is None:
+            self.base = int(tail[0]) // self.step * self.step
+            self.starts = np.zeros(1, dtype=np.int64)
+        # 마지막으로 알던 행 이후 시각의 버킷 경계만 다시 계산 (그 이전 경계는 그대로)
+        last_known = int(records['open_time'][self.n_rows - 1]) if self.n_rows else self.base - 1
+        first_k = max(0, (last_known - self.base) // self.step + 1)
+        last_k = (int(tail[-1]) - self.base) // self.step + 1
+        bounds = self.base + np.arange(first_k, last_k + 1, dtype=np.int64) * self.step
+        starts = np.empty(last_k + 1, dtype=np.int64)
+        starts[:first_k] = self.starts[:first_k]
+        starts[first_k:] = self.n_rows + np.searchsorted(tail, bounds, side='left')
+        self.starts, self.n_rows = starts, n
+        self._save()
+        return len(tail)
+
+    def rows(self, parent_open_ms: int) -> tuple:
+        """상위 봉 open time(ms)의 하위 봉 행 범위 [lo, hi) (없으면 (0, 0))"""
+        if self.base is None:
+            return 0, 0
+        k = (int(parent_open_ms) - self.base) // self.step
+        if k < 0 or k + 1 >= len(self.starts):
+            return 0, 0
+        return int(self.starts[k]), int(self.starts[k + 1])
+
+
+class IntrabarResolver:
+    """
+    TP/SL이 같은 상위 봉에서 모두 닿은 경우 하위 봉으로 먼저 닿은 쪽을 판정
+    resolve(parent_open_ms, tp, sl) → 1 TP 먼저 / 0 SL 먼저 / -1 판정 불가 (하위 봉 없음 또는 같은 1m 봉에서 동시)
+    """
+
+    def __init__(self, symbol: str, interval: str = '1h', minute_interval: str = '1m', root: str = DATA_DIR):
+        self.index = IntrabarIndex(symbol, interval, minute_interval, root)
+        self.records = self.index.file.read() if self.index.file is not None else None
+        self.resolved = 0
+        self.unresolved = 0
+        self.rows_read = 0
+
+    def resolve(self, parent_open_ms: int, tp: float, sl: float) -> int:
+        lo, hi = self.index.rows(parent_open_ms)
+        if hi <= lo:
+            self.unresolved += 1
+            return -1
+        minutes = self.records[lo:hi] # 충돌 봉의 하위 봉만 읽음
+        self.rows_read += hi - lo
+        hit_tp = minutes['high'] >= tp
+        hit_sl = minutes['low'] <= sl
+        first_tp = int(hit_tp.argmax()) if hit_tp.any() else len(minutes)
+        first_sl = int(hit_sl.argmax()) if hit_sl.any() else len(minutes)
+        if first_tp == first_sl:
+            self.unresolved += 1
+            return -1
+        self.resolved += 1
+        return 1 if first_tp < first_sl else 0
+
+    def resolve_many(self, parent_times, tp, sl) -> np.ndarray:
+        """충돌 행 묶음 판정 (parent_times: 상위 봉 시각 배열 - datetime 또는 ms). 반환: 1 / 0 / -1 배열"""
+        parent_ms = to_epoch_ms_array(parent_times)
+        return np.array([self.resolve(t, a, b) for t, a, b in zip(parent_ms.tolist(), np.asarray(tp).tolist(),
+                                                                   np.asarray(sl).tolist())], dtype=int)
+
+
+def _write_minutes(minutes: pd.DataFrame, symbol: str, root: str):
+    """검사용 1m 봉을 바이너리 파일로 기록 (없는 K-라인 컬럼은 0)"""
+    frame = minutes.copy()
+    for col in FIELD_TO_COLUMN.values():
+        if col not in frame.columns:
+            frame[col] = 0.0
+    MmapOHLCV.for_series(symbol, '1m', root).append(frame)
+
+
+def _resample_hours(minutes: pd.DataFrame) -> pd.DataFrame:
+    hours = minutes.set_index('Open time').resample('1h').agg(
+        {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum'})
+    return hours.reset_index()
+
+
+def _minute_reference(minutes: pd.DataFrame, tp: np.ndarray, sl: np.ndarray, parent_times: np.ndarray) -> np.ndarray:
+    """전체 1m 봉을 직접 훑어 구한 판정 (인덱스 검사용)"""
+    open_ms = to_epoch_ms_array(minutes['Open time'])
+    high, low = minutes['High'].to_numpy(), minutes['Low'].to_numpy()
+    out = []
+    for t, a, b in zip(to_epoch_ms_array(parent_times).tolist(), tp.tolist(), sl.tolist()):
+        window = (open_ms >= t) & (open_ms < t + 3_600_000)
+        hit_tp, hit_sl = high[window] >= a, low[window] <= b
+        i = int(hit_tp.argmax()) if hit_tp.any() else len(hit_tp)
+        j = int(hit_sl.argmax()) if hit_sl.any() else len(hit_sl)
+        out.append(-1 if i == j else int(i < j))
+    return np.array(out, dtype=int)
+
+
+def check_intrabar(n_hours: int = 2000, seed: int = 0, **kwargs) -> int:
+    """
+    랜덤 1m 봉 → 1h 집계 후 봉 내부 판정 검사 (다른 값이 있으면 AssertionError)
+    - 충돌 행 외의 레이블은 기존과 같아야 함
+    - 충돌 행 판정은 전체 1m 봉을 직접 훑은 결과와 같아야 함 (판정 불가는 익절 우선)
+    - 읽은 1m 행 수는 충돌 봉 수 x 60 이하 (데이터 크기와 무관)
+    - 상위 봉 중간까지 기록 후 증분 갱신한 인덱스는 처음부터 만든 인덱스와 같아야 함
+    """
+    import tempfile
+    from indicators_np import random_walk_bars
+    from label_engineering import triple_barrier_events, _barrier_atr
+    tp_mult, sl_mult = kwargs.get('atr_multiplier_tp', 1.5), kwargs.get('atr_multiplier_sl', 1.0)
+    minutes = random_walk_bars(n_hours * 60, freq='1min', seed=seed)
+    hours = _resample_hours(minutes)
+    with tempfile.TemporaryDirectory() as root:
+        half = len(minutes) // 2 + 17
+        _write_minutes(minutes.iloc[:half], 'TEST', root)
+        IntrabarIndex('TEST', root=root)
+        _write_minutes(minutes.iloc[half:], 'TEST', root)
+        resolver = IntrabarResolver('TEST', root=root) # 저장된 인덱스에 추가 행만 반영
+        os.remove(resolver.index.path)
+        rebuilt = IntrabarIndex('TEST', root=root)
+        assert np.array_equal(resolver.index.starts, rebuilt.starts), "증분 갱신 인덱스가 다릅니다"
+
+        base = triple_barrier_events(hours, **kwargs)
+        t0 = time.time()
+        ours = triple_barrier_events(hours, intrabar=resolver, **kwargs)
+        elapsed = time.time() - t0
+
+    # 충돌 행: 기존 결과가 익절이고 그 봉의 저가도 SL에 닿은 행
+    lower = hours.rename(columns=str.lower)
+    atr = _barrier_atr(lower)
+    close, low = lower['close'].to_numpy(), lower['low'].to_numpy()
+    labels, holding = base['label'].to_numpy(), base['holding'].to_numpy()
+    rows = np.flatnonzero(labels == 1)
+    touch = rows + holding[rows]
+    sl = close[rows] - atr[rows] * sl_mult
+    conflict = low[touch] <= sl
+    rows, touch, sl = rows[conflict], touch[conflict], sl[conflict]
+    tp = close[rows] + atr[rows] * tp_mult
+
+    changed = ours['label'].to_numpy() != labels
+    changed[rows] = False
+    assert not changed.any(), "충돌이 아닌 행의 레이블이 바뀌었습니다"
+    ref = _minute_reference(minutes, tp, sl, hours['Open time'].to_numpy()[touch])
+    expected = np.where(ref == -1, 1, ref)
+    mismatch = int((ours['label'].to_numpy()[rows] != expected).sum())
+    print(f"🧪 봉 내부 판정: 1h {len(hours)}행 | 충돌 {len(rows)}행 → SL 먼저 {int((expected == 0).sum())}행, "
+          f"판정 불가 {int((ref == -1).sum())}행 | 1m 읽기 {resolver.rows_read:,}/{len(minutes):,}행 | "
+          f"{elapsed * 1000:.1f}ms | 불일치 {mismatch}")
+    assert mismatch == 0, "전체 1m 스캔 결과와 다릅니다"
+    assert resolver.rows_read <= len(rows) * 60, "충돌 봉 밖의 1m 행을 읽었습니다"
+    return mismatch
+
+
+def benchmark(n_hours: int = 3 * 365 * 24, **kwargs):
+    """3년치 1m 파일에서 인덱스 생성/로드 시간과 판정 시간 (판정 I/O는 충돌 수에만 비례)"""
+    import tempfile
+    from indicators_np import random_walk_bars
+    from label_engineering import triple_barrier_events
+    minutes = random_walk_bars(n_hours * 60, freq='1min')
+    hours = _resample_hours(minutes)
+    with tempfile.TemporaryDirectory() as root:
+        _write_minutes(minutes, 'TEST', root)
+        t0 = time.time()
+        IntrabarIndex('TEST', root=root)
+        t_build = time.time() - t0
+        t0 = time.time()
+        resolver = IntrabarResolver('TEST', root=root)
+        t_load = time.time() - t0
+        t0 = time.time()
+        triple_barrier_events(hours, **kwargs)
+        t_base = time.time() - t0
+        t0 = time.time()
+        triple_barrier_events(hours, intrabar=resolver, **kwargs)
+        t_intra = time.time() - t0
+    print(f"⏱️ [1m {len(minutes):,}행 → 1h {len(hours):,}행] 인덱스 생성 {t_build:.2f}초 | 저장 인덱스 로드 {t_load * 1000:.1f}ms | "
+          f"레이블 {t_base:.2f}초 → 봉 내부 판정 포함 {t_intra:.2f}초 "
+          f"(충돌 {resolver.resolved + resolver.unresolved:,}행, 1m 읽기 {resolver.rows_read:,}행)")
+
+
+if __name__ == "__main__":
+    import sys
+    if "--bench" in sys.argv:
+        benchmark(atr_multiplier_tp=0.5, atr_multiplier_sl=0.5)
+    else:
+        check_intrabar(atr_multiplier_tp=0.3, atr_multiplier_sl=0.3)
+        check_intrabar(atr_multiplier_tp=0.5, atr_multiplier_sl=0.5, max_holding=48, seed=1)
@@ -1,5 +1,7 @@
+import time
 import numpy as np
 import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
 from ta.volatility import AverageTrueRange
 
 # ── 방법 1 : 단순 방향 레이블 (현재 사용 중, 기본값) ─────────
@@ -27,60 +29,325 @@ def label_threshold(df: pd.DataFrame, forward: int = 1, threshold: float = 0.003
     return labels
 
 # ── 방법 3 : Triple Barrier Method (선물 자동매매 권장) ───────
+# 각 행의 진입가(종가) ± ATR 배수로 익절/손절 배리어를 두고, 다음 1..max_holding봉의 고가/저가 중
+# 먼저 닿는 배리어를 찾습니다 (같은 봉에서 둘 다 닿으면 익절 우선, 끝까지 안 닿으면 시간 초과).
+# 미래 봉 고가/저가의 슬라이딩 윈도우 뷰 (행, max_holding)에서 첫 터치 위치를 argmax로 한 번에 구합니다.
+TRIPLE_BARRIER_CHUNK = 1 << 22 # 한 번에 비교하는 (행 x 보유 봉) 원소 수 (1m 장기 보유도 메모리 일정)
+
+
+def _barrier_atr(df: pd.DataFrame, window: int = 14) -> np.ndarray:
+    """
+    배리어 폭용 ATR(14) - ta AverageTrueRange와 비트 단위로 같은 값
+    (TR은 배열 연산, Wilder 재귀는 ta와 같은 순서의 float 연산을 .iloc 없이 파이썬 루프로 계산)
+    """
+    high = df['high'].to_numpy(dtype=np.float64)
+    low = df['low'].to_numpy(dtype=np.float64)
+    close = df['close'].to_numpy(dtype=np.float64)
+    prev_close = np.r_[np.nan, close[:-1]]
+    tr = np.fmax(np.fmax(high - low, np.abs(high - prev_close)), np.abs(low - prev_close))
+    atr = np.zeros(len(tr))
+    if len(tr) < window:
+        return atr
+    value = float(pd.Series(tr[:window]).mean())
+    values = [value]
+    for t in tr[window:].tolist():
+        value = (value * (window - 1) + t) / float(window)
+        values.append(value)
+    atr[window - 1:] = values
+    return atr
+
+
+def triple_barrier_events(df: pd.DataFrame,
+                          atr_multiplier_tp: float = 1.5,
+                          atr_multiplier_sl: float = 1.0,
+                          max_holding: int = 20,
+                          intrabar=None) -> pd.DataFrame:
+    """
+    3중 배리어 이벤트 (벡터화)
+    intrabar: intrabar.IntrabarResolver - 같은 봉에서 TP/SL이 모두 닿은 행만 하위 봉(1m)으로 먼저 닿은 쪽을 판정
+      (없으면 익절 우선. 배리어 가격이 원본 가격 단위여야 하므로 정상성 변환 전 봉에 사용)
+    반환: index=df.index
+    - label: -1 계산 불가, 0 SL, 1 TP, 2 Time (label_triple_barrier와 동일)
+    - holding: 배리어에 닿은 봉까지의 봉 수 (시간 초과는 max_holding, 계산 불가는 -1)
+    - touch_time: 닿은 봉의 시각 ('open time' 컬럼이 있으면 그 값, 없으면 index)
+    - ret: 실현 수익률 (TP/SL은 배리어 가격, 시간 초과는 max_holding봉 뒤 종가 기준)
+    """
+    df_copy = df.copy()
+    df_copy.columns = [c.lower() for c in df_copy.columns]
+    n = len(df_copy)
+    label_col = np.full(n, -1, dtype=int)
+    holding_col = np.full(n, -1, dtype=int)
+    ret_col = np.full(n, np.nan)
+    touch_pos = np.full(n, -1)
+    times = df_copy['open time'].to_numpy() if 'open time' in df_copy.columns else df.index.to_numpy()
+
+    # [데이터 무결성 검증] 최소 데이터 확보 확인
+    if n < 14 + max_holding:
+        print(f"⚠️ [레이블링 중단] 데이터가 부족합니다 (현재: {n}건, 필요: {14+max_holding}건).")
+        rows = np.empty(0, dtype=int)
+    else:
+        close = df_copy['close'].to_numpy(dtype=np.float64)
+        high = df_copy['high'].to_numpy(dtype=np.float64)
+        low = df_copy['low'].to_numpy(dtype=np.float64)
+        atr = _barrier_atr(df_copy)
+
+        m = n - max_holding # 미래 max_holding봉이 있는 행
+        rows = np.flatnonzero(~np.isnan(atr[:m]) & (atr[:m] > 0)) # ATR이 없거나(초반 14개) 0인 행은 계산 불가
+        tp = close[rows] + atr[rows] * atr_multiplier_tp
+        sl = close[rows] - atr[rows] * atr_multiplier_sl
+        # 행 i의 윈도우 = 봉 i+1 .. i+max_holding
+        future_high = sliding_window_view(high[1:], max_holding)
+        future_low = sliding_window_view(low[1:], max_holding)
+
+        first_tp = np.full(len(rows), max_holding)
+        first_sl = np.full(len(rows), max_holding)
+        step = max(1, TRIPLE_BARRIER_CHUNK // max_holding)
+        for s in range(0, len(rows), step):
+            idx = rows[s:s + step]
+            hit_tp = future_high[idx] >= tp[s:s + step, None]
+            hit_sl = future_low[idx] <= sl[s:s + step, None]
+            first_tp[s:s + step] = np.where(hit_tp.any(axis=1), hit_tp.argmax(axis=1), max_holding)
+            first_sl[s:s + step] = np.where(hit_sl.any(axis=1), hit_sl.argmax(axis=1), max_holding)
+
+        # 같은 봉이면 익절 우선 (기존 루프의 if 순서)
+        is_tp = (first_tp < max_holding) & (first_tp <= first_sl)
+        is_sl = ~is_tp & (first_sl < max_holding)
+        if intrabar is not None:
+            # 충돌 행만 하위 봉 조회 (추가 I/O는 충돌 수에 비례)
+            conflict = np.flatnonzero(is_tp & (first_tp == first_sl))
+            if len(conflict):
+                parent = times[rows[conflict] + first_tp[conflict] + 1]
+                sl_first = intrabar.resolve_many(parent, tp[conflict], sl[conflict]) == 0
+                is_tp[conflict[sl_first]] = False
+                is_sl[conflict[sl_first]] = True
+        label_col[rows] = np.where(is_tp, 1, np.where(is_sl, 0, 2))
+        holding_col[rows] = np.where(is_tp, first_tp + 1, np.where(is_sl, first_sl + 1, max_holding))
+        exit_price = np.where(is_tp, tp, np.where(is_sl, sl, close[rows + max_holding]))
+        ret_col[rows] = exit_price / close[rows] - 1
+        touch_pos[rows] = rows + holding_col[rows]
+
+    return pd.DataFrame({
+        'label': label_col,
+        'holding': holding_col,
+        'touch_time': pd.Series(times).reindex(touch_pos).to_numpy(), # 계산 불가 행은 NaT
+        'ret': ret_col,
+    }, index=df.index)
+
+
 def label_triple_barrier(df: pd.DataFrame, 
                          atr_multiplier_tp: float = 1.5, 
                          atr_multiplier_sl: float = 1.0, 
-                         max_holding: int = 20) -> pd.Series:
+                         max_holding: int = 20,
+                         intrabar=None) -> pd.Series:
     """
     3중 배리어 레이블링 - 자동매매에 가장 현실적인 방법
+    (-1: 계산 불가, 0: SL, 1: TP, 2: Time. 터치 시각/실현 수익률까지 필요하면 triple_barrier_events)
+    intrabar: 같은 봉 TP/SL 충돌을 1m 봉으로 판정하는 IntrabarResolver (없으면 익절 우선)
+    """
+    events = triple_barrier_events(df, atr_multiplier_tp, atr_multiplier_sl, max_holding, intrabar)
+    return events['label'].astype(int)
+
+
+def triple_barrier_grid(df: pd.DataFrame,
+                        tp_multipliers=(1.0, 1.5, 2.0),
+                        sl_multipliers=(0.5, 1.0, 1.5),
+                        holdings=(10, 20, 40)) -> pd.DataFrame:
+    """
+    TP/SL 배수 x 최대 보유 봉 조합 전체의 3중 배리어 레이블을 한 번에 계산
+    ATR은 한 번, 미래 경로는 1..max(holdings)봉 누적 최고가/최저가를 한 번만 훑으며
+    배수별 첫 터치 봉을 기록합니다 (누적 극값은 단조라 처음 닿는 봉 = 그 봉까지의 고가/저가 중 첫 터치).
+    반환: index=df.index, columns=MultiIndex(tp, sl, max_holding), 값은 label_triple_barrier와 같은 레이블
+    (.to_numpy().reshape(n, len(tp), len(sl), len(holdings))로 텐서 변환)
     """
-    # 1. 입력 복사 및 컬럼명 소문화
     df_copy = df.copy()
     df_copy.columns = [c.lower() for c in df_copy.columns]
+    n = len(df_copy)
+    tp_multipliers, sl_multipliers, holdings = list(tp_multipliers), list(sl_multipliers), list(holdings)
+    columns = pd.MultiIndex.from_product([tp_multipliers, sl_multipliers, holdings], names=['tp', 'sl', 'max_holding'])
+    labels = np.full((n, len(tp_multipliers), len(sl_multipliers), len(holdings)), -1, dtype=np.int8)
+    if n < 14 + min(holdings):
+        print(f"⚠️ [레이블링 중단] 데이터가 부족합니다 (현재: {n}건, 필요: {14+min(holdings)}건).")
+        return pd.DataFrame(labels.reshape(n, -1), index=df.index, columns=columns)
 
-    # [데이터 무결성 검증] 최소 데이터 확보 확인
-    if len(df_copy) < 14 + max_holding:
-        print(f"⚠️ [레이블링 중단] 데이터가 부족합니다 (현재: {len(df_copy)}건, 필요: {14+max_holding}건).")
-        return pd.Series(-1, index=df.index)
-    
-    # 2. ATR 계산 (변동성 기반 배리어 설정용)
-    atr_indicator = AverageTrueRange(df_copy['high'], df_copy['low'], df_copy['close'], window=14)
-    atr = atr_indicator.average_true_range()
-    
-    # 3. 레이블 초기화 (-1: 계산 불가, 0: SL, 1: TP, 2: Time)
+    close = df_copy['close'].to_numpy(dtype=np.float64)
+    high = df_copy['high'].to_numpy(dtype=np.float64)
+    low = df_copy['low'].to_numpy(dtype=np.float64)
+    atr = _barrier_atr(df_copy)
+    with np.errstate(invalid='ignore'):
+        valid = ~np.isnan(atr) & (atr > 0)
+    tp = close[:, None] + atr[:, None] * np.asarray(tp_multipliers)[None, :] # (n, TP)
+    sl = close[:, None] - atr[:, None] * np.asarray(sl_multipliers)[None, :] # (n, SL)
+
+    # 첫 터치 봉 (1..H, 안 닿으면 H+1). NaN 봉은 터치하지 않음 (fmax/fmin으로 건너뜀)
+    H = max(holdings)
+    first_tp = np.full(tp.shape, H + 1, dtype=np.int32)
+    first_sl = np.full(sl.shape, H + 1, dtype=np.int32)
+    run_high = np.full(n, np.nan)
+    run_low = np.full(n, np.nan)
+    with np.errstate(invalid='ignore'):
+        for k in range(1, H + 1):
+            run_high[:n - k] = np.fmax(run_high[:n - k], high[k:])
+            run_low[:n - k] = np.fmin(run_low[:n - k], low[k:])
+            first_tp[(first_tp > H) & (run_high[:, None] >= tp)] = k
+            first_sl[(first_sl > H) & (run_low[:, None] <= sl)] = k
+
+    rows = np.arange(n)
+    for h_idx, h in enumerate(holdings):
+        ok = valid & (rows < n - h) # 미래 h봉이 있는 행
+        hit_tp = first_tp <= h
+        hit_sl = first_sl <= h
+        # 같은 봉이면 익절 우선
+        is_tp = hit_tp[:, :, None] & (first_tp[:, :, None] <= first_sl[:, None, :])
+        is_sl = ~is_tp & hit_sl[:, None, :]
+        grid = np.where(is_tp, 1, np.where(is_sl, 0, 2)).astype(np.int8)
+        labels[:, :, :, h_idx] = np.where(ok[:, None, None], grid, -1)
+    return pd.DataFrame(labels.reshape(n, -1), index=df.index, columns=columns)
+
+
+# ── 레이블 동시성 / 표본 고유도 (겹치는 배리어 구간의 가중치) ─────────
+# 레이블 i의 구간 = 진입 봉 i ~ 터치 봉 i+holding (양 끝 포함). 구간이 겹칠수록 같은 수익률을 여러 레이블이 공유합니다.
+# 봉별 동시 레이블 수는 차분 배열(시작 +1, 끝 다음 -1)의 누적 합, 평균 고유도는 1/동시 수의 누적 합 차분으로 O(n).
+
+def label_concurrency(events: pd.DataFrame) -> np.ndarray:
+    """봉별 동시 진행 레이블 수 (events: triple_barrier_events 결과, 계산 불가 행 제외)"""
+    n = len(events)
+    starts = np.flatnonzero(events['label'].to_numpy() != -1)
+    ends = starts + events['holding'].to_numpy()[starts]
+    delta = np.bincount(starts, minlength=n + 1) - np.bincount(ends + 1, minlength=n + 1)
+    return np.cumsum(delta[:n])
+
+
+def average_uniqueness(events: pd.DataFrame, concurrency: np.ndarray = None) -> pd.Series:
+    """
+    레이블별 평균 고유도 = 구간 내 봉들의 1/동시 레이블 수 평균 (0~1, 계산 불가 행은 NaN)
+    학습 표본 가중치로 쓰면 겹치는 레이블이 과대 반영되지 않습니다.
+    """
+    if concurrency is None:
+        concurrency = label_concurrency(events)
+    n = len(events)
+    starts = np.flatnonzero(events['label'].to_numpy() != -1)
+    ends = starts + events['holding'].to_numpy()[starts]
+    inverse = np.zeros(n)
+    np.divide(1.0, concurrency, out=inverse, where=concurrency > 0)
+    prefix = np.r_[0.0, np.cumsum(inverse)]
+    uniqueness = np.full(n, np.nan)
+    uniqueness[starts] = (prefix[ends + 1] - prefix[starts]) / (ends - starts + 1)
+    return pd.Series(uniqueness, index=events.index)
+
+
+def check_uniqueness(events: pd.DataFrame, atol: float = 1e-12) -> float:
+    """차분 배열/누적 합 결과를 레이블 구간별 직접 계산과 비교 (최대 절대 오차)"""
+    n = len(events)
+    labels, holding = events['label'].to_numpy(), events['holding'].to_numpy()
+    count = np.zeros(n, dtype=np.int64)
+    for i in np.flatnonzero(labels != -1):
+        count[i:i + holding[i] + 1] += 1
+    ref = np.full(n, np.nan)
+    for i in np.flatnonzero(labels != -1):
+        ref[i] = np.mean(1.0 / count[i:i + holding[i] + 1])
+    concurrency = label_concurrency(events)
+    err = float(np.nanmax(np.abs(average_uniqueness(events, concurrency).to_numpy() - ref)))
+    print(f"🧪 레이블 고유도: {int((labels != -1).sum())}개 레이블 | 동시 수 일치 {bool((concurrency == count).all())} | "
+          f"최대 오차 {err:.1e} | 평균 고유도 {np.nanmean(ref):.3f}")
+    assert (concurrency == count).all() and err <= atol, "직접 계산과 다릅니다"
+    return err
+
+
+def triple_barrier_reference(df: pd.DataFrame,
+                             atr_multiplier_tp: float = 1.5,
+                             atr_multiplier_sl: float = 1.0,
+                             max_holding: int = 20) -> pd.Series:
+    """기존 행 x 보유 봉 루프 구현 (패리티/벤치마크 기준)"""
+    df_copy = df.copy()
+    df_copy.columns = [c.lower() for c in df_copy.columns]
     labels = pd.Series(-1, index=df.index, dtype=int)
-    
-    # 4. 레이블링 루프
-    # 계산 가능한 마지막 지점까지 반복 (미래 데이터를 봐야 하므로 max_holding만큼 뺌)
+    if len(df_copy) < 14 + max_holding:
+        return labels
+    atr = AverageTrueRange(df_copy['high'], df_copy['low'], df_copy['close'], window=14).average_true_range()
     for i in range(len(df_copy) - max_holding):
         entry_price = df_copy['close'].iloc[i]
         atr_val = atr.iloc[i]
-        
-        # ATR이 없거나(초반 14개) 0인 경우 스킵
         if pd.isna(atr_val) or atr_val <= 0:
             continue
-            
         tp_price = entry_price + (atr_val * atr_multiplier_tp)
         sl_price = entry_price - (atr_val * atr_multiplier_sl)
-        
-        # 기본값은 시간 초과(2)
-        result = 2 
-        
-        # 미래 max_holding 봉 동안 배리어 터치 여부 확인
+        result = 2
         for j in range(1, max_holding + 1):
             curr_idx = i + j
-            high_p = df_copy['high'].iloc[curr_idx]
-            low_p = df_copy['low'].iloc[curr_idx]
-            
-            # 고가가 익절가 도달 시
-            if high_p >= tp_price:
-                result = 1 # TP 터치
+            if df_copy['high'].iloc[curr_idx] >= tp_price:
+                result = 1
                 break
-            # 저가가 손절가 도달 시
-            if low_p <= sl_price:
-                result = 0 # SL 터치
+            if df_copy['low'].iloc[curr_idx] <= sl_price:
+                result = 0
                 break
-        
         labels.iloc[i] = result
-        
     return labels
+
+
+def check_parity(df: pd.DataFrame, **kwargs) -> int:
+    """벡터화 레이블과 기존 루프 레이블 비교 (다른 행이 있으면 AssertionError)"""
+    ours = label_triple_barrier(df, **kwargs)
+    ref = triple_barrier_reference(df, **kwargs)
+    mismatch = int((ours != ref).sum())
+    print(f"🧪 Triple Barrier 패리티: {len(df)}행 | 불일치 {mismatch}행 | 분포 {ours.value_counts().sort_index().to_dict()}")
+    assert mismatch == 0, "기존 루프와 레이블이 다릅니다"
+    return mismatch
+
+
+def check_grid_parity(df: pd.DataFrame, tp_multipliers=(0.5, 1.5, 6.0), sl_multipliers=(0.5, 1.0, 6.0),
+                      holdings=(1, 8, 20)) -> int:
+    """그리드 레이블과 조합별 label_triple_barrier 호출 비교 (다른 값이 있으면 AssertionError)"""
+    grid = triple_barrier_grid(df, tp_multipliers, sl_multipliers, holdings)
+    mismatch = 0
+    for tp, sl, h in grid.columns:
+        ref = label_triple_barrier(df, atr_multiplier_tp=tp, atr_multiplier_sl=sl, max_holding=h)
+        mismatch += int((grid[(tp, sl, h)].to_numpy() != ref.to_numpy()).sum())
+    print(f"🧪 레이블 그리드 패리티: {len(df)}행 x {grid.shape[1]}조합 | 불일치 {mismatch}")
+    assert mismatch == 0, "조합별 레이블과 다릅니다"
+    return mismatch
+
+
+def benchmark(n_bars: int = 1_000_000, loop_max_bars: int = 20_000, max_holding: int = 20):
+    """1M봉에서 기존 루프 대비 시간 비교 (루프는 loop_max_bars봉까지만 재고 봉 수에 비례해 환산)"""
+    from indicators_np import random_walk_bars
+    df = random_walk_bars(n_bars, freq='1min')
+    t0 = time.time()
+    triple_barrier_events(df, max_holding=max_holding)
+    t_vec = time.time() - t0
+
+    n_loop = min(n_bars, loop_max_bars)
+    t0 = time.time()
+    triple_barrier_reference(df.iloc[:n_loop], max_holding=max_holding)
+    t_loop = (time.time() - t0) * n_bars / n_loop
+    print(f"⏱️ [{n_bars:,}봉, max_holding {max_holding}] 벡터화 {t_vec:.2f}초 | 기존 루프 {t_loop:.1f}초(환산) | {t_loop / t_vec:.0f}배")
+
+    # 레이블 설계 스윕: 5 x 5 x 4 조합을 그리드 한 번 vs 조합별 호출
+    tps, sls, holdings = (0.5, 1.0, 1.5, 2.0, 3.0), (0.5, 1.0, 1.5, 2.0, 3.0), (5, 10, 20, 40)
+    t0 = time.time()
+    triple_barrier_grid(df, tps, sls, holdings)
+    t_grid = time.time() - t0
+    t0 = time.time()
+    for h in holdings:
+        label_triple_barrier(df, atr_multiplier_tp=tps[0], atr_multiplier_sl=sls[0], max_holding=h)
+    t_calls = (time.time() - t0) * len(tps) * len(sls)
+    print(f"⏱️ [{n_bars:,}봉, {len(tps) * len(sls) * len(holdings)}조합] 그리드 {t_grid:.2f}초 | 조합별 호출 {t_calls:.1f}초(환산) | {t_calls / t_grid:.1f}배")
+
+    events = triple_barrier_events(df, max_holding=max_holding)
+    t0 = time.time()
+    average_uniqueness(events)
+    print(f"⏱️ [{n_bars:,}봉] 레이블 동시 수 + 평균 고유도 {time.time() - t0:.3f}초")
+
+
+if __name__ == "__main__":
+    import sys
+    from indicators_np import random_walk_bars
+    if "--bench" in sys.argv:
+        benchmark()
+    else:
+        bars = random_walk_bars(5000)
+        check_parity(bars)
+        check_parity(bars, atr_multiplier_tp=0.5, atr_multiplier_sl=0.5, max_holding=48)
+        check_parity(bars, atr_multiplier_tp=6.0, atr_multiplier_sl=6.0, max_holding=8) # 시간 초과 다수
+        check_grid_parity(bars)
+        check_uniqueness(triple_barrier_events(bars))
+        check_uniqueness(triple_barrier_events(bars, atr_multiplier_tp=6.0, atr_multiplier_sl=6.0, max_holding=8))
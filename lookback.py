@@ -0,0 +1,183 @@
+import os
+import json
+import time
+import numpy as np
+import pandas as pd
+from binance.helpers import interval_to_milliseconds
+from ohlcv_store import DATA_DIR
+
+# ── 피처별 최소 lookback 계산기 (실시간 수집 봉 수 / 피처 저장소 꼬리 재계산 길이) ──
+# 피처마다 두 길이를 측정합니다.
+# - warmup: 첫 유효값(NaN이 아닌 값)이 나오기까지 필요한 봉 수 (롤링 윈도우, shift 등)
+# - lookback: 최근 L봉만으로 계산한 값이 긴 이력으로 계산한 값과 tol 이내로 같아지는 최소 L
+#   (EMA/Wilder/PSAR 같은 재귀 지표는 초기값 영향이 지수적으로 줄어드는 길이까지 포함)
+# 랜덤 워크 봉 여러 개(seed)에서 L 격자를 훑은 뒤 경계 구간을 이분 탐색하고, seed별 최댓값을 씁니다.
+# 오차는 피처 표준편차 단위입니다. OBV/NVI 같은 누적 지표는 어떤 L로도 같아지지 않아 NaN(수렴 안 함)으로 표시합니다.
+
+LOOKBACK_TOL = 1e-6 # 피처 표준편차 대비 허용 오차
+PROBE_BARS = 4000 # 기준(긴 이력) 계산 길이
+PROBE_SEEDS = (0, 1, 2)
+COMPARE_BARS = 24 # 마지막 구간에서 비교하는 봉 수 (첫 비교 봉의 이력이 정확히 L봉)
+LOOKBACK_CACHE = os.path.join(DATA_DIR, "_lookback.json")
+# 피처 소스별 (계산 모듈 → 버전 해시 대상)
+LOOKBACK_SOURCES = {
+    'build_features': ('feature_engineering', 'feature_registry', 'indicators_np', 'rolling_moments'),
+    'add_all_indicators': ('analyzer',),
+}
+
+
+def _source_arrays(source: str, bars: pd.DataFrame) -> dict:
+    """소스별 피처 배열 {컬럼: ndarray} (dropna 전)"""
+    if source == 'build_features':
+        from feature_engineering import compute_feature_arrays
+        lowered = bars.copy()
+        lowered.columns = [col.lower() for col in lowered.columns]
+        return compute_feature_arrays(lowered)
+    if source == 'add_all_indicators':
+        from analyzer import add_all_indicators
+        out = add_all_indicators(bars)
+        return {col: out[col].to_numpy(dtype=np.float64) for col in out.columns if col not in bars.columns}
+    raise ValueError(f"알 수 없는 피처 소스: {source}")
+
+
+def _tail_errors(source: str, bars: pd.DataFrame, full: dict, scale: dict, L: int) -> dict:
+    """최근 L봉 이력으로 계산한 마지막 COMPARE_BARS봉과 전체 이력 값의 최대 오차 (표준편차 단위)"""
+    n = len(bars)
+    part = _source_arrays(source, bars.iloc[n - COMPARE_BARS - L + 1:])
+    errors = {}
+    with np.errstate(invalid='ignore'):
+        for col, ref in full.items():
+            a, b = part[col][-COMPARE_BARS:].astype(np.float64), ref[-COMPARE_BARS:].astype(np.float64)
+            same = (a == b) | (np.isnan(a) & np.isnan(b))
+            diff = np.where(same, 0.0, np.abs(a - b))
+            errors[col] = float(np.nan_to_num(diff, nan=np.inf).max()) / scale[col]
+    return errors
+
+
+def _probe(source: str, tol: float, bars: pd.DataFrame) -> tuple:
+    """봉 하나(seed)에서 피처별 (warmup, lookback)"""
+    n = len(bars)
+    full = _source_arrays(source, bars)
+    warmup, scale = {}, {}
+    for col, values in full.items():
+        values = values.astype(np.float64)
+        valid = ~np.isnan(values)
+        warmup[col] = int(np.argmax(valid)) + 1 if valid.any() else np.nan
+        std = np.nanstd(values[np.isfinite(values)]) if np.isfinite(values).any() else 0.0
+        scale[col] = std if std > 0 else 1.0
+
+    # 1) L 격자: 1..64는 모두, 이후는 10%씩
+    max_L = n - COMPARE_BARS
+    grid = list(range(1, 65))
+    while grid[-1] < max_L:
+        grid.append(min(max_L, int(grid[-1] * 1.1) + 1))
+    ok = {L: _tail_errors(source, bars, full, scale, L) for L in grid}
+    bracket = {}
+    for col in full:
+        passing = [ok[L][col] <= tol for L in grid]
+        if not passing[-1]:
+            bracket[col] = None # 최대 길이에서도 다름 (누적 지표 등)
+            continue
+        k = len(grid) - 1
+        while k > 0 and passing[k - 1]:
+            k -= 1
+        bracket[col] = (grid[k - 1] if k > 0 else 0, grid[k]) # (실패 L, 통과 L]
+
+    # 2) 경계 구간 이분 탐색 (같은 구간의 피처는 한 번 계산으로 함께 판정)
+    while True:
+        groups = {}
+        for col, b in bracket.items():
+            if b is not None and b[1] - b[0] > 1:
+                groups.setdefault(b, []).append(col)
+        if not groups:
+            break
+        for (lo, hi), cols in groups.items():
+            mid = (lo + hi) // 2
+            errors = _tail_errors(source, bars, full, scale, mid)
+            for col in cols:
+                bracket[col] = (lo, mid) if errors[col] <= tol else (mid, hi)
+    lookback = {col: (b[1] if b is not None else np.nan) for col, b in bracket.items()}
+    return warmup, lookback
+
+
+def _cache_key(source: str, tol: float, probe_bars: int, seeds) -> str:
+    from feature_store import feature_code_version
+    version = feature_code_version(LOOKBACK_SOURCES[source])
+    return f"{source}|{version}|{tol:g}|{probe_bars}|{','.join(map(str, seeds))}"
+
+
+def feature_lookbacks(source: str = 'build_features', tol: float = LOOKBACK_TOL, probe_bars: int = PROBE_BARS,
+                      seeds=PROBE_SEEDS, use_cache: bool = True) -> pd.DataFrame:
+    """
+    피처별 최소 봉 수 표 (index=피처, columns=['warmup', 'lookback'], lookback NaN = 수렴하지 않음)
+    결과는 피처 코드 버전별로 LOOKBACK_CACHE에 저장 (코드가 바뀌면 다시 측정)
+    """
+    key = _cache_key(source, tol, probe_bars, seeds)
+    cache = {}
+    if use_cache and os.path.exists(LOOKBACK_CACHE):
+        try:
+            with open(LOOKBACK_CACHE, 'r') as f:
+                cache = json.load(f)
+        except Exception:
+            cache = {}
+        if key in cache:
+            return pd.DataFrame(cache[key]).astype(float)
+
+    from indicators_np import random_walk_bars
+    t0 = time.time()
+    table = None
+    for seed in seeds:
+        warmup, lookback = _probe(source, tol, random_walk_bars(probe_bars, seed=seed))
+        part = pd.DataFrame({'warmup': warmup, 'lookback': lookback}, dtype=float)
+        # seed별 최댓값 (한 seed라도 수렴하지 않으면 NaN)
+        table = part if table is None else pd.DataFrame({
+            'warmup': np.fmax(table['warmup'], part['warmup']),
+            'lookback': np.maximum(table['lookback'], part['lookback']),
+        })
+    print(f"📏 [{source}] 피처 {len(table)}개 lookback 측정 완료 (tol {tol:g}, {time.time() - t0:.1f}초)")
+
+    if use_cache:
+        cache[key] = {name: {col: (None if np.isnan(v) else float(v)) for col, v in table[name].items()}
+                      for name in table.columns}
+        os.makedirs(os.path.dirname(LOOKBACK_CACHE), exist_ok=True)
+        tmp_path = LOOKBACK_CACHE + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(cache, f)
+        os.replace(tmp_path, LOOKBACK_CACHE) # 원자적 교체
+    return table
+
+
+def required_bars(features=None, source: str = 'build_features', tol: float = LOOKBACK_TOL,
+                  diff: int = 0, skip=(), verbose: bool = True) -> int:
+    """
+    features(없으면 소스의 전체 피처)의 마지막 봉을 tol 이내로 재현하는 데 필요한 최소 봉 수
+    - diff: 뒤에 붙는 차분/변화율 단계 수 (정상성 변환 pct_change면 1)
+    - skip: 수렴 검사에서 뺄 피처 (저장소처럼 누적 지표를 따로 보정하는 경우)
+    소스에 없는 이름(원본/매크로 컬럼)은 무시하고, 수렴하지 않는 누적 지표는 경고 후 제외합니다.
+    """
+    table = feature_lookbacks(source, tol)
+    names = table.index if features is None else [f for f in features if f in table.index]
+    names = [f for f in names if f not in skip]
+    lookback = table.loc[names, 'lookback']
+    cumulative = list(lookback.index[lookback.isna()])
+    if cumulative and verbose:
+        print(f"⚠️ [{source}] 이력 길이에 따라 값이 달라지는 누적 피처 (lookback 계산에서 제외): {cumulative}")
+    bars = int(max(lookback.max(skipna=True) if lookback.notna().any() else 1, 1)) + diff
+    return bars
+
+
+def lookback_start_ms(n_bars: int, interval: str, now_ms: int = None) -> int:
+    """현재 진행 중인 봉을 포함해 최근 n_bars봉이 시작되는 시각(ms) (fetch_historical_data의 start_str로 사용)"""
+    step = interval_to_milliseconds(interval)
+    now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+    return (now_ms // step - (n_bars - 1)) * step
+
+
+if __name__ == "__main__":
+    import sys
+    source = 'add_all_indicators' if "--analyzer" in sys.argv else 'build_features'
+    table = feature_lookbacks(source, use_cache=False)
+    pd.set_option('display.max_rows', None)
+    print(table.sort_values('lookback', ascending=False).to_string())
+    print(f"📏 전체 피처 최소 봉 수 (tol {LOOKBACK_TOL:g}): {int(table['lookback'].max())} "
+          f"(수렴하지 않는 누적 피처: {list(table.index[table['lookback'].isna()])})")
@@ -1,55 +1,189 @@
+import os
+import json
+import time
 import yfinance as yf
+import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from ohlcv_store import DATA_DIR, DAY_MS, to_epoch_ms_array
+
+# 대상 지표 (Yahoo 티커 → 컬럼명)
+MACRO_TICKERS = {
+    'DX-Y.NYB': 'DXY',      # 달러 인덱스
+    '^TNX': 'US10Y',        # 미국채 10년물 금리
+    '^NDX': 'Nasdaq100',    # 나스닥 100
+    'GC=F': 'Gold',         # 금 선물
+    '^VIX': 'VIX',          # 변동성 지수
+    'CL=F': 'Oil',          # 국제 유가 (WTI)
+    'SMH': 'Semiconductor', # 반도체 지수 (ETF)
+    'ETHBTC=X': 'ETH_BTC'   # 이더리움/비트코인 비율
+}
+
+# ── 매크로 일봉 디스크 캐시 ──────────────────────────────────────
+# 티커별 {MACRO_CACHE_DIR}/{컬럼명}.parquet (Date, 값) + .json (보유 시작일, 다음 갱신 시각)
+# 일봉은 장 마감 뒤에만 바뀌므로, 다음 장 마감 전까지는 네트워크 요청 없이 캐시를 반환합니다.
+MACRO_CACHE_DIR = os.path.join(DATA_DIR, "_macro")
+SESSION_CLOSE_UTC_HOUR = 22 # 미국 장 마감(16:00 ET) + 선물 정산 여유 (서머타임 무관하게 이후 시각)
+CRYPTO_TICKERS = ('ETHBTC=X',) # 24시간 거래, UTC 자정에 일봉 마감
+REFETCH_DAYS = 3 # 갱신 시 마지막 며칠은 다시 받아 잠정 종가를 덮어씀
+MAX_FETCH_WORKERS = 8
+
+
+def next_session_close(ticker: str, now: datetime) -> datetime:
+    """now 이후 ticker의 다음 일봉 확정 시각 (UTC). 주식/선물은 평일 장 마감, 암호화폐는 매일 자정"""
+    if ticker in CRYPTO_TICKERS:
+        return (now + timedelta(days=1)).replace(hour=0, minute=5, second=0, microsecond=0)
+    close = now.replace(hour=SESSION_CLOSE_UTC_HOUR, minute=0, second=0, microsecond=0)
+    if close <= now:
+        close += timedelta(days=1)
+    while close.weekday() >= 5: # 토/일에는 새 일봉이 없음
+        close += timedelta(days=1)
+    return close
+
+
+class MacroCache:
+    """티커별 일봉 종가 캐시 (구간이 빠졌거나 TTL이 지난 티커만 다운로드)"""
+
+    def __init__(self, cache_dir: str = MACRO_CACHE_DIR):
+        self.cache_dir = cache_dir
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _paths(self, name: str):
+        base = os.path.join(self.cache_dir, name)
+        return base + ".parquet", base + ".json"
+
+    def _read(self, name: str):
+        data_path, meta_path = self._paths(name)
+        if not (os.path.exists(data_path) and os.path.exists(meta_path)):
+            return pd.DataFrame(), {}
+        with open(meta_path) as f:
+            meta = json.load(f)
+        return pd.read_parquet(data_path), meta
+
+    def _write(self, name: str, df: pd.DataFrame, meta: dict):
+        data_path, meta_path = self._paths(name)
+        df.to_parquet(data_path + ".tmp", index=False)
+        os.replace(data_path + ".tmp", data_path)
+        with open(meta_path + ".tmp", 'w') as f:
+            json.dump(meta, f)
+        os.replace(meta_path + ".tmp", meta_path)
+
+    def _plan(self, ticker: str, name: str, start_date: datetime, now: datetime):
+        """받아야 할 구간 목록 [(시작, 끝)] (비어 있으면 캐시 그대로 사용)"""
+        cached, meta = self._read(name)
+        if cached.empty:
+            return [(start_date, now)]
+        ranges = []
+        covered_from = pd.Timestamp(meta['covered_from'])
+        if pd.Timestamp(start_date.date()) < covered_from: # 요청 구간이 캐시보다 앞섬
+            ranges.append((start_date, covered_from.to_pydatetime()))
+        if now.timestamp() >= meta['fresh_until']: # 장 마감이 지나 새 일봉이 생겼을 수 있음
+            last = pd.Timestamp(cached['Date'].max()).to_pydatetime()
+            ranges.append((last - timedelta(days=REFETCH_DAYS), now))
+        return ranges
+
+    def _download(self, ticker: str, name: str, ranges: list) -> list:
+        """구간별 [(시작, 끝, DataFrame)] (실패하거나 비어 있는 구간은 빈 DataFrame)"""
+        parts = []
+        for start, end in ranges:
+            df = yf.download(ticker, start=start.strftime('%Y-%m-%d'), end=(end + timedelta(days=1)).strftime('%Y-%m-%d'),
+                             progress=False)
+            if df.empty:
+                parts.append((start, end, pd.DataFrame()))
+                continue
+            # MultiIndex 방지: 단일 컬럼만 추출
+            if isinstance(df.columns, pd.MultiIndex):
+                df.columns = df.columns.get_level_values(0)
+            col = 'Adj Close' if 'Adj Close' in df.columns else 'Close'
+            df = df[[col]].rename(columns={col: name}).reset_index()
+            df.rename(columns={df.columns[0]: 'Date'}, inplace=True)
+            parts.append((start, end, df))
+        return parts
+
+    def _update(self, ticker: str, name: str, start_date: datetime, now: datetime, ranges: list):
+        """빠진 구간을 받아 일 단위로 병합 저장"""
+        print(f"[{name}] 데이터 다운로드 중...")
+        parts = self._download(ticker, name, ranges)
+        cached, meta = self._read(name)
+        frames = [df for _, _, df in parts if not df.empty]
+        if frames:
+            new = pd.concat(frames, ignore_index=True)
+            new['Date'] = pd.to_datetime(new['Date']).dt.tz_localize(None).dt.normalize()
+            merged = pd.concat([cached, new[['Date', name]]], ignore_index=True)
+            cached = merged.drop_duplicates(subset=['Date'], keep='last').sort_values('Date').reset_index(drop=True)
+        if cached.empty:
+            return
+        # 받은 구간만 캐시 범위로 인정 (앞쪽 구간이 실패하거나 비면 covered_from을 내리지 않아 다음 호출에서 재시도)
+        covered_from = pd.Timestamp(meta['covered_from']) if 'covered_from' in meta else None
+        for start, _, df in parts:
+            if not df.empty and (covered_from is None or pd.Timestamp(start.date()) < covered_from):
+                covered_from = pd.Timestamp(start.date())
+        if covered_from is None:
+            covered_from = pd.Timestamp(cached['Date'].min())
+        # 최근 구간 갱신이 실패했으면 TTL을 늘리지 않음
+        refreshed = all(not df.empty for _, end, df in parts if end >= now)
+        meta = {
+            'ticker': ticker,
+            'covered_from': str(covered_from.date()),
+            'fetched_at': now.timestamp() if refreshed else meta.get('fetched_at', 0.0),
+            'fresh_until': next_session_close(ticker, now).timestamp() if refreshed else meta.get('fresh_until', 0.0),
+        }
+        self._write(name, cached, meta)
+
+    def get(self, start_date: datetime, tickers: dict = MACRO_TICKERS) -> list:
+        """start_date 이후 티커별 일봉 DataFrame 목록 (필요한 티커만 동시 다운로드)"""
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        stale = {}
+        for ticker, name in tickers.items():
+            try:
+                ranges = self._plan(ticker, name, start_date, now)
+            except Exception as e:
+                print(f"⚠️ [{name}] 매크로 캐시 읽기 실패: {e}")
+                ranges = [(start_date, now)]
+            if ranges:
+                stale[ticker] = ranges
+
+        if stale:
+            with ThreadPoolExecutor(max_workers=min(MAX_FETCH_WORKERS, len(stale))) as pool:
+                futures = {pool.submit(self._update, t, tickers[t], start_date, now, r): t for t, r in stale.items()}
+                for future, ticker in futures.items():
+                    try:
+                        future.result()
+                    except Exception as e:
+                        print(f"❌ [{tickers[ticker]}] 매크로 데이터 갱신 실패: {e}")
+
+        frames = []
+        start_day = pd.Timestamp(start_date.date())
+        for ticker, name in tickers.items():
+            cached, _ = self._read(name)
+            if not cached.empty:
+                frames.append(cached[cached['Date'] >= start_day].set_index('Date'))
+        return frames
+
 
 def fetch_macro_data(years=1):
     """
     Yahoo Finance에서 주요 거시 경제 지표 데이터를 가져옵니다.
+    디스크 캐시(MacroCache)를 거치므로 다음 장 마감 전까지의 반복 호출은 네트워크 요청이 없습니다.
     """
     end_date = datetime.now()
     start_date = end_date - timedelta(days=years * 365 + 10)
     
-    # 1. 대상 지표 설정 (보강됨)
-    tickers = {
-        'DX-Y.NYB': 'DXY',      # 달러 인덱스
-        '^TNX': 'US10Y',        # 미국채 10년물 금리
-        '^NDX': 'Nasdaq100',    # 나스닥 100
-        'GC=F': 'Gold',         # 금 선물
-        '^VIX': 'VIX',          # 변동성 지수
-        'CL=F': 'Oil',          # 국제 유가 (WTI)
-        'SMH': 'Semiconductor', # 반도체 지수 (ETF)
-        'ETHBTC=X': 'ETH_BTC'   # 이더리움/비트코인 비율
-    }
-    
     print(f"[{datetime.now()}] 매크로 지표 데이터 수집 중 (기간: {years}년)...")
     
     try:
-        macro_frames = []
-        for ticker, name in tickers.items():
-            print(f"[{name}] 데이터 다운로드 중...")
-            df = yf.download(ticker, start=start_date, end=end_date, progress=False)
-            if not df.empty:
-                # MultiIndex 방지: 단일 컬럼만 추출
-                if isinstance(df.columns, pd.MultiIndex):
-                    df.columns = df.columns.get_level_values(0)
-                
-                col = 'Adj Close' if 'Adj Close' in df.columns else 'Close'
-                df = df[[col]].rename(columns={col: name})
-                macro_frames.append(df)
+        macro_frames = MacroCache().get(start_date)
         
         if not macro_frames:
             return pd.DataFrame()
             
-        data = pd.concat(macro_frames, axis=1)
+        data = pd.concat(macro_frames, axis=1).sort_index()
+        data.index.name = 'Date'
         data = data.reset_index()
         
-        # Date 컬럼 이름 표준화
-        if 'Date' not in data.columns:
-            # 인덱스 이름이 다를 수 있음
-            data.rename(columns={data.columns[0]: 'Date'}, inplace=True)
-        
-        # 주말/공휴일 빈칸 채우기
-        data = data.ffill().bfill()
+        # 주말/공휴일 빈칸 채우기 (앞쪽 값으로만, 미래 값으로 거꾸로 채우지 않음)
+        data = data.ffill()
         
         print(f"✅ 완료: {len(data)}일치 매크로 데이터를 로드했습니다.")
         return data
@@ -57,33 +191,51 @@ def fetch_macro_data(years=1):
         print(f"❌ 매크로 데이터 수집 중 오류 발생: {e}")
         return pd.DataFrame()
 
+def macro_available_ms(day_ms: np.ndarray, name: str) -> np.ndarray:
+    """
+    일봉 날짜(자정 ms)의 값을 실제로 알 수 있게 되는 시각 (ms)
+    미국 지표는 해당일 장 마감 후(SESSION_CLOSE_UTC_HOUR), 암호화폐는 다음날 UTC 자정
+    """
+    tickers = {v: k for k, v in MACRO_TICKERS.items()}
+    if tickers.get(name) in CRYPTO_TICKERS:
+        return day_ms + DAY_MS
+    return day_ms + SESSION_CLOSE_UTC_HOUR * 3_600_000
+
+
+def asof_macro_values(open_ms: np.ndarray, day_ms: np.ndarray, values: np.ndarray, name: str) -> np.ndarray:
+    """
+    각 봉의 Open time 시점에 이미 공개된 가장 최근 매크로 값 (없으면 NaN, 미래 값으로 채우지 않음)
+    int64 정렬 배열의 searchsorted만 사용하므로 봉 수가 많아도 객체 생성이 없습니다.
+    """
+    valid = ~np.isnan(values)
+    avail = macro_available_ms(day_ms[valid], name)
+    idx = np.searchsorted(avail, open_ms, side='right') - 1
+    out = np.full(len(open_ms), np.nan)
+    hit = idx >= 0
+    out[hit] = values[valid][idx[hit]]
+    return out
+
+
 def merge_with_binance_data(binance_df, macro_df):
     """
     바이낸스 시간봉 데이터와 일봉 매크로 데이터를 결합합니다.
+    봉마다 Open time 이전에 공개된 최신 일봉 값을 붙입니다 (as-of, binance_df에 컬럼을 직접 추가).
     """
     if macro_df.empty:
         print("⚠️ 매크로 데이터가 비어있어 결합을 건너뜁니다.")
         return binance_df
 
-    # 1. 날짜 기준 결합을 위해 'Date_Join' 컬럼 생성
-    binance_df['Date_Join'] = binance_df['Open time'].dt.date
-    macro_df['Date_Join'] = pd.to_datetime(macro_df['Date']).dt.date
-    
-    # 2. Merge
-    merged_df = pd.merge(binance_df, macro_df, on='Date_Join', how='left')
-    
-    # 3. 빈칸 채우기
-    macro_cols = ['DXY', 'US10Y', 'Nasdaq100', 'Gold', 'VIX', 'Oil', 'Semiconductor', 'ETH_BTC']
+    macro_df = macro_df.sort_values('Date')
+    open_ms = to_epoch_ms_array(binance_df['Open time'].to_numpy())
+    day_ms = to_epoch_ms_array(pd.to_datetime(macro_df['Date']).dt.normalize().to_numpy())
+
+    macro_cols = list(MACRO_TICKERS.values())
     for col in macro_cols:
-        if col in merged_df.columns:
-            merged_df[col] = merged_df[col].ffill().bfill()
-    
-    # 불필요한 컬럼 제거
-    cols_to_drop = ['Date_Join']
-    if 'Date' in merged_df.columns: cols_to_drop.append('Date')
-    merged_df = merged_df.drop(columns=cols_to_drop)
+        if col in macro_df.columns:
+            values = macro_df[col].to_numpy(dtype=np.float64)
+            binance_df[col] = asof_macro_values(open_ms, day_ms, values, col)
     
-    return merged_df
+    return binance_df
 
 if __name__ == "__main__":
     macro_data = fetch_macro_data(years=1)
@@ -0,0 +1,281 @@
+import os
+import json
+import time
+import fcntl
+import struct
+import numpy as np
+import pandas as pd
+from ohlcv_store import DATA_DIR, to_epoch_ms, to_epoch_ms_array
+
+# ── 고정 폭 바이너리 K-라인 파일 (numpy.memmap 공유 읽기용) ─────────
+# 파일 구조: [헤더 4096 바이트][레코드 0][레코드 1]...
+# 헤더: magic(8) | version(u4) | header_size(u4) | record_size(u4) | n_fields(u4) | n_rows(u8) | 스키마 JSON
+# 평소에는 꼬리에만 추가하고, 이미 내보낸 구간 안/앞에 봉이 보충되면 그 시각부터 새 파일로 다시 써서 교체합니다.
+# 범위: data_sync가 동기화 후 Parquet 저장소의 마감 봉을 이 파일로 미러링하고, 원시 OHLCV 배열만 필요한 읽기
+# (check_nans, streaming_features 패리티 검사, intrabar의 1m 판정)가 load_frame/MmapOHLCV로 읽습니다.
+# 학습(train_xrp_v4)/실시간 예측은 이 스키마에 없는 컬럼(Number of trades, Close time)과 상위 봉 집계, 펀딩비 결합이
+# 필요해 fetch_historical_data를 쓰고, backtester는 K-라인이 아닌 학습 때 만든 피처 CSV를 읽으므로 대상이 아닙니다.
+MAGIC = b'BSPOHLCV'
+VERSION = 1
+HEADER_SIZE = 4096
+_HEADER_STRUCT = struct.Struct('<8sIIIIQ')
+_N_ROWS_OFFSET = 24 # 커밋된 행 수 위치 (8바이트 정렬 → 단일 쓰기로 갱신)
+
+RECORD_DTYPE = np.dtype([
+    ('open_time', '<i8'),
+    ('open', '<f8'),
+    ('high', '<f8'),
+    ('low', '<f8'),
+    ('close', '<f8'),
+    ('volume', '<f8'),
+    ('quote_volume', '<f8'),
+    ('taker_buy_base', '<f8'),
+    ('taker_buy_quote', '<f8'),
+])
+
+# 레코드 필드 ↔ 바이낸스 K-라인 컬럼명
+FIELD_TO_COLUMN = {
+    'open_time': 'Open time',
+    'open': 'Open',
+    'high': 'High',
+    'low': 'Low',
+    'close': 'Close',
+    'volume': 'Volume',
+    'quote_volume': 'Quote asset volume',
+    'taker_buy_base': 'Taker buy base asset volume',
+    'taker_buy_quote': 'Taker buy quote asset volume',
+}
+
+
+def _to_records(df: pd.DataFrame) -> np.ndarray:
+    """K-라인 DataFrame → open_time 순 레코드 배열"""
+    records = np.empty(len(df), dtype=RECORD_DTYPE)
+    for field, col in FIELD_TO_COLUMN.items():
+        if field == 'open_time':
+            records[field] = to_epoch_ms_array(df[col])
+        else:
+            records[field] = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=np.float64)
+    return np.sort(records, order='open_time')
+
+
+def mmap_path(symbol: str, interval: str, root: str = DATA_DIR) -> str:
+    return os.path.join(root, f"{symbol}_{interval}.ohlcv")
+
+
+def _schema_bytes() -> bytes:
+    schema = [[name, RECORD_DTYPE.fields[name][0].str] for name in RECORD_DTYPE.names]
+    return json.dumps({'fields': schema}).encode('utf-8')
+
+
+class MmapOHLCV:
+    """
+    심볼/인터벌별 고정 폭 K-라인 파일
+    - 읽기: numpy.memmap 뷰를 반환하므로 여러 프로세스가 페이지 캐시를 복사 없이 공유합니다.
+    - 쓰기: 단일 writer (flock). 레코드를 커밋 영역 뒤에 먼저 쓰고 fsync한 뒤
+      헤더의 n_rows를 갱신하므로, 동시에 읽는 쪽은 항상 완성된 행만 봅니다.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        if not os.path.exists(path):
+            self._create()
+        self._check_header()
+
+    @classmethod
+    def for_series(cls, symbol: str, interval: str, root: str = DATA_DIR):
+        return cls(mmap_path(symbol, interval, root))
+
+    def _create(self, records: np.ndarray = None):
+        """헤더(+레코드)를 임시 파일에 쓰고 원자적으로 교체 (기존 memmap 뷰는 이전 파일을 계속 봄)"""
+        records = np.empty(0, dtype=RECORD_DTYPE) if records is None else records
+        schema = _schema_bytes()
+        header = _HEADER_STRUCT.pack(MAGIC, VERSION, HEADER_SIZE, RECORD_DTYPE.itemsize, len(RECORD_DTYPE.names),
+                                     len(records))
+        header = (header + schema).ljust(HEADER_SIZE, b'\0')
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(header)
+            f.write(records.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def _read_header(self):
+        with open(self.path, 'rb') as f:
+            raw = f.read(HEADER_SIZE)
+        return _HEADER_STRUCT.unpack_from(raw, 0), raw[_HEADER_STRUCT.size:].rstrip(b'\0')
+
+    def _check_header(self):
+        (magic, version, header_size, record_size, n_fields, _), schema = self._read_header()
+        if magic != MAGIC:
+            raise ValueError(f"K-라인 바이너리 파일이 아닙니다: {self.path}")
+        if version != VERSION or header_size != HEADER_SIZE or record_size != RECORD_DTYPE.itemsize:
+            raise ValueError(f"지원하지 않는 파일 버전/스키마입니다 (version={version}, record_size={record_size})")
+        if json.loads(schema.decode('utf-8')) != json.loads(_schema_bytes().decode('utf-8')):
+            raise ValueError("파일의 스키마가 현재 RECORD_DTYPE과 다릅니다.")
+
+    def __len__(self) -> int:
+        """커밋된 행 수"""
+        return self._read_header()[0][5]
+
+    def read(self) -> np.ndarray:
+        """커밋된 전체 레코드를 읽기 전용 memmap 구조체 배열로 반환 (복사 없음)"""
+        n_rows = len(self)
+        if n_rows == 0:
+            return np.empty(0, dtype=RECORD_DTYPE)
+        return np.memmap(self.path, dtype=RECORD_DTYPE, mode='r', offset=HEADER_SIZE, shape=(n_rows,))
+
+    def column(self, name: str) -> np.ndarray:
+        """단일 필드 뷰 (예: 'close') - 레코드 간 stride를 갖는 NumPy 뷰"""
+        return self.read()[name]
+
+    def read_range(self, start=None, end=None) -> np.ndarray:
+        """[start, end) Open time 구간의 레코드 뷰 (open_time 이분 탐색)"""
+        records = self.read()
+        open_time = records['open_time']
+        i = 0 if start is None else int(np.searchsorted(open_time, to_epoch_ms(start), side='left'))
+        j = len(records) if end is None else int(np.searchsorted(open_time, to_epoch_ms(end), side='left'))
+        return records[i:j]
+
+    def last_open_time(self):
+        records = self.read()
+        return int(records['open_time'][-1]) if len(records) else None
+
+    def append(self, df: pd.DataFrame) -> int:
+        """
+        마지막 커밋 행 이후의 봉만 추가합니다 (이미 기록된 봉은 수정하지 않음).
+        미완성 봉이 기록되지 않도록 호출 측에서 마감된 봉만 넘겨야 합니다.
+        반환값: 추가된 행 수
+        """
+        if df is None or df.empty:
+            return 0
+        records = _to_records(df)
+
+        lock_path = self.path + ".lock"
+        with open(lock_path, 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                with open(self.path, 'r+b') as f:
+                    n_rows = _HEADER_STRUCT.unpack_from(f.read(HEADER_SIZE), 0)[5]
+                    if n_rows > 0:
+                        f.seek(HEADER_SIZE + (n_rows - 1) * RECORD_DTYPE.itemsize)
+                        last = np.frombuffer(f.read(RECORD_DTYPE.itemsize), dtype=RECORD_DTYPE)[0]['open_time']
+                        records = records[records['open_time'] > last]
+                    if len(records) > 0:
+                        _, keep = np.unique(records['open_time'], return_index=True)
+                        records = records[keep]
+                    if len(records) == 0:
+                        return 0
+
+                    # 1) 커밋 영역 뒤에 레코드 기록 (이전 비정상 종료로 남은 꼬리는 잘라냄)
+                    committed_size = HEADER_SIZE + n_rows * RECORD_DTYPE.itemsize
+                    os.ftruncate(f.fileno(), committed_size)
+                    f.seek(committed_size)
+                    f.write(records.tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+
+                    # 2) n_rows 갱신 = 커밋 (읽는 쪽은 이 값까지만 매핑)
+                    f.seek(_N_ROWS_OFFSET)
+                    f.write(struct.pack('<Q', n_rows + len(records)))
+                    f.flush()
+                    os.fsync(f.fileno())
+                    return len(records)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def rewrite_from(self, start_ms: int, df: pd.DataFrame) -> int:
+        """
+        open_time >= start_ms 구간을 df의 봉으로 교체 (저장소에 이미 내보낸 시각 이전의 봉이 보충된 경우)
+        앞쪽 레코드를 복사한 새 파일로 원자적으로 교체하므로 이미 열린 memmap 뷰는 이전 파일을 계속 봅니다.
+        반환값: 교체 후 전체 행 수
+        """
+        lock_path = self.path + ".lock"
+        with open(lock_path, 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                records = self.read()
+                keep = records[:int(np.searchsorted(records['open_time'], start_ms, side='left'))]
+                new = _to_records(df) if df is not None and not df.empty else np.empty(0, dtype=RECORD_DTYPE)
+                new = new[new['open_time'] >= start_ms]
+                _, first = np.unique(new['open_time'], return_index=True)
+                self._create(np.concatenate([np.asarray(keep), new[first]]))
+                return len(keep) + len(first)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def append_closed(self, df: pd.DataFrame, now_ms: int = None) -> int:
+        """Close time이 현재 시각 이전인(마감된) 봉만 추가"""
+        if df is None or df.empty or 'Close time' not in df.columns:
+            return 0
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        close_ms = to_epoch_ms_array(df['Close time'])
+        return self.append(df[close_ms < now_ms])
+
+    def to_frame(self, start=None, end=None) -> pd.DataFrame:
+        """기존 코드와 같은 컬럼명의 DataFrame으로 변환 (이 단계에서만 복사 발생)"""
+        records = self.read_range(start, end)
+        df = pd.DataFrame({col: np.asarray(records[field]) for field, col in FIELD_TO_COLUMN.items()})
+        df['Open time'] = df['Open time'].to_numpy(dtype=np.int64).astype('datetime64[ms]')
+        return df
+
+
+def load_frame(symbol: str, interval: str, start=None, end=None, root: str = DATA_DIR) -> pd.DataFrame:
+    """바이너리 파일에서 K-라인 DataFrame 로드 (파일이 없으면 빈 DataFrame)"""
+    path = mmap_path(symbol, interval, root)
+    if not os.path.exists(path):
+        return pd.DataFrame()
+    return MmapOHLCV(path).to_frame(start, end)
+
+
+def _first_stale_ms(mm: MmapOHLCV, coverage, last_ms: int):
+    """
+    저장소에는 있는데 파일에 없는 봉 중 last_ms 이하인 가장 이른 open time (없으면 None)
+    (data_sync의 과거 구간 보충/결측 보충이 이미 내보낸 구간 안이나 앞에 봉을 넣은 경우)
+    구간 목록의 봉 수로 먼저 비교하므로 평소에는 파일을 읽지 않습니다.
+    """
+    from coverage_index import runs_from_open_times
+    if coverage is None or not coverage.runs:
+        return None
+    stored = [[a, min(b, last_ms)] for a, b in coverage.runs if a <= last_ms]
+    if sum((b - a) // coverage.step + 1 for a, b in stored) <= len(mm):
+        return None
+    exported = runs_from_open_times(mm.column('open_time'), coverage.step)
+    for (a, b), (c, d) in zip(stored, exported):
+        if a != c:
+            return min(a, c)
+        if b != d:
+            return min(b, d) + coverage.step
+    return stored[len(exported)][0] if len(stored) > len(exported) else None
+
+
+def export_from_store(symbol: str, interval: str, store=None, now_ms: int = None) -> int:
+    """
+    Parquet 저장소의 마감된 봉을 바이너리 파일로 내보냄 (이미 있는 구간은 건너뜀)
+    저장소에 이미 내보낸 시각 이전의 봉이 새로 생겼으면 그 시각부터 파일을 다시 씀
+    """
+    from ohlcv_store import OHLCVStore
+    store = store or OHLCVStore()
+    mm = MmapOHLCV(mmap_path(symbol, interval, store.root))
+    last = mm.last_open_time()
+    stale = _first_stale_ms(mm, store.coverage(symbol, interval), last) if last is not None else None
+    if stale is not None:
+        df = store.load_range(symbol, interval, stale, None)
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        if 'Close time' in df.columns:
+            df = df[to_epoch_ms_array(df['Close time']) < now_ms]
+        before = len(mm)
+        total = mm.rewrite_from(stale, df)
+        print(f"🩹 [{symbol} {interval}] 보충된 봉 반영: {pd.Timestamp(stale, unit='ms')}부터 다시 기록 "
+              f"({before}건 → {total}건)")
+        return total - before
+    df = store.load_range(symbol, interval, None if last is None else last + 1, None)
+    rows = mm.append_closed(df, now_ms)
+    if rows:
+        print(f"✅ [{symbol} {interval}] 바이너리 K-라인 파일 갱신: +{rows}건 (총 {len(mm)}건)")
+    return rows
+
+
+if __name__ == "__main__":
+    export_from_store('XRPUSDT', '1h')
+    export_from_store('XRPUSDT', '15m')
@@ -7,6 +7,13 @@ import numpy as np
 import optuna
 import joblib
 import os
+import json
+import time
+import hashlib
+import warnings
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from ohlcv_store import DATA_DIR
 
 # 추천 XGBoost 하이퍼파라미터 (XRP 특화)
 BEST_PARAMS_XRP = {
@@ -27,63 +34,203 @@ BEST_PARAMS_XRP = {
     'tree_method': 'hist', # 빠른 학습
 }
 
-def optimize_hyperparams(X_train, y_train, n_trials: int = 50) -> dict:
+# ── Optuna 탐색 저장소 (재시작 후 이어하기 + 프로세스 병렬 + 폴드별 가지치기) ──
+# 스터디 이름은 학습 데이터 지문({접두어}-{지문 해시}: 마지막 봉 시각, 행 수, 피처 목록/레이블 해시)으로 정하고
+# 지문을 study.user_attrs에 기록합니다. 같은 데이터로 다시 실행할 때만 이어서 진행하고(끝난 시행 수만큼 건너뜀),
+# 데이터가 바뀌면 새 스터디를 만들어 같은 접두어의 가장 최근 스터디 상위 시행 파라미터를 먼저 시도합니다 (warm start).
+# 저장소는 하트비트를 지원하는 RDB(기본 로컬 SQLite)입니다. 프로세스가 죽어 하트비트가 끊긴 시행만 FAIL로 바뀌고
+# 같은 파라미터로 다시 대기열에 들어갑니다 (다른 워커가 실행 중인 시행은 건드리지 않음).
+# 각 시행은 TimeSeriesSplit 폴드마다 누적 평균 F1을 보고하고, 같은 폴드의 중앙값보다 낮으면 나머지 폴드를 건너뜁니다.
+# storage에는 파일 경로(SQLite) 또는 'postgresql://...' 같은 RDB URL을 줄 수 있습니다.
+OPTUNA_STORAGE = os.path.join(DATA_DIR, "_optuna.db")
+OPTUNA_N_SPLITS = 5
+OPTUNA_STARTUP_TRIALS = 5 # 가지치기 전 끝까지 학습하는 시행 수 (중앙값 기준)
+OPTUNA_WARM_START = 5 # 직전 스터디에서 가져오는 상위 시행 수
+OPTUNA_HEARTBEAT_SEC = 60 # 실행 중 시행의 하트비트 주기
+OPTUNA_GRACE_SEC = 180 # 이 시간 동안 하트비트가 없으면 죽은 시행으로 보고 FAIL 처리
+OPTUNA_MAX_RETRY = 2 # 죽은 시행을 같은 파라미터로 다시 시도하는 최대 횟수
+warnings.filterwarnings('ignore', category=optuna.exceptions.ExperimentalWarning) # 하트비트 API는 실험 기능 표시만 붙어 있음
+
+
+def _open_storage(storage: str):
+    url = storage
+    if '://' not in storage:
+        os.makedirs(os.path.dirname(os.path.abspath(storage)), exist_ok=True)
+        url = f"sqlite:///{os.path.abspath(storage)}"
+    engine_kwargs = {'connect_args': {'timeout': 60}} if url.startswith('sqlite') else None # 워커 동시 쓰기 대기
+    return optuna.storages.RDBStorage(
+        url, engine_kwargs=engine_kwargs,
+        heartbeat_interval=OPTUNA_HEARTBEAT_SEC, grace_period=OPTUNA_GRACE_SEC,
+        heartbeat_stale_trial_callback=optuna.storages.RetryHeartbeatStaleTrialCallback(max_retry=OPTUNA_MAX_RETRY),
+    )
+
+
+def data_fingerprint(X_train, y_train, last_bar=None) -> dict:
+    """학습 데이터 지문 (마지막 봉 시각, 행 수, 피처 목록 해시, 레이블 해시). last_bar가 없으면 X_train의 마지막 인덱스"""
+    columns = [str(c) for c in getattr(X_train, 'columns', [])]
+    if last_bar is None:
+        last_bar = X_train.index[-1] if hasattr(X_train, 'index') else len(X_train) - 1
+    labels = np.ascontiguousarray(np.asarray(y_train, dtype=np.int64))
+    return {
+        'last_bar': str(last_bar),
+        'n_rows': int(len(X_train)),
+        'features': hashlib.sha1("\n".join(columns).encode()).hexdigest()[:12],
+        'labels': hashlib.sha1(labels.tobytes()).hexdigest()[:12],
+    }
+
+
+def study_name_for(prefix: str, fingerprint: dict) -> str:
+    """데이터 지문별 스터디 이름 (예: XRPUSD_PERP-3f9c0a1b2d)"""
+    key = hashlib.sha1(json.dumps(fingerprint, sort_keys=True).encode()).hexdigest()[:10]
+    return f"{prefix}-{key}"
+
+
+def _latest_study(storage, prefix: str, exclude: str):
+    """같은 접두어의 다른 스터디 중 가장 최근에 시작한 것 (없으면 None)"""
+    summaries = [s for s in optuna.get_all_study_summaries(storage, include_best_trial=False)
+                 if s.study_name.startswith(prefix + '-') and s.study_name != exclude and s.datetime_start is not None]
+    if not summaries:
+        return None
+    latest = max(summaries, key=lambda s: s.datetime_start)
+    return optuna.load_study(study_name=latest.study_name, storage=storage)
+
+
+def _load_study(study_name: str, storage, n_workers: int):
+    return optuna.create_study(
+        study_name=study_name, storage=storage, direction='maximize', load_if_exists=True,
+        sampler=optuna.samplers.TPESampler(constant_liar=n_workers > 1), # 병렬 시행끼리 같은 점을 고르지 않도록
+        pruner=optuna.pruners.MedianPruner(n_startup_trials=OPTUNA_STARTUP_TRIALS, n_warmup_steps=0),
+    )
+
+
+def _objective(trial, X_vals, y_vals, n_jobs: int) -> float:
+    params = {
+        'n_estimators': trial.suggest_int('n_estimators', 100, 1000),
+        'max_depth': trial.suggest_int('max_depth', 3, 8),
+        'learning_rate': trial.suggest_float('learning_rate', 0.01, 0.3, log=True),
+        'subsample': trial.suggest_float('subsample', 0.5, 1.0),
+        'colsample_bytree': trial.suggest_float('colsample_bytree', 0.5, 1.0),
+        'min_child_weight': trial.suggest_int('min_child_weight', 1, 20),
+        'gamma': trial.suggest_float('gamma', 0.0, 1.0),
+        'reg_alpha': trial.suggest_float('reg_alpha', 0.0, 2.0),
+        'reg_lambda': trial.suggest_float('reg_lambda', 0.0, 2.0),
+        'objective': 'multi:softprob',
+        'num_class': 3,
+        'random_state': 42,
+        'n_jobs': n_jobs,
+        'tree_method': 'hist',
+    }
+
+    scores = []
+    tscv = TimeSeriesSplit(n_splits=OPTUNA_N_SPLITS)
+    for fold, (train_idx, val_idx) in enumerate(tscv.split(X_vals)):
+        X_tr, X_val = X_vals[train_idx], X_vals[val_idx]
+        y_tr, y_val = y_vals[train_idx], y_vals[val_idx]
+
+        model = xgb.XGBClassifier(**params, early_stopping_rounds=30)
+        model.fit(
+            X_tr, y_tr,
+            eval_set=[(X_val, y_val)],
+            verbose=False
+        )
+        pred = model.predict(X_val)
+        scores.append(f1_score(y_val, pred, average='weighted'))
+
+        # 폴드별 중간 보고 → 가망 없는 시행은 남은 폴드를 학습하지 않음
+        trial.report(float(np.mean(scores)), fold)
+        if trial.should_prune():
+            raise optuna.TrialPruned()
+
+    return np.mean(scores)
+
+
+def _optimize_worker(args) -> int:
+    """워커 프로세스: 같은 스터디를 열어 최대 share회, 전체 완료 시행 수가 n_trials가 될 때까지 시행"""
+    study_name, storage, X_vals, y_vals, n_trials, share, n_jobs, n_workers = args
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+    study = _load_study(study_name, _open_storage(storage), n_workers)
+    done = (optuna.trial.TrialState.COMPLETE, optuna.trial.TrialState.PRUNED)
+    study.optimize(lambda trial: _objective(trial, X_vals, y_vals, n_jobs), n_trials=share,
+                   callbacks=[optuna.study.MaxTrialsCallback(n_trials, states=done)])
+    return len(study.get_trials(deepcopy=False, states=done))
+
+
+def optimize_hyperparams(X_train, y_train, n_trials: int = 50, study_prefix: str = 'xgb', storage: str = OPTUNA_STORAGE,
+                         workers: int = None, warm_start: int = OPTUNA_WARM_START, last_bar=None) -> dict:
     """
     Optuna를 이용한 자동 하이퍼파라미터 탐색
     TimeSeriesSplit으로 시계열 데이터 누수 방지
+    - 스터디는 학습 데이터 지문(data_fingerprint)별로 storage에 저장되어, 같은 데이터로 다시 실행하면 남은 시행만 수행
+      (n_trials = 완료 + 가지치기 시행 수 목표). 데이터가 바뀌면 새 스터디
+    - workers: 시행을 병렬로 돌리는 프로세스 수 (None이면 CPU 수, 1이면 현재 프로세스). XGBoost 스레드는 CPU 수 / workers
+    - warm_start: 새 스터디에 먼저 넣을 직전 스터디(같은 접두어)의 상위 시행 수 (n_trials를 넘지 않음)
+    - last_bar: 학습 구간 마지막 봉 시각 (지문에 사용, 없으면 X_train의 마지막 인덱스)
     """
-    tscv = TimeSeriesSplit(n_splits=5)
-
-    def objective(trial):
-        params = {
-            'n_estimators': trial.suggest_int('n_estimators', 100, 1000),
-            'max_depth': trial.suggest_int('max_depth', 3, 8),
-            'learning_rate': trial.suggest_float('learning_rate', 0.01, 0.3, log=True),
-            'subsample': trial.suggest_float('subsample', 0.5, 1.0),
-            'colsample_bytree': trial.suggest_float('colsample_bytree', 0.5, 1.0),
-            'min_child_weight': trial.suggest_int('min_child_weight', 1, 20),
-            'gamma': trial.suggest_float('gamma', 0.0, 1.0),
-            'reg_alpha': trial.suggest_float('reg_alpha', 0.0, 2.0),
-            'reg_lambda': trial.suggest_float('reg_lambda', 0.0, 2.0),
-            'objective': 'multi:softprob',
-            'num_class': 3,
-            'random_state': 42,
-            'n_jobs': -1,
-            'tree_method': 'hist',
-        }
-        
-        scores = []
-        # X_train이 pandas DataFrame인 경우 처리를 위해 변환
-        X_vals = X_train.values if hasattr(X_train, 'values') else X_train
-        y_vals = y_train.values if hasattr(y_train, 'values') else y_train
-
-        for train_idx, val_idx in tscv.split(X_vals):
-            X_tr, X_val = X_vals[train_idx], X_vals[val_idx]
-            y_tr, y_val = y_vals[train_idx], y_vals[val_idx]
-            
-            model = xgb.XGBClassifier(**params, early_stopping_rounds=30)
-            model.fit(
-                X_tr, y_tr,
-                eval_set=[(X_val, y_val)],
-                verbose=False
-            )
-            pred = model.predict(X_val)
-            scores.append(f1_score(y_val, pred, average='weighted'))
-            
-        return np.mean(scores)
-
-    study = optuna.create_study(direction='maximize')
-    study.optimize(objective, n_trials=n_trials)
-    
+    # X_train이 pandas DataFrame인 경우 처리를 위해 변환
+    X_vals = X_train.values if hasattr(X_train, 'values') else X_train
+    y_vals = y_train.values if hasattr(y_train, 'values') else y_train
+
+    cpus = os.cpu_count() or 1
+    workers = max(1, min(cpus if workers is None else workers, n_trials))
+    n_jobs = max(1, cpus // workers)
+    fingerprint = data_fingerprint(X_train, y_train, last_bar)
+    study_name = study_name_for(study_prefix, fingerprint)
+    rdb = _open_storage(storage)
+    study = _load_study(study_name, rdb, workers)
+    states = optuna.trial.TrialState
+
+    stored = study.user_attrs.get('fingerprint')
+    if stored is None:
+        study.set_user_attr('fingerprint', fingerprint)
+    elif stored != fingerprint:
+        raise ValueError(f"스터디 {study_name}의 데이터 지문이 다릅니다: {stored} != {fingerprint}")
+
+    # 하트비트가 끊긴(중단된 프로세스의) 시행만 FAIL 처리 → RetryHeartbeatStaleTrialCallback이 같은 파라미터로 다시 대기열에 넣음
+    optuna.storages.fail_stale_trials(study)
+
+    done = study.get_trials(deepcopy=False, states=(states.COMPLETE, states.PRUNED))
+    if done:
+        print(f"♻️ [Optuna] 같은 학습 데이터의 스터디 {study_name} 이어서 진행 (완료 {len(done)}/{n_trials}회)")
+    elif warm_start > 0 and not study.get_trials(deepcopy=False, states=(states.WAITING,)):
+        prev = _latest_study(rdb, study_prefix, exclude=study_name)
+        prev_trials = []
+        if prev is not None:
+            prev_trials = sorted(prev.get_trials(deepcopy=False, states=(states.COMPLETE,)),
+                                 key=lambda t: t.value, reverse=True)[:min(warm_start, n_trials)]
+        for trial in prev_trials:
+            study.enqueue_trial(trial.params, skip_if_exists=True)
+        if prev_trials:
+            print(f"🔥 [Optuna] 학습 데이터가 바뀌어 새 스터디 {study_name}를 만들고 직전 스터디 {prev.study_name}의 상위 {len(prev_trials)}개 시행으로 시작합니다.")
+
+    remaining = n_trials - len(done)
+    if remaining > 0:
+        workers = min(workers, remaining)
+        print(f"🔎 [Optuna] {study_name}: {remaining}회 시행 | 프로세스 {workers}개 x XGBoost 스레드 {n_jobs}개 | 폴드별 가지치기")
+        t0 = time.time()
+        share = -(-remaining // workers)
+        tasks = [(study_name, storage, X_vals, y_vals, n_trials, share, n_jobs, workers)] * workers
+        if workers == 1:
+            list(map(_optimize_worker, tasks))
+        else:
+            # 학습 프로세스는 XGBoost/BLAS 스레드가 떠 있으므로 fork 대신 spawn으로 새 인터프리터에서 시작 (잠금 상태 복제 방지)
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+                list(pool.map(_optimize_worker, tasks))
+        finished = study.get_trials(deepcopy=False, states=(states.COMPLETE, states.PRUNED))
+        pruned = sum(t.state == states.PRUNED for t in finished)
+        print(f"⏱️ [Optuna] {time.time() - t0:.1f}초 | 완료 {len(finished) - pruned}회, 가지치기 {pruned}회")
+
     print(f"최적 F1-Score: {study.best_value:.4f}")
     print(f"최적 파라미터: {study.best_params}")
     return study.best_params
 
-def train_model(X_train, y_train, params: dict = None, use_pca: bool = True, n_components: int = 25, use_weight: bool = True) -> tuple:
+def train_model(X_train, y_train, params: dict = None, use_pca: bool = True, n_components: int = 25, use_weight: bool = True,
+                uniqueness=None) -> tuple:
     """
     전처리 + 모델 학습 파이프라인
     PCA 25개 주성분 = 분산의 약 90% 설명 (연구 결과 기반)
     use_weight=True 시 SHORT(0) 클래스에 가중치 부여 (3번 전략)
+    uniqueness: 표본별 평균 고유도 (label_engineering.average_uniqueness, y_train과 같은 순서).
+                주면 겹치는 배리어 레이블의 가중치를 낮춤 (클래스 가중치와 곱해 평균 1로 정규화)
     반환값: (model, scaler, pca_transformer)
     """
     if params is None:
@@ -96,6 +243,15 @@ def train_model(X_train, y_train, params: dict = None, use_pca: bool = True, n_c
         sample_weights = compute_sample_weight(class_weight='balanced', y=y_train)
         print("✅ 클래스 불균형 해소를 위해 'balanced' 가중치를 적용했습니다.")
 
+    if uniqueness is not None:
+        uniqueness = np.asarray(uniqueness, dtype=np.float64)
+        if len(uniqueness) != len(y_train):
+            raise ValueError(f"uniqueness 길이({len(uniqueness)})가 학습 표본 수({len(y_train)})와 다릅니다.")
+        uniqueness = np.nan_to_num(uniqueness, nan=0.0)
+        sample_weights = uniqueness if sample_weights is None else sample_weights * uniqueness
+        sample_weights = sample_weights / sample_weights.mean()
+        print(f"✅ 레이블 고유도 가중치를 적용했습니다. (평균 고유도 {uniqueness.mean():.3f})")
+
     # 스케일링
     scaler = StandardScaler()
     X_scaled = scaler.fit_transform(X_train)
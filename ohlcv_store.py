@@ -0,0 +1,277 @@
+import os
+import glob
+import bisect
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as pads
+from binance.helpers import interval_to_milliseconds
+from coverage_index import CoverageIndex
+
+# 데이터 저장 경로 설정 (data_sync와 동일)
+DATA_DIR = "/home/jeong-kihun/.openclaw/workspace/Binance_Signal_Predictor/data_storage"
+
+DAY_MS = 86_400_000
+
+# 저장 스키마: 시간 컬럼은 int64(ms), 가격/거래량은 float64로 고정
+INT_COLUMNS = ['Open time', 'Close time', 'Number of trades']
+FLOAT_COLUMNS = [
+    'Open', 'High', 'Low', 'Close', 'Volume',
+    'Quote asset volume', 'Taker buy base asset volume', 'Taker buy quote asset volume'
+]
+KLINE_COLUMNS = [
+    'Open time', 'Open', 'High', 'Low', 'Close', 'Volume',
+    'Close time', 'Quote asset volume', 'Number of trades',
+    'Taker buy base asset volume', 'Taker buy quote asset volume'
+]
+
+
+def to_epoch_ms_array(values) -> np.ndarray:
+    """datetime 또는 정수(ms) 컬럼을 int64 ms 배열로 변환"""
+    s = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(s):
+        if s.dt.tz is not None:
+            s = s.dt.tz_convert('UTC').dt.tz_localize(None)
+        return s.to_numpy(dtype='datetime64[ms]').astype(np.int64)
+    return pd.to_numeric(s, errors='coerce').to_numpy(dtype=np.int64)
+
+
+def to_epoch_ms(ts):
+    """시각(ms 정수, datetime, 문자열)을 UTC 기준 ms 정수로 변환. None은 그대로 반환"""
+    if ts is None:
+        return None
+    if isinstance(ts, (int, np.integer)):
+        return int(ts)
+    stamp = pd.Timestamp(ts)
+    if stamp.tzinfo is not None:
+        stamp = stamp.tz_convert('UTC').tz_localize(None)
+    return int(stamp.value // 1_000_000)
+
+
+def _to_typed(df: pd.DataFrame) -> pd.DataFrame:
+    """바이낸스 K-라인 DataFrame을 저장용 고정 스키마(int64/float64)로 변환"""
+    out = pd.DataFrame(index=pd.RangeIndex(len(df)))
+    for col in KLINE_COLUMNS:
+        if col not in df.columns:
+            if col in FLOAT_COLUMNS:
+                out[col] = np.nan
+            else:
+                out[col] = np.zeros(len(df), dtype=np.int64)
+            continue
+        if col in ('Open time', 'Close time'):
+            out[col] = to_epoch_ms_array(df[col].to_numpy())
+        elif col in INT_COLUMNS:
+            out[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).to_numpy(dtype=np.int64)
+        else:
+            out[col] = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=np.float64)
+    out = out.sort_values('Open time', kind='stable')
+    return out.drop_duplicates(subset=['Open time'], keep='last').reset_index(drop=True)
+
+
+def _to_frame(typed: pd.DataFrame) -> pd.DataFrame:
+    """저장 스키마를 기존 코드가 기대하는 형태(Open time = datetime64)로 변환 (문자열 파싱 없음)"""
+    df = typed.reset_index(drop=True)
+    df['Open time'] = df['Open time'].to_numpy(dtype=np.int64).astype('datetime64[ms]')
+    return df
+
+
+class OHLCVStore:
+    """
+    일(day) 단위로 분할된 Parquet K-라인 저장소
+    - 경로: {root}/{symbol}_{interval}/YYYY-MM-DD.parquet
+    - 신규 데이터는 해당 날짜 파티션만 다시 쓰고, 새 날짜는 새 파티션으로 추가합니다.
+    - 파티션 날짜 목록은 시계열별로 캐시합니다 (디렉터리 mtime이 바뀌면 다시 스캔, append는 캐시를 직접 갱신).
+    """
+
+    def __init__(self, root: str = DATA_DIR):
+        self.root = root
+        self._days = {} # series_dir -> (디렉터리 mtime_ns, 정렬된 날짜 키 목록)
+        os.makedirs(self.root, exist_ok=True)
+
+    def series_dir(self, symbol: str, interval: str) -> str:
+        return os.path.join(self.root, f"{symbol}_{interval}")
+
+    def _partition_path(self, symbol: str, interval: str, day: int) -> str:
+        name = str(np.datetime64(int(day), 'D'))
+        return os.path.join(self.series_dir(symbol, interval), f"{name}.parquet")
+
+    def partition_days(self, symbol: str, interval: str) -> list:
+        """
+        저장된 파티션의 날짜 키(1970-01-01 기준 일수) 목록을 오름차순으로 반환
+        디렉터리 mtime이 캐시와 같으면 glob 없이 캐시를 반환 (다른 프로세스가 파일을 추가/교체하면 mtime이 바뀜)
+        """
+        series_dir = self.series_dir(symbol, interval)
+        try:
+            mtime = os.stat(series_dir).st_mtime_ns
+        except FileNotFoundError:
+            self._days.pop(series_dir, None)
+            return []
+        cached = self._days.get(series_dir)
+        if cached is not None and cached[0] == mtime:
+            return list(cached[1])
+        days = []
+        for p in glob.glob(os.path.join(series_dir, "*.parquet")):
+            name = os.path.basename(p)[:-len(".parquet")]
+            try:
+                days.append(int(np.datetime64(name, 'D').astype(np.int64)))
+            except ValueError:
+                continue
+        days.sort()
+        self._days[series_dir] = (mtime, days)
+        return list(days)
+
+    def exists(self, symbol: str, interval: str) -> bool:
+        return len(self.partition_days(symbol, interval)) > 0
+
+    def _read_partition(self, symbol: str, interval: str, day: int, columns=None) -> pd.DataFrame:
+        return pd.read_parquet(self._partition_path(symbol, interval, day), columns=columns)
+
+    def _read_partitions(self, symbol: str, interval: str, days: list, columns=None) -> pd.DataFrame:
+        """여러 파티션을 한 번에 읽음 (pyarrow 멀티스레드 스캔, 파티션 순서 유지)"""
+        paths = [self._partition_path(symbol, interval, d) for d in days]
+        table = pads.dataset(paths, format='parquet').to_table(columns=columns)
+        return table.to_pandas()
+
+    def _write_partition(self, symbol: str, interval: str, day: int, typed: pd.DataFrame):
+        path = self._partition_path(symbol, interval, day)
+        tmp_path = path + ".tmp"
+        typed.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path) # 원자적 교체 (읽는 쪽이 깨진 파일을 보지 않도록)
+
+    def last_open_time(self, symbol: str, interval: str):
+        """마지막 봉의 Open time(ms)을 반환. 데이터가 없으면 None"""
+        days = self.partition_days(symbol, interval)
+        if not days:
+            return None
+        last = self._read_partition(symbol, interval, days[-1], columns=['Open time'])
+        if last.empty:
+            return None
+        return int(last['Open time'].max())
+
+    def first_open_time(self, symbol: str, interval: str):
+        """첫 봉의 Open time(ms)을 반환. 데이터가 없으면 None"""
+        days = self.partition_days(symbol, interval)
+        if not days:
+            return None
+        first = self._read_partition(symbol, interval, days[0], columns=['Open time'])
+        if first.empty:
+            return None
+        return int(first['Open time'].min())
+
+    def append(self, symbol: str, interval: str, df: pd.DataFrame) -> int:
+        """
+        신규 K-라인을 저장합니다. 변경된 날짜 파티션만 다시 씁니다.
+        반환값: 기록된 행 수
+        """
+        if df is None or df.empty:
+            return 0
+        new = _to_typed(df)
+        os.makedirs(self.series_dir(symbol, interval), exist_ok=True)
+
+        day_keys = new['Open time'].to_numpy() // DAY_MS
+        days, starts = np.unique(day_keys, return_index=True)
+        bounds = list(starts) + [len(new)]
+        existing_days = set(self.partition_days(symbol, interval))
+
+        for k, day in enumerate(days):
+            part = new.iloc[bounds[k]:bounds[k + 1]]
+            if int(day) in existing_days:
+                old = self._read_partition(symbol, interval, int(day))
+                part = pd.concat([old, part], ignore_index=True)
+                part = part.drop_duplicates(subset=['Open time'], keep='last')
+                part = part.sort_values('Open time', kind='stable').reset_index(drop=True)
+            self._write_partition(symbol, interval, int(day), part)
+        self._update_coverage(symbol, interval, new['Open time'].to_numpy())
+        # 직접 쓴 파티션을 날짜 목록 캐시에 반영 (파일/커버리지 교체로 바뀐 mtime도 함께 기록 → 다음 호출에서 glob 없음)
+        series_dir = self.series_dir(symbol, interval)
+        self._days[series_dir] = (os.stat(series_dir).st_mtime_ns, sorted(existing_days.union(int(d) for d in days)))
+        return len(new)
+
+    def coverage(self, symbol: str, interval: str) -> CoverageIndex:
+        """
+        시계열의 보유 구간 인덱스. 인덱스 파일이 없으면 Open time 컬럼만 읽어 1회 생성합니다.
+        바이낸스 인터벌이 아닌 시계열(리샘플 캐시 등)은 None
+        """
+        if interval_to_milliseconds(interval) is None:
+            return None
+        index = CoverageIndex(self.series_dir(symbol, interval), interval)
+        if not index.loaded and self.exists(symbol, interval):
+            days = self.partition_days(symbol, interval)
+            index.add(self._read_partitions(symbol, interval, days, columns=['Open time'])['Open time'].to_numpy())
+            index.save()
+        return index
+
+    def _update_coverage(self, symbol: str, interval: str, open_ms: np.ndarray):
+        """append 후 새 봉의 구간만 인덱스에 병합 (인덱스가 없으면 coverage()가 전체로 생성)"""
+        if interval_to_milliseconds(interval) is None:
+            return
+        index = CoverageIndex(self.series_dir(symbol, interval), interval)
+        if not index.loaded:
+            self.coverage(symbol, interval)
+            return
+        index.add(open_ms)
+        index.save()
+
+    def load(self, symbol: str, interval: str) -> pd.DataFrame:
+        """저장된 전체 시계열을 로드 (Open time은 datetime64[ms])"""
+        days = self.partition_days(symbol, interval)
+        if not days:
+            return pd.DataFrame()
+        return _to_frame(self._read_partitions(symbol, interval, days))
+
+    def load_range(self, symbol: str, interval: str, start=None, end=None, columns=None) -> pd.DataFrame:
+        """
+        [start, end) 구간의 봉만 로드합니다 (Open time 기준, None은 열린 구간).
+        날짜 파티션 목록에서 이분 탐색으로 필요한 파티션만 고르고,
+        정렬된 Open time 안에서 searchsorted로 구간을 잘라내므로 비용은 구간 크기에 비례합니다.
+        """
+        start_ms, end_ms = to_epoch_ms(start), to_epoch_ms(end)
+        days = self.partition_days(symbol, interval)
+        lo = 0 if start_ms is None else bisect.bisect_left(days, start_ms // DAY_MS)
+        hi = len(days) if end_ms is None else bisect.bisect_right(days, (end_ms - 1) // DAY_MS)
+        days = days[lo:hi]
+        if not days:
+            return pd.DataFrame()
+        if columns is not None and 'Open time' not in columns:
+            columns = ['Open time'] + list(columns)
+
+        typed = self._read_partitions(symbol, interval, days, columns=columns)
+        open_ms = typed['Open time'].to_numpy()
+        i = 0 if start_ms is None else int(np.searchsorted(open_ms, start_ms, side='left'))
+        j = len(open_ms) if end_ms is None else int(np.searchsorted(open_ms, end_ms, side='left'))
+        return _to_frame(typed.iloc[i:j])
+
+
+def migrate_csv(csv_path: str, symbol: str, interval: str, store: OHLCVStore = None) -> int:
+    """
+    기존 {symbol}_{interval}.csv 파일을 일 단위 Parquet 저장소로 1회 이전합니다.
+    원본 CSV는 삭제하지 않습니다.
+    """
+    store = store or OHLCVStore()
+    if store.exists(symbol, interval):
+        print(f"ℹ️ [{symbol} {interval}] 이미 이전된 저장소가 있어 건너뜁니다.")
+        return 0
+    df = pd.read_csv(csv_path)
+    df['Open time'] = pd.to_datetime(df['Open time'])
+    rows = store.append(symbol, interval, df)
+    print(f"✅ [{symbol} {interval}] CSV → Parquet 이전 완료: {rows}건")
+    return rows
+
+
+def migrate_all_csv(data_dir: str = DATA_DIR) -> int:
+    """data_dir 내의 모든 K-라인 CSV({symbol}_{interval}.csv)를 이전합니다."""
+    store = OHLCVStore(data_dir)
+    total = 0
+    for path in sorted(glob.glob(os.path.join(data_dir, "*_*.csv"))):
+        name = os.path.basename(path)[:-len(".csv")]
+        symbol, _, interval = name.rpartition('_')
+        if not symbol or interval == 'funding':
+            continue
+        try:
+            total += migrate_csv(path, symbol, interval, store)
+        except Exception as e:
+            print(f"❌ [{name}] 이전 실패: {e}")
+    return total
+
+
+if __name__ == "__main__":
+    migrate_all_csv()
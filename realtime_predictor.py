@@ -8,6 +8,7 @@ from dotenv import load_dotenv
 from data_fetcher import fetch_historical_data
 from analyzer import add_all_indicators
 from macro_fetcher import fetch_macro_data, merge_with_binance_data
+from lookback import required_bars, lookback_start_ms
 
 load_dotenv()
 
@@ -44,8 +45,9 @@ def get_realtime_prediction(symbol='BTCUSDT'):
 
     model = joblib.load(model_path)
 
-    # 2. 최신 코인 데이터 수집 (지표 계산을 위해 넉넉하게 최근 3일치)
-    binance_data = fetch_historical_data(symbol, interval='1h', start_str='3 days ago UTC')
+    # 2. 최신 코인 데이터 수집 (피처의 마지막 봉이 긴 이력과 같은 값이 되는 최소 봉 수)
+    n_bars = required_bars(FEATURE_COLUMNS, source='add_all_indicators')
+    binance_data = fetch_historical_data(symbol, interval='1h', start_str=lookback_start_ms(n_bars, '1h'))
     if binance_data.empty:
         print("❌ 코인 데이터를 가져오는 데 실패했습니다.")
         return None
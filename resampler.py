@@ -0,0 +1,232 @@
+import os
+import json
+import time
+import numpy as np
+import pandas as pd
+from binance.helpers import interval_to_milliseconds
+from ohlcv_store import OHLCVStore, DATA_DIR, KLINE_COLUMNS, to_epoch_ms, to_epoch_ms_array
+
+# ── 상위 타임프레임 리샘플링 (저장된 기본 봉이 유일한 원본) ─────────
+# 1h/4h/1d 봉을 따로 내려받지 않고 로컬 15m(또는 1m) 봉에서 집계합니다.
+BASE_INTERVAL = '15m'
+RESAMPLED_INTERVALS = ('30m', '1h', '2h', '4h', '6h', '8h', '12h', '1d')
+CACHE_DIRNAME = '_resampled'
+PENDING_FILENAME = '_pending.json' # 마감되지 않은 상위 봉 open time 목록
+
+# 컬럼별 집계 방법 (Open/Close/High/Low 외에는 합계)
+SUM_COLUMNS = [
+    'Volume', 'Quote asset volume', 'Number of trades',
+    'Taker buy base asset volume', 'Taker buy quote asset volume'
+]
+
+
+def can_resample(interval: str, base_interval: str = BASE_INTERVAL) -> bool:
+    """interval 봉을 base_interval 봉으로 만들 수 있는지 (UTC 기준 정렬되는 정수배 인터벌만 지원, 1w/1M 제외)"""
+    if interval == base_interval or interval[-1] in ('w', 'M'):
+        return False
+    step, base_step = interval_to_milliseconds(interval), interval_to_milliseconds(base_interval)
+    return step is not None and base_step is not None and step > base_step and step % base_step == 0
+
+
+def _empty_counts(bucket_open: np.ndarray, step: int, base_step: int, empty_runs) -> np.ndarray:
+    """버킷별로 거래소 공백으로 확인된 기본 봉 수 (구간 수 x 버킷 수, 구간은 보통 몇 개)"""
+    counts = np.zeros(len(bucket_open), dtype=np.int64)
+    for a, b in empty_runs:
+        lo = np.maximum(int(a), bucket_open)
+        hi = np.minimum(int(b), bucket_open + step - base_step)
+        counts += np.where(hi >= lo, (hi - lo) // base_step + 1, 0)
+    return counts
+
+
+def resample_ohlcv(df: pd.DataFrame, interval: str, base_interval: str = BASE_INTERVAL, now_ms: int = None,
+                   final_ms: int = None, empty_runs=()):
+    """
+    정렬된 기본 봉 DataFrame을 interval 봉으로 집계합니다 (groupby 없이 reduceat으로 벡터화).
+    반환값: (집계 DataFrame[Open time: int64 ms], 마감 여부 bool 배열)
+    - 버킷은 기본 봉이 모두 있고(empty_runs: 거래소 공백으로 확인된 기본 봉 구간은 있는 것으로 셈)
+      마지막 기본 봉이 final_ms 이전에 마감된 경우에만 마감으로 봅니다 (final_ms가 없으면 now_ms).
+    - 기본 시계열이 버킷 중간에서 시작하면 그 첫 버킷은 잘린 봉이므로 버립니다.
+    """
+    step, base_step = interval_to_milliseconds(interval), interval_to_milliseconds(base_interval)
+    if df is None or df.empty:
+        return pd.DataFrame(columns=KLINE_COLUMNS), np.zeros(0, dtype=bool)
+    now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+    final_ms = now_ms if final_ms is None else final_ms
+
+    open_ms = to_epoch_ms_array(df['Open time'].to_numpy())
+    bucket = open_ms // step * step
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:], len(bucket)]
+
+    out = pd.DataFrame({'Open time': bucket[starts]})
+    out['Open'] = df['Open'].to_numpy(dtype=np.float64)[starts]
+    out['High'] = np.maximum.reduceat(df['High'].to_numpy(dtype=np.float64), starts)
+    out['Low'] = np.minimum.reduceat(df['Low'].to_numpy(dtype=np.float64), starts)
+    out['Close'] = df['Close'].to_numpy(dtype=np.float64)[ends - 1]
+    for col in SUM_COLUMNS:
+        if col in df.columns:
+            values = df[col].to_numpy(dtype=np.int64 if col == 'Number of trades' else np.float64)
+            out[col] = np.add.reduceat(values, starts)
+    out['Close time'] = out['Open time'] + step - 1
+    out = out[[c for c in KLINE_COLUMNS if c in out.columns]]
+
+    # 마감 판정: 기본 봉 수가 다 찼고 (np.diff(starts)) 마지막 기본 봉이 확정 시각 전에 마감
+    expected = step // base_step - _empty_counts(bucket[starts], step, base_step, empty_runs)
+    complete = (np.diff(np.r_[starts, len(bucket)]) >= expected) & (open_ms[ends - 1] + base_step <= final_ms)
+    keep = bucket[starts] >= open_ms[0] # 잘린 첫 버킷 제외
+    return out[keep].reset_index(drop=True), complete[keep]
+
+
+class Resampler:
+    """
+    OHLCVStore의 기본 봉에서 상위 타임프레임 봉을 만들어 반환합니다.
+    - 마감된 상위 봉은 {root}/_resampled/{symbol}_{interval}_from_{base}/ 파티션에 캐시
+    - 다음 호출에서는 캐시 마지막 봉 이후의 기본 봉만 읽어 이어서 집계
+    - 기본 봉이 빠졌거나 확정되지 않은 버킷은 캐시하지 않고 보류 목록(_pending.json)에 두어
+      매 호출마다 그 버킷의 기본 봉만 다시 집계 (결측 보충 후 마감되면 캐시에 기록)
+    """
+
+    def __init__(self, store: OHLCVStore = None, base_interval: str = BASE_INTERVAL):
+        self.store = store if store is not None else OHLCVStore(DATA_DIR)
+        self.base_interval = base_interval
+        self.cache = OHLCVStore(os.path.join(self.store.root, CACHE_DIRNAME))
+
+    def cache_key(self, interval: str) -> str:
+        return f"{interval}_from_{self.base_interval}"
+
+    def _pending_path(self, symbol: str, interval: str) -> str:
+        return os.path.join(self.cache.series_dir(symbol, self.cache_key(interval)), PENDING_FILENAME)
+
+    def _load_pending(self, symbol: str, interval: str) -> set:
+        path = self._pending_path(symbol, interval)
+        if not os.path.exists(path):
+            return set()
+        with open(path) as f:
+            return set(json.load(f))
+
+    def _save_pending(self, symbol: str, interval: str, pending: set):
+        path = self._pending_path(symbol, interval)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", 'w') as f:
+            json.dump(sorted(int(p) for p in pending), f)
+        os.replace(path + ".tmp", path) # 원자적 교체
+
+    def _base_state(self, symbol: str):
+        """(확정 시각, 거래소 공백 구간): 저장소 마지막 봉 이전 봉과 마지막 동기화 전에 마감된 봉은 확정"""
+        last = self.store.last_open_time(symbol, self.base_interval)
+        coverage = self.store.coverage(symbol, self.base_interval)
+        synced = coverage.synced_ms if coverage is not None and coverage.synced_ms is not None else last
+        empty = coverage.confirmed_empty if coverage is not None else []
+        return max(last, synced), empty
+
+    def _aggregate(self, symbol: str, interval: str, lo_ms, hi_ms, state, pending: set) -> pd.DataFrame:
+        """[lo_ms, hi_ms) 기본 봉을 집계하고 마감 봉은 캐시에 기록. 마감되지 않은 봉은 보류 목록에 넣고 반환"""
+        base = self.store.load_range(symbol, self.base_interval, lo_ms, hi_ms)
+        bars, complete = resample_ohlcv(base, interval, self.base_interval, final_ms=state[0], empty_runs=state[1])
+        if complete.any():
+            self.cache.append(symbol, self.cache_key(interval), bars[complete])
+        opens = bars['Open time'].to_numpy(dtype=np.int64)
+        pending.difference_update(opens[complete].tolist())
+        pending.update(opens[~complete].tolist())
+        return bars[~complete]
+
+    def update(self, symbol: str, interval: str) -> pd.DataFrame:
+        """캐시를 기본 봉 끝까지 확장하고, 아직 마감되지 않은 봉(진행 중인 봉 + 보류 버킷)을 반환"""
+        if not can_resample(interval, self.base_interval):
+            raise ValueError(f"{self.base_interval} 봉으로 {interval} 봉을 만들 수 없습니다.")
+        step = interval_to_milliseconds(interval)
+        key = self.cache_key(interval)
+        base_first = self.store.first_open_time(symbol, self.base_interval)
+        if base_first is None:
+            return pd.DataFrame(columns=KLINE_COLUMNS)
+        state = self._base_state(symbol)
+        pending = self._load_pending(symbol, interval)
+        before = set(pending)
+        cache_first = self.cache.first_open_time(symbol, key)
+        cache_last = self.cache.last_open_time(symbol, key)
+
+        parts = []
+        if cache_last is None:
+            parts.append(self._aggregate(symbol, interval, None, None, state, pending))
+        else:
+            # 기본 봉이 과거 쪽으로 보충되었으면 캐시 앞쪽도 채움
+            front = base_first // step * step if base_first < cache_first else cache_first
+            if front < cache_first:
+                parts.append(self._aggregate(symbol, interval, front, cache_first, state, pending))
+            # 캐시 안쪽(과 앞쪽)의 보류 버킷만 다시 집계 (보류 수에 비례)
+            for open_ms in sorted(p for p in before if p <= cache_last and not front <= p < cache_first):
+                parts.append(self._aggregate(symbol, interval, open_ms, open_ms + step, state, pending))
+            pending.difference_update([p for p in before if p > cache_last]) # 아래 꼬리 집계에서 다시 판정
+            parts.append(self._aggregate(symbol, interval, cache_last + step, None, state, pending))
+        if pending != before:
+            self._save_pending(symbol, interval, pending)
+        parts = [p for p in parts if not p.empty]
+        if not parts:
+            return pd.DataFrame(columns=KLINE_COLUMNS)
+        return pd.concat(parts, ignore_index=True).sort_values('Open time', kind='stable').reset_index(drop=True)
+
+    def invalidate(self, symbol: str, start_ms: int, end_ms: int, intervals=RESAMPLED_INTERVALS) -> int:
+        """
+        기본 봉 [start_ms, end_ms]가 바뀐 경우 (결측 보충 등) 그 구간을 덮는 캐시 상위 봉을 보류 목록에 넣음
+        다음 update()에서 다시 집계되어 마감이면 캐시를 덮어쓰고, 그 전까지는 다시 집계한 값이 캐시 값보다 우선
+        반환값: 보류로 돌린 상위 봉 수
+        """
+        count = 0
+        for interval in intervals:
+            key = self.cache_key(interval)
+            if not can_resample(interval, self.base_interval) or not self.cache.exists(symbol, key):
+                continue
+            step = interval_to_milliseconds(interval)
+            cached = self.cache.load_range(symbol, key, start_ms // step * step, int(end_ms) + 1, columns=['Open time'])
+            opens = to_epoch_ms_array(cached['Open time']) if not cached.empty else np.empty(0, dtype=np.int64)
+            if len(opens):
+                pending = self._load_pending(symbol, interval)
+                pending.update(opens.tolist())
+                self._save_pending(symbol, interval, pending)
+                count += len(opens)
+        return count
+
+    def load(self, symbol: str, interval: str, start=None, end=None, include_partial: bool = True) -> pd.DataFrame:
+        """
+        [start, end) 구간의 상위 타임프레임 봉 (Open time은 datetime64[ms], 저장소 load_range와 같은 형식)
+        include_partial=True면 마감되지 않은 봉(진행 중인 마지막 봉, 기본 봉이 빠진 버킷)도 붙입니다
+        (바이낸스 REST 응답처럼 시간순, 같은 시각은 다시 집계한 값이 우선).
+        """
+        partial = self.update(symbol, interval)
+        df = self.cache.load_range(symbol, self.cache_key(interval), start, end)
+        if not partial.empty:
+            start_ms, end_ms = to_epoch_ms(start), to_epoch_ms(end)
+            open_ms = partial['Open time'].to_numpy(dtype=np.int64)
+            mask = np.ones(len(partial), dtype=bool)
+            if start_ms is not None:
+                mask &= open_ms >= start_ms
+            if end_ms is not None:
+                mask &= open_ms < end_ms
+            if not df.empty:
+                # 보류 버킷의 예전 캐시 값은 제외 (include_partial=False면 그 봉은 빠짐)
+                df = df[~np.isin(to_epoch_ms_array(df['Open time']), open_ms)].reset_index(drop=True)
+            if include_partial and mask.any():
+                tail = partial[mask].reset_index(drop=True)
+                tail['Open time'] = tail['Open time'].to_numpy(dtype=np.int64).astype('datetime64[ms]')
+                df = tail if df.empty else pd.concat([df, tail], ignore_index=True)
+                df = df.sort_values('Open time', kind='stable').reset_index(drop=True)
+        return df
+
+
+def verify_against_rest(symbol: str = 'XRPUSDT', interval: str = '1h', start_str: str = '7 days ago UTC'):
+    """리샘플링 결과를 바이낸스에서 직접 받은 상위 봉과 비교 (마감 봉 기준 최대 오차 출력)"""
+    from data_sync import sync_historical_data, _format_klines, _parse_start_ms
+    from binance_pool import get_client
+    sync_historical_data(symbol, BASE_INTERVAL, start_str)
+    start_ms = _parse_start_ms(start_str)
+    ours = Resampler().load(symbol, interval, start_ms, include_partial=False)
+    theirs = _format_klines(get_client().get_historical_klines(symbol, interval, start_ms))
+    merged = ours.merge(theirs, on='Open time', suffixes=('', '_rest'))
+    for col in ['Open', 'High', 'Low', 'Close', 'Volume', 'Number of trades', 'Taker buy base asset volume']:
+        diff = (merged[col] - pd.to_numeric(merged[f"{col}_rest"])).abs().max()
+        print(f"  - {col}: 최대 오차 {diff:.8f}")
+    print(f"✅ [{symbol} {interval}] 비교 봉 수: {len(merged)}")
+
+
+if __name__ == "__main__":
+    verify_against_rest()
@@ -0,0 +1,163 @@
+import json
+import time
+import asyncio
+import collections
+import pandas as pd
+import websockets
+from concurrent.futures import ThreadPoolExecutor
+from ohlcv_store import OHLCVStore, DATA_DIR
+
+# USD-M 선물 스트림 (data_sync가 'USD' 심볼을 선물 K-라인으로 수집하는 것과 일치)
+FUTURES_WS_URL = "wss://fstream.binance.com"
+RING_SIZE = 1500 # 심볼/인터벌별 메모리에 유지할 마감 봉 수
+RECONNECT_DELAY_MAX = 30
+
+
+def kline_event_to_bar(k: dict) -> dict:
+    """웹소켓 kline 이벤트의 'k' 객체를 REST K-라인과 같은 컬럼의 dict로 변환"""
+    return {
+        'Open time': pd.Timestamp(int(k['t']), unit='ms'),
+        'Open': float(k['o']),
+        'High': float(k['h']),
+        'Low': float(k['l']),
+        'Close': float(k['c']),
+        'Volume': float(k['v']),
+        'Close time': int(k['T']),
+        'Quote asset volume': float(k['q']),
+        'Number of trades': int(k['n']),
+        'Taker buy base asset volume': float(k['V']),
+        'Taker buy quote asset volume': float(k['Q']),
+    }
+
+
+class KlineStreamer:
+    """
+    K-라인/마크 가격 웹소켓 스트리밍 수집기 (REST 폴링 대체)
+    - 마감된 봉은 심볼/인터벌별 링 버퍼(deque)에 보관하고 OHLCVStore에 저장
+    - trigger_interval 봉이 마감되면 on_bar_close(symbol, bar)를 호출 (단일 워커에서 순차 실행)
+    - callbacks={인터벌: 콜백}으로 인터벌마다 다른 콜백을 줄 수 있음 (같은 워커에서 마감 순서대로 실행)
+    """
+
+    def __init__(self, symbols, intervals=('1m',), trigger_interval='1m', on_bar_close=None,
+                 store: OHLCVStore = None, ws_url: str = FUTURES_WS_URL, mark_price: bool = True,
+                 ring_size: int = RING_SIZE, callbacks: dict = None):
+        self.symbols = [s.upper() for s in symbols]
+        self.intervals = list(intervals)
+        self.trigger_interval = trigger_interval
+        self.on_bar_close = on_bar_close
+        self.callbacks = dict(callbacks or {})
+        if on_bar_close is not None:
+            self.callbacks.setdefault(trigger_interval, on_bar_close)
+        self.store = store if store is not None else OHLCVStore(DATA_DIR)
+        self.ws_url = ws_url.rstrip('/')
+        self.mark_price = mark_price
+        self.rings = {(s, i): collections.deque(maxlen=ring_size) for s in self.symbols for i in self.intervals}
+        self.last_price = {}
+        self.last_mark_price = {}
+        self.closed_bars = 0
+        self._executor = ThreadPoolExecutor(max_workers=1) # 예측 사이클은 한 번에 하나씩
+        self._stop = False
+
+    def stream_url(self) -> str:
+        streams = [f"{s.lower()}@kline_{i}" for s in self.symbols for i in self.intervals]
+        if self.mark_price:
+            streams += [f"{s.lower()}@markPrice@1s" for s in self.symbols]
+        return f"{self.ws_url}/stream?streams={'/'.join(streams)}"
+
+    def recent_bars(self, symbol: str, interval: str) -> pd.DataFrame:
+        """링 버퍼의 최근 마감 봉을 DataFrame으로 반환"""
+        return pd.DataFrame(list(self.rings[(symbol.upper(), interval)]))
+
+    def stop(self):
+        self._stop = True
+
+    def _handle_message(self, raw: str, loop):
+        msg = json.loads(raw)
+        data = msg.get('data', msg)
+        event = data.get('e')
+        if event == 'markPriceUpdate':
+            self.last_mark_price[data['s']] = float(data['p'])
+            return
+        if event != 'kline':
+            return
+
+        k = data['k']
+        symbol, interval = data['s'], k['i']
+        self.last_price[symbol] = float(k['c'])
+        if not k['x']: # 아직 진행 중인 봉
+            return
+
+        bar = kline_event_to_bar(k)
+        ring = self.rings.setdefault((symbol, interval), collections.deque(maxlen=RING_SIZE))
+        if ring and ring[-1]['Open time'] >= bar['Open time']:
+            return # 재연결 등으로 중복 수신된 봉
+        ring.append(bar)
+        self.closed_bars += 1
+        try:
+            self.store.append(symbol, interval, pd.DataFrame([bar]))
+            coverage = self.store.coverage(symbol, interval)
+            if coverage is not None: # 마감 이벤트로 받은 봉은 확정값
+                coverage.mark_synced(int(bar['Close time']) + 1)
+                coverage.save()
+        except Exception as e:
+            print(f"⚠️ [{symbol} {interval}] 마감 봉 저장 실패: {e}")
+
+        callback = self.callbacks.get(interval)
+        if callback is not None:
+            loop.run_in_executor(self._executor, self._run_callback, callback, symbol, bar)
+
+    def _run_callback(self, callback, symbol: str, bar: dict):
+        try:
+            callback(symbol, bar)
+        except Exception as e:
+            print(f"❌ 봉 마감 콜백 오류: {e}")
+
+    async def run(self, max_bars: int = None):
+        """스트림 수신 루프 (연결이 끊기면 지수 백오프로 재연결). max_bars개 마감 봉을 받으면 종료"""
+        loop = asyncio.get_running_loop()
+        delay = 1
+        while not self._stop:
+            try:
+                async with websockets.connect(self.stream_url(), ping_interval=20) as ws:
+                    print(f"📡 스트림 연결됨: {self.stream_url()}")
+                    delay = 1
+                    async for raw in ws:
+                        self._handle_message(raw, loop)
+                        if self._stop or (max_bars is not None and self.closed_bars >= max_bars):
+                            self._stop = True
+                            break
+            except (OSError, websockets.exceptions.WebSocketException) as e:
+                if self._stop:
+                    break
+                print(f"⚠️ 스트림 연결 끊김: {e} ({delay}초 후 재연결)")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, RECONNECT_DELAY_MAX)
+        self._executor.shutdown(wait=True)
+
+    def run_forever(self, max_bars: int = None):
+        asyncio.run(self.run(max_bars=max_bars))
+
+
+def replay_latency_test(n_bars: int = 20, bar_interval_sec: float = 0.05):
+    """로컬 리플레이 서버를 상대로 봉 마감 → 콜백 호출까지의 지연 시간 측정"""
+    import tempfile
+    from fake_binance_server import start_replay_server
+    server = start_replay_server(['XRPUSDT'], interval='1m', n_bars=n_bars, bar_interval_sec=bar_interval_sec)
+    latencies = []
+
+    def on_close(symbol, bar):
+        latencies.append(time.time() - server.closed_at[(symbol, bar['Close time'])])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        streamer = KlineStreamer(['XRPUSDT'], intervals=['1m'], on_bar_close=on_close,
+                                 store=OHLCVStore(tmp), ws_url=server.base_url)
+        streamer.run_forever(max_bars=n_bars)
+        stored = len(streamer.store.load('XRPUSDT', '1m'))
+    server.shutdown()
+    if latencies:
+        print(f"🧪 마감 봉 {len(latencies)}개 | 저장 {stored}건 | 평균 지연 {sum(latencies) / len(latencies) * 1000:.1f}ms | 최대 {max(latencies) * 1000:.1f}ms")
+    return latencies
+
+
+if __name__ == "__main__":
+    replay_latency_test()
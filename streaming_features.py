@@ -0,0 +1,723 @@
+import os
+import math
+import time
+import pickle
+import collections
+import numpy as np
+import pandas as pd
+from binance.helpers import interval_to_milliseconds
+from ohlcv_store import DATA_DIR, to_epoch_ms
+
+# ── build_features의 봉 단위 증분 계산기 ──────────────────────────
+# 지표별 재귀 상태(EMA/Wilder 누적값, 롤링 윈도우 deque, PSAR 상태)를 들고 있다가
+# 새 봉이 들어오면 그 봉의 피처 행만 계산합니다 (과거 구간 재계산 없음).
+# 각 지표는 ta 라이브러리 구현(초기값, min_periods, 0 나눗셈 처리 포함)을 그대로 따릅니다.
+NAN = float('nan')
+
+# 라이브 상태 스냅샷 (마감 봉마다 저장 → 재시작 시 로드 후 빠진 봉만 따라잡기)
+FEATURE_STATE_DIR = os.path.join(DATA_DIR, "_features")
+SNAPSHOT_MAGIC = b'BSPFEAT1'
+SNAPSHOT_VERSION = 2 # v2: 최근 출력 행(rows) 포함
+RECENT_ROWS = 2 # 엔진이 보관하는 최근 피처 행 수 (마지막 행 + 정상성 변환 pct_change용 직전 행)
+
+
+def _div(a: float, b: float) -> float:
+    """pandas/numpy와 같은 0 나눗셈 결과 (x/0 = ±inf, 0/0 = NaN)"""
+    if b == 0:
+        if a == 0 or math.isnan(a):
+            return NAN
+        return math.copysign(math.inf, a) * math.copysign(1.0, b)
+    return a / b
+
+
+class _EWM:
+    """pandas ewm(adjust=False, min_periods).mean() 재귀 (앞쪽 NaN은 건너뛰고 첫 유효값에서 시작)"""
+
+    def __init__(self, alpha: float, min_periods: int):
+        self.alpha = alpha
+        self.min_periods = min_periods
+        self.value = NAN
+        self.count = 0
+
+    @classmethod
+    def span(cls, span: int):
+        return cls(2.0 / (span + 1.0), span)
+
+    def update(self, x: float) -> float:
+        if not math.isnan(x):
+            self.value = x if self.count == 0 else (1.0 - self.alpha) * self.value + self.alpha * x
+            self.count += 1
+        return self.value if self.count >= self.min_periods else NAN
+
+
+class _Window:
+    """고정 길이 롤링 윈도우 (min_periods=None이면 윈도우가 찰 때까지 NaN, NaN이 섞이면 NaN)"""
+
+    def __init__(self, size: int, min_periods: int = None):
+        self.size = size
+        self.min_periods = size if min_periods is None else min_periods
+        self.buf = collections.deque(maxlen=size)
+
+    def push(self, x: float):
+        self.buf.append(x)
+
+    def ready(self) -> bool:
+        return len(self.buf) >= max(self.min_periods, 1)
+
+    def values(self) -> np.ndarray:
+        return np.fromiter(self.buf, dtype=np.float64, count=len(self.buf))
+
+    def sum(self) -> float:
+        return float(self.values().sum()) if self.ready() else NAN
+
+    def mean(self) -> float:
+        return float(self.values().mean()) if self.ready() else NAN
+
+    def std(self, ddof: int = 1) -> float:
+        if not self.ready() or len(self.buf) <= ddof:
+            return NAN
+        return float(self.values().std(ddof=ddof))
+
+    def max(self) -> float:
+        return float(self.values().max()) if self.ready() else NAN
+
+    def min(self) -> float:
+        return float(self.values().min()) if self.ready() else NAN
+
+    def last(self, k: int) -> float:
+        """k개 전 값 (k=0이 가장 최근). 없으면 NaN"""
+        return self.buf[-1 - k] if len(self.buf) > k else NAN
+
+
+def _skew(x: np.ndarray) -> float:
+    """pandas rolling.skew와 같은 표본 왜도 (편향 보정)"""
+    n = len(x)
+    if n < 3 or np.isnan(x).any():
+        return NAN
+    if (x == x[0]).all(): # pandas는 상수 윈도우를 0으로 반환
+        return 0.0
+    d = x - x.mean()
+    m2 = (d * d).mean()
+    if m2 <= 1e-14:
+        return NAN
+    m3 = (d * d * d).mean()
+    return math.sqrt(n * (n - 1.0)) * m3 / ((n - 2.0) * m2 ** 1.5)
+
+
+def _kurt(x: np.ndarray) -> float:
+    """pandas rolling.kurt와 같은 표본 초과 첨도 (Fisher, 편향 보정)"""
+    n = len(x)
+    if n < 4 or np.isnan(x).any():
+        return NAN
+    if (x == x[0]).all(): # pandas는 상수 윈도우를 -3으로 반환
+        return -3.0
+    d = x - x.mean()
+    m2 = (d * d).mean()
+    if m2 <= 1e-14:
+        return NAN
+    m4 = (d * d * d * d).mean()
+    k = (n * n - 1.0) * m4 / (m2 * m2) - 3.0 * (n - 1.0) ** 2
+    return k / ((n - 2.0) * (n - 3.0))
+
+
+class StreamingFeatureEngine:
+    """
+    build_features와 같은 피처를 봉 하나씩 증분 계산합니다.
+    - update(bar): 새 마감 봉(dict, 컬럼명 대소문자 무관)을 반영하고 그 봉의 피처 행(dict)을 반환
+    - warmup(df): 과거 봉을 순서대로 흘려 상태를 만든 뒤 마지막 행 반환
+    같은 시작 봉부터 흘려 넣으면 build_features 결과의 해당 행과 (부동소수 오차 내에서) 일치합니다.
+    """
+
+    RSI_WINDOWS = (14, 7, 21)
+    EMA_WINDOWS = (7, 25, 99)
+    RETURN_WINDOWS = (1, 3, 7, 14, 21)
+    ROLL_WINDOWS = (7, 14, 30)
+    ADX_WINDOW = 14
+
+    def __init__(self):
+        self.n = 0 # 지금까지 반영한 봉 수
+        self.last_open_ms = None # 마지막으로 반영한 봉의 Open time (ms)
+        self.prev = None # 직전 봉 (open/high/low/close/volume/tp)
+        self.rows = collections.deque(maxlen=RECENT_ROWS) # 최근 피처 행 (스냅샷에 포함)
+        self.anchor = None # rebase에 쓴 누적 지표 기준값 (스냅샷이 같은 기준인지 확인용)
+        self.closes = _Window(max(self.RETURN_WINDOWS) + 1, min_periods=1)
+
+        # 모멘텀
+        self.rsi_up = {w: _EWM(1.0 / w, w) for w in self.RSI_WINDOWS}
+        self.rsi_dn = {w: _EWM(1.0 / w, w) for w in self.RSI_WINDOWS}
+        self.low14, self.high14 = _Window(14), _Window(14)
+        self.stoch_k = _Window(3)
+        self.trix_ema = [_EWM.span(15) for _ in range(3)]
+        self.prev_trix_ema3 = NAN
+
+        # 트렌드
+        self.macd_fast, self.macd_slow, self.macd_sign = _EWM.span(12), _EWM.span(26), _EWM.span(9)
+        self.ema = {w: _EWM.span(w) for w in self.EMA_WINDOWS}
+        self.adx_trs = self.adx_dip = self.adx_din = 0.0
+        self.adx_dx = []
+        self.adx_value = 0.0
+        self.cci_tp = _Window(20)
+        self.ichi_high = {w: _Window(w, None if w < 52 else 0) for w in (9, 26, 52)}
+        self.ichi_low = {w: _Window(w, None if w < 52 else 0) for w in (9, 26, 52)}
+        self.psar_state = None
+
+        # 변동성
+        self.bb_close = _Window(20)
+        self.atr_tr = []
+        self.atr_value = 0.0
+        self.kc_tp = _Window(20)
+        self.kc_high = _Window(20, min_periods=0)
+        self.kc_low = _Window(20, min_periods=0)
+        self.dc_high, self.dc_low = _Window(20), _Window(20)
+        self.ulcer_close = _Window(14, min_periods=1)
+        self.ulcer_ri = _Window(14)
+
+        # 거래량
+        self.obv = 0.0
+        self.mfi_flow = _Window(14)
+        self.cmf_mfv, self.cmf_vol = _Window(20), _Window(20)
+        self.force_ema = _EWM.span(13)
+        self.nvi = 1000.0
+        self.volume_20 = _Window(20)
+
+        # 수익률 / 롤링 통계
+        self.ret1_windows = {w: _Window(w) for w in sorted(set((3, 7, 14, 21) + self.ROLL_WINDOWS))}
+
+    # ── 지표별 갱신 ────────────────────────────────────────
+    def _adx(self, h, l, c, prev):
+        """ta.trend.ADXIndicator (첫 합계 → Wilder 누적, DX 평균 → Wilder 평활)"""
+        w = self.ADX_WINDOW
+        n = self.n
+        if n == 0:
+            return 0.0, 0.0, 0.0
+        dm = max(h, prev['close']) - min(l, prev['close'])
+        diff_up, diff_down = h - prev['high'], prev['low'] - l
+        pos = diff_up if (diff_up > diff_down and diff_up > 0) else 0.0
+        neg = diff_down if (diff_down > diff_up and diff_down > 0) else 0.0
+        if n <= w:
+            self.adx_trs += dm
+            self.adx_dip += pos
+            self.adx_din += neg
+        else:
+            self.adx_trs = self.adx_trs - (self.adx_trs / float(w)) + dm
+            self.adx_dip = self.adx_dip - (self.adx_dip / float(w)) + pos
+            self.adx_din = self.adx_din - (self.adx_din / float(w)) + neg
+        if n < w:
+            return 0.0, 0.0, 0.0
+
+        dip = 100 * (self.adx_dip / self.adx_trs) if self.adx_trs != 0 else 0.0
+        din = 100 * (self.adx_din / self.adx_trs) if self.adx_trs != 0 else 0.0
+        dx = 100 * abs((dip - din) / (dip + din)) if dip + din != 0 else 0.0
+        if n < 2 * w - 1:
+            self.adx_dx.append(dx)
+        elif n == 2 * w - 1:
+            self.adx_dx.append(dx)
+            self.adx_value = float(np.mean(self.adx_dx))
+        else:
+            self.adx_value = ((self.adx_value * (w - 1)) + dx) / float(w)
+        if n == w: # ta는 첫 합계 행의 +DI/-DI를 0으로 둠
+            return self.adx_value, 0.0, 0.0
+        return self.adx_value, dip, din
+
+    def _psar(self, h, l, c, step=0.02, max_step=0.20):
+        """ta.trend.PSARIndicator (처음 두 봉은 종가, 이후 추세/가속 계수 재귀)"""
+        s = self.psar_state
+        if s is None:
+            self.psar_state = s = {'up': True, 'af': step, 'up_high': h, 'down_low': l,
+                                   'psar': c, 'highs': collections.deque([h], maxlen=2),
+                                   'lows': collections.deque([l], maxlen=2)}
+            return c
+        if self.n < 2:
+            s['psar'] = c
+            s['highs'].append(h)
+            s['lows'].append(l)
+            return c
+
+        reversal = False
+        high1, high2 = s['highs'][-1], s['highs'][-2]
+        low1, low2 = s['lows'][-1], s['lows'][-2]
+        if s['up']:
+            psar = s['psar'] + (s['af'] * (s['up_high'] - s['psar']))
+            if l < psar:
+                reversal = True
+                psar = s['up_high']
+                s['down_low'] = l
+                s['af'] = step
+            else:
+                if h > s['up_high']:
+                    s['up_high'] = h
+                    s['af'] = min(s['af'] + step, max_step)
+                if low2 < psar:
+                    psar = low2
+                elif low1 < psar:
+                    psar = low1
+        else:
+            psar = s['psar'] - (s['af'] * (s['psar'] - s['down_low']))
+            if h > psar:
+                reversal = True
+                psar = s['down_low']
+                s['up_high'] = h
+                s['af'] = step
+            else:
+                if l < s['down_low']:
+                    s['down_low'] = l
+                    s['af'] = min(s['af'] + step, max_step)
+                if high2 > psar:
+                    psar = high2
+                elif high1 > psar:
+                    psar = high1
+        s['up'] = s['up'] != reversal
+        s['psar'] = psar
+        s['highs'].append(h)
+        s['lows'].append(l)
+        return psar
+
+    def _atr(self, tr, w=14):
+        """ta.volatility.AverageTrueRange (w번째 봉에서 TR 평균, 이후 Wilder. 그 전은 0)"""
+        if self.n < w:
+            self.atr_tr.append(tr)
+            if self.n == w - 1:
+                self.atr_value = float(np.mean(self.atr_tr))
+                return self.atr_value
+            return 0.0
+        self.atr_value = (self.atr_value * (w - 1) + tr) / float(w)
+        return self.atr_value
+
+    # ── 봉 반영 ───────────────────────────────────────────
+    def update(self, bar) -> dict:
+        """마감 봉 1개를 반영하고 build_features와 같은 컬럼 순서의 행(dict)을 반환"""
+        row = {str(k).lower(): v for k, v in dict(bar).items()}
+        o, h, l, c, v = (float(row[k]) for k in ('open', 'high', 'low', 'close', 'volume'))
+        prev = self.prev
+        pc = prev['close'] if prev is not None else NAN
+        f = {}
+
+        # 1. 모멘텀
+        diff = c - pc if prev is not None else NAN
+        up = diff if diff > 0 else 0.0
+        dn = -diff if diff < 0 else 0.0
+        for w in self.RSI_WINDOWS:
+            emaup, emadn = self.rsi_up[w].update(up), self.rsi_dn[w].update(dn)
+            if emadn == 0:
+                f[f'rsi_{w}'] = 100.0
+            else:
+                f[f'rsi_{w}'] = 100 - (100 / (1 + _div(emaup, emadn)))
+
+        self.low14.push(l)
+        self.high14.push(h)
+        smin, smax = self.low14.min(), self.high14.max()
+        k = _div(100 * (c - smin), smax - smin)
+        self.stoch_k.push(k)
+        f['stoch_k'] = k
+        f['stoch_d'] = self.stoch_k.mean()
+        f['williams_r'] = _div(-100 * (smax - c), smax - smin)
+
+        self.closes.push(c)
+        for w in (10, 20):
+            past = self.closes.last(w)
+            f[f'roc_{w}'] = _div(c - past, past) * 100
+
+        e1 = self.trix_ema[0].update(c)
+        e2 = self.trix_ema[1].update(e1)
+        e3 = self.trix_ema[2].update(e2)
+        f['trix'] = _div(e3 - self.prev_trix_ema3, self.prev_trix_ema3) * 100
+        self.prev_trix_ema3 = e3
+
+        # 2. 트렌드
+        macd = self.macd_fast.update(c) - self.macd_slow.update(c)
+        sign = self.macd_sign.update(macd)
+        f['macd'], f['macd_signal'], f['macd_diff'] = macd, sign, macd - sign
+
+        for w in self.EMA_WINDOWS:
+            f[f'ema_{w}'] = self.ema[w].update(c)
+        f['ema_cross_7_25'] = f['ema_7'] - f['ema_25']
+        f['ema_cross_25_99'] = f['ema_25'] - f['ema_99']
+
+        f['adx'], f['adx_pos'], f['adx_neg'] = self._adx(h, l, c, prev)
+
+        tp = (h + l + c) / 3.0
+        self.cci_tp.push(tp)
+        if self.cci_tp.ready():
+            x = self.cci_tp.values()
+            f['cci'] = _div(tp - x.mean(), 0.015 * np.abs(x - x.mean()).mean())
+        else:
+            f['cci'] = NAN
+
+        for w in (9, 26, 52):
+            self.ichi_high[w].push(h)
+            self.ichi_low[w].push(l)
+        conv = 0.5 * (self.ichi_high[9].max() + self.ichi_low[9].min())
+        base = 0.5 * (self.ichi_high[26].max() + self.ichi_low[26].min())
+        f['ichi_a'] = 0.5 * (conv + base)
+        f['ichi_b'] = 0.5 * (self.ichi_high[52].max() + self.ichi_low[52].min())
+        f['ichi_base'] = base
+        f['ichi_conv'] = conv
+
+        f['psar'] = self._psar(h, l, c)
+
+        # 3. 변동성
+        self.bb_close.push(c)
+        mavg, mstd = self.bb_close.mean(), self.bb_close.std(ddof=0)
+        hband, lband = mavg + 2 * mstd, mavg - 2 * mstd
+        f['bb_upper'], f['bb_lower'] = hband, lband
+        f['bb_width'] = _div(hband - lband, mavg) * 100
+        f['bb_pct'] = (c - lband) / (hband - lband) if hband != lband else NAN
+
+        tr = max(h - l, abs(h - pc), abs(l - pc)) if prev is not None else h - l
+        f['atr_14'] = self._atr(tr)
+
+        self.kc_tp.push(tp)
+        self.kc_high.push(((4 * h) - (2 * l) + c) / 3.0)
+        self.kc_low.push(((-2 * h) + (4 * l) + c) / 3.0)
+        f['kc_upper'] = self.kc_high.mean()
+        f['kc_lower'] = self.kc_low.mean()
+
+        self.dc_high.push(h)
+        self.dc_low.push(l)
+        f['dc_upper'], f['dc_lower'] = self.dc_high.max(), self.dc_low.min()
+
+        self.ulcer_close.push(c)
+        ui_max = self.ulcer_close.max()
+        self.ulcer_ri.push(100 * _div(c - ui_max, ui_max))
+        f['ulcer'] = math.sqrt((self.ulcer_ri.values() ** 2 / 14).sum()) if self.ulcer_ri.ready() else NAN
+
+        # 4. 거래량
+        self.obv += -v if c < pc else v
+        f['obv'] = self.obv
+
+        prev_tp = prev['tp'] if prev is not None else NAN
+        up_down = 1 if tp > prev_tp else (-1 if tp < prev_tp else 0)
+        self.mfi_flow.push(tp * v * up_down)
+        if self.mfi_flow.ready():
+            x = self.mfi_flow.values()
+            pos_mf = float(np.sum(np.where(x >= 0.0, x, 0.0)))
+            neg_mf = abs(float(np.sum(np.where(x < 0.0, x, 0.0))))
+            f['mfi'] = 100 - (100 / (1 + _div(pos_mf, neg_mf)))
+        else:
+            f['mfi'] = NAN
+
+        mfv = _div((c - l) - (h - c), h - l)
+        mfv = 0.0 if math.isnan(mfv) else mfv
+        self.cmf_mfv.push(mfv * v)
+        self.cmf_vol.push(v)
+        f['cmf'] = _div(self.cmf_mfv.sum(), self.cmf_vol.sum())
+
+        if prev is not None:
+            f['em'] = _div((h - prev['high'] + l - prev['low']) * (h - l), 2 * v) * 100000000
+        else:
+            f['em'] = NAN
+        f['force_index'] = self.force_ema.update((c - pc) * v)
+
+        if prev is not None and prev['volume'] > v:
+            self.nvi = self.nvi * (1.0 + (c / pc - 1))
+        f['nvi'] = self.nvi
+
+        self.volume_20.push(v)
+        f['volume_sma_20'] = self.volume_20.mean()
+        f['volume_ratio'] = _div(v, f['volume_sma_20'])
+
+        # 5. 펀딩비 / 수익률 파생
+        f['funding_rate'] = float(row['fundingrate']) if 'fundingrate' in row else 0.0
+
+        ret1 = c / pc - 1 if prev is not None else NAN
+        for w in self.ret1_windows:
+            self.ret1_windows[w].push(ret1)
+        for w in self.RETURN_WINDOWS:
+            past = self.closes.last(w)
+            f[f'return_{w}'] = c / past - 1
+            if w > 1:
+                f[f'vol_{w}'] = self.ret1_windows[w].std()
+
+        f['high_low_ratio'] = (h - l) / c
+        f['close_open_ratio'] = (c - o) / o
+        f['upper_shadow'] = (h - max(o, c)) / c
+        f['lower_shadow'] = (min(o, c) - l) / c
+
+        for w in self.ROLL_WINDOWS:
+            win = self.ret1_windows[w]
+            x = win.values() if win.ready() else None
+            f[f'roll_mean_{w}'] = win.mean()
+            f[f'roll_std_{w}'] = win.std()
+            f[f'roll_max_{w}'] = win.max()
+            f[f'roll_min_{w}'] = win.min()
+            f[f'roll_skew_{w}'] = _skew(x) if x is not None else NAN
+            f[f'roll_kurt_{w}'] = _kurt(x) if x is not None else NAN
+
+        # 시간 피처
+        if 'open time' in row:
+            ts = pd.Timestamp(row['open time'])
+            f['hour'] = ts.hour
+            f['dayofweek'] = ts.dayofweek
+            f['is_weekend'] = int(ts.dayofweek >= 5)
+            f['sin_hour'] = np.sin(2 * np.pi * ts.hour / 24)
+            f['cos_hour'] = np.cos(2 * np.pi * ts.hour / 24)
+
+        self.prev = {'open': o, 'high': h, 'low': l, 'close': c, 'volume': v, 'tp': tp}
+        self.n += 1
+        if 'open time' in row:
+            self.last_open_ms = to_epoch_ms(row['open time'])
+        row.update(f)
+        self.rows.append(row)
+        return row
+
+    def warmup(self, df: pd.DataFrame) -> dict:
+        """과거 봉을 순서대로 반영하고 마지막 행을 반환"""
+        last = None
+        for bar in df.to_dict('records'):
+            last = self.update(bar)
+        return last
+
+    def rebase(self, levels: dict):
+        """
+        누적 지표를 levels 수준으로 맞춤 (OBV는 평행 이동, NVI는 배율 보정, 보관 중인 최근 행 포함)
+        시작 봉이 다른 이력에서 계산한 값을 학습 데이터와 같은 기준으로 이어 가기 위해 사용
+        """
+        if 'obv' in levels:
+            delta = levels['obv'] - self.obv
+            self.obv += delta
+            for row in self.rows:
+                row['obv'] += delta
+        if 'nvi' in levels and self.nvi != 0:
+            ratio = levels['nvi'] / self.nvi
+            self.nvi *= ratio
+            for row in self.rows:
+                row['nvi'] *= ratio
+
+    @staticmethod
+    def is_complete(row: dict) -> bool:
+        """build_features의 dropna를 통과하는 행인지 (워밍업이 끝났는지)"""
+        return row is not None and not any(isinstance(x, float) and math.isnan(x) for x in row.values())
+
+    def to_bytes(self) -> bytes:
+        """상태 전체(누적값, 롤링 버퍼, 마지막 봉 시각)를 바이너리 스냅샷으로 직렬화"""
+        return SNAPSHOT_MAGIC + pickle.dumps({'version': SNAPSHOT_VERSION, 'state': self.__dict__},
+                                             protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def from_bytes(cls, data: bytes):
+        """스냅샷에서 엔진 복원. 형식/버전이 다르면 ValueError"""
+        if not data.startswith(SNAPSHOT_MAGIC):
+            raise ValueError("피처 상태 스냅샷 형식이 아닙니다.")
+        payload = pickle.loads(data[len(SNAPSHOT_MAGIC):])
+        if payload.get('version') != SNAPSHOT_VERSION:
+            raise ValueError(f"스냅샷 버전 불일치: {payload.get('version')}")
+        engine = cls.__new__(cls)
+        engine.__dict__.update(payload['state'])
+        return engine
+
+
+class LiveFeatureEngine:
+    """
+    실시간 봇용 피처 엔진 래퍼 (심볼/인터벌별 스냅샷 파일 {state_dir}/{symbol}_{interval}.state)
+    - start(): 스냅샷을 읽고 그 이후 마감된 봉만 받아 따라잡음. 스냅샷이 없거나 봉이 끊겼으면 warmup_start부터 재계산
+    - refresh(): 메모리 상태 이후 마감된 봉만 받아 반영 (폴링 모드의 매 사이클)
+    - on_bar(bar): 마감 봉 반영 후 스냅샷 저장 (스트리밍 모드, 봉이 끊겼으면 refresh로 따라잡음)
+    - frame(): 최근 피처 행 DataFrame (build_features 결과의 마지막 RECENT_ROWS행과 같은 값)
+    anchor: 누적 지표 기준값 {'open_ms': 기준 봉, 'obv': 값, 'nvi': 값} (모델 패키지의 cumulative_anchor).
+    주면 콜드 스타트 때 기준 봉에서 OBV/NVI를 학습 데이터 수준으로 맞추고, 기준이 다른 스냅샷은 쓰지 않음
+    """
+
+    def __init__(self, symbol: str, interval: str = '1h', state_dir: str = FEATURE_STATE_DIR,
+                 warmup_start: str = '60 days ago UTC', fetch=None, anchor: dict = None):
+        self.symbol = symbol
+        self.interval = interval
+        self.step = interval_to_milliseconds(interval)
+        self.path = os.path.join(state_dir, f"{symbol}_{interval}.state")
+        self.warmup_start = warmup_start
+        self.fetch = fetch
+        self.anchor = anchor
+        self.engine = None
+        self.last_row = None
+        os.makedirs(state_dir, exist_ok=True)
+
+    def _fetch(self, start):
+        if self.fetch is None:
+            from data_fetcher import fetch_historical_data
+            self.fetch = fetch_historical_data
+        return self.fetch(self.symbol, interval=self.interval, start_str=start)
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(self.engine.to_bytes())
+        os.replace(tmp_path, self.path) # 원자적 교체
+
+    def load(self) -> bool:
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, 'rb') as f:
+                self.engine = StreamingFeatureEngine.from_bytes(f.read())
+            if self.engine.anchor != self.anchor:
+                print(f"ℹ️ [{self.symbol} {self.interval}] 스냅샷의 누적 지표 기준이 모델과 달라 처음부터 다시 계산합니다.")
+                self.engine = None
+                return False
+            self.last_row = self.engine.rows[-1] if self.engine.rows else None
+            return self.engine.last_open_ms is not None
+        except Exception as e:
+            print(f"⚠️ [{self.symbol} {self.interval}] 피처 상태 스냅샷 로드 실패: {e}")
+            self.engine = None
+            return False
+
+    def _closed_bars(self, df: pd.DataFrame) -> pd.DataFrame:
+        """아직 반영하지 않았고 이미 마감된 봉만 남김"""
+        if df is None or df.empty:
+            return pd.DataFrame()
+        now_ms = int(time.time() * 1000)
+        open_ms = df['Open time'].to_numpy(dtype='datetime64[ms]').astype(np.int64)
+        mask = open_ms + self.step <= now_ms
+        if self.engine is not None and self.engine.last_open_ms is not None:
+            mask &= open_ms > self.engine.last_open_ms
+        return df[mask]
+
+    def _catch_up(self):
+        """마지막 반영 봉 이후 마감된 봉을 받아 반영. 반영한 봉 수 (봉이 끊겨 이어 붙일 수 없으면 None)"""
+        last_ms = self.engine.last_open_ms
+        bars = self._closed_bars(self._fetch(last_ms + 1))
+        if bars.empty:
+            return 0
+        if int(bars['Open time'].iloc[0].value // 1_000_000) != last_ms + self.step:
+            return None
+        for bar in bars.to_dict('records'):
+            self.last_row = self.engine.update(bar)
+        self.save()
+        return len(bars)
+
+    def _cold_start(self, t0: float) -> dict:
+        self.engine = StreamingFeatureEngine()
+        bars = self._closed_bars(self._fetch(self.warmup_start))
+        n_bars = len(bars)
+        if self.anchor is not None and n_bars:
+            # 기준 봉까지 반영 → 누적 지표를 학습 데이터 수준으로 맞춤 → 나머지 봉 반영
+            before = bars['Open time'].to_numpy(dtype='datetime64[ms]').astype(np.int64) <= self.anchor['open_ms']
+            self.engine.warmup(bars[before])
+            if self.engine.last_open_ms == self.anchor['open_ms']:
+                self.engine.rebase({k: v for k, v in self.anchor.items() if k != 'open_ms'})
+                self.engine.anchor = self.anchor
+            else:
+                print(f"⚠️ [{self.symbol} {self.interval}] 누적 지표 기준 봉이 수집 구간에 없어 OBV/NVI 수준이 학습 때와 다를 수 있습니다.")
+            bars = bars[~before]
+        self.engine.warmup(bars)
+        self.last_row = self.engine.rows[-1] if self.engine.rows else None
+        if self.last_row is not None:
+            self.save()
+        print(f"🧊 [{self.symbol} {self.interval}] 피처 상태 콜드 스타트: {n_bars}봉 ({(time.time() - t0) * 1000:.0f}ms)")
+        return self.last_row
+
+    def start(self) -> dict:
+        """스냅샷 복원 + 빠진 봉 따라잡기 (실패 시 콜드 스타트). 마지막 피처 행 반환"""
+        t0 = time.time()
+        if self.load():
+            n = self._catch_up()
+            if n is not None:
+                print(f"♻️ [{self.symbol} {self.interval}] 피처 상태 복원: 따라잡은 봉 {n}개 ({(time.time() - t0) * 1000:.0f}ms)")
+                return self.last_row
+            print(f"⚠️ [{self.symbol} {self.interval}] 스냅샷 이후 봉이 끊겨 있어 처음부터 다시 계산합니다.")
+        return self._cold_start(t0)
+
+    def refresh(self) -> dict:
+        """메모리 상태 이후 마감된 봉만 반영 (상태가 없으면 start, 봉이 끊겼으면 콜드 스타트)"""
+        if self.engine is None or self.engine.last_open_ms is None:
+            return self.start()
+        if self._catch_up() is None:
+            print(f"⚠️ [{self.symbol} {self.interval}] 마지막 반영 봉 이후 봉이 끊겨 있어 처음부터 다시 계산합니다.")
+            return self._cold_start(time.time())
+        return self.last_row
+
+    def on_bar(self, bar) -> dict:
+        """마감 봉 1개 반영 후 스냅샷 저장 (이미 반영한 봉은 무시, 중간 봉이 빠졌으면 REST로 따라잡음)"""
+        if self.engine is None:
+            self.start()
+        open_ms = to_epoch_ms(dict(bar).get('Open time', dict(bar).get('open time')))
+        last_ms = self.engine.last_open_ms
+        if last_ms is not None and open_ms is not None:
+            if open_ms <= last_ms:
+                return self.last_row
+            if open_ms != last_ms + self.step: # 재연결 등으로 빠진 봉
+                return self.refresh()
+        self.last_row = self.engine.update(bar)
+        self.save()
+        return self.last_row
+
+    def frame(self) -> pd.DataFrame:
+        """최근 피처 행 (오래된 행 → 최신 행, 최대 RECENT_ROWS행)"""
+        if self.engine is None:
+            return pd.DataFrame()
+        return pd.DataFrame(list(self.engine.rows))
+
+
+def check_parity(df: pd.DataFrame, rtol: float = 1e-6, atol: float = 1e-9) -> pd.Series:
+    """
+    같은 데이터로 build_features와 StreamingFeatureEngine 결과를 비교합니다.
+    build_features가 남기는 모든 행(dropna 이후)에서 컬럼별 최대 상대 오차를 반환하고,
+    허용 오차를 넘는 컬럼이 있으면 AssertionError를 냅니다.
+    """
+    from feature_engineering import build_features
+    df = df.reset_index(drop=True)
+    ref = build_features(df)
+
+    engine = StreamingFeatureEngine()
+    t0 = time.time()
+    rows = [engine.update(bar) for bar in df.to_dict('records')]
+    elapsed = time.time() - t0
+    ours = pd.DataFrame(rows).loc[ref.index, ref.columns]
+
+    errors = {}
+    for col in ref.select_dtypes(include=[np.number]).columns:
+        a = ours[col].to_numpy(dtype=np.float64)
+        b = ref[col].to_numpy(dtype=np.float64)
+        with np.errstate(invalid='ignore'):
+            err = np.where(a == b, 0.0, np.abs(a - b) / (np.abs(b) + atol / rtol)) # inf끼리 같으면 0
+        errors[col] = float(np.max(np.nan_to_num(err, nan=np.inf))) if len(b) else 0.0
+    errors = pd.Series(errors).sort_values(ascending=False)
+    print(f"🧪 패리티 검사: {len(ref)}행 x {len(errors)}컬럼 | 봉당 {elapsed / len(df) * 1e6:.0f}µs | 최대 상대 오차 {errors.iloc[0]:.2e} ({errors.index[0]})")
+    bad = errors[errors > rtol]
+    assert bad.empty, f"허용 오차 초과 컬럼: {bad.to_dict()}"
+    return errors
+
+
+def snapshot_benchmark(data: pd.DataFrame, catch_up: int = 3):
+    """스냅샷 복원 + catch_up개 봉 따라잡기가 전체 재계산과 같은 행을 내는지, 걸리는 시간은 얼마인지 측정"""
+    import tempfile
+    data = data.reset_index(drop=True)
+    history, missed = data.iloc[:-catch_up], data.iloc[-catch_up:]
+    open_ms = data['Open time'].to_numpy(dtype='datetime64[ms]').astype(np.int64)
+
+    def fetch(symbol, interval, start_str):
+        # 네트워크 대신 메모리 데이터에서 start_str(ms) 이후 봉 반환
+        return data[open_ms >= start_str] if isinstance(start_str, (int, np.integer)) else data
+
+    with tempfile.TemporaryDirectory() as tmp:
+        live = LiveFeatureEngine('TEST', '1h', state_dir=tmp, fetch=fetch)
+        live.engine = StreamingFeatureEngine()
+        live.engine.warmup(history)
+        live.save()
+        size = os.path.getsize(live.path)
+
+        t0 = time.time()
+        restored = LiveFeatureEngine('TEST', '1h', state_dir=tmp, fetch=fetch)
+        restored.load()
+        load_ms = (time.time() - t0) * 1000
+        row = restored.start()
+        full = StreamingFeatureEngine().warmup(data)
+        same = all(row[k] == full[k] or (isinstance(full[k], float) and math.isnan(full[k]) and math.isnan(row[k]))
+                   for k in full)
+    print(f"🧪 스냅샷 {size / 1024:.1f}KB | 역직렬화 {load_ms:.1f}ms | 따라잡기 {catch_up}봉 | 전체 재계산과 일치: {same}")
+    return same
+
+
+if __name__ == "__main__":
+    import sys
+    try:
+        from mmap_store import load_frame
+        data = load_frame('XRPUSDT', '15m').tail(3000)
+    except Exception:
+        data = pd.DataFrame()
+    if data.empty:
+        from fake_binance_server import synthetic_klines, BASE_TIME_MS
+        from data_sync import _format_klines
+        data = _format_klines(synthetic_klines('1h', BASE_TIME_MS, BASE_TIME_MS + 3000 * 3_600_000, limit=3000))
+    if "--snapshot" in sys.argv:
+        snapshot_benchmark(data)
+    else:
+        check_parity(data)
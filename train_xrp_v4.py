@@ -8,14 +8,23 @@ import os
 import sys
 
 # 신규 모듈 import
-from feature_engineering import build_features, ensure_stationarity
-from label_engineering import label_triple_barrier
+from feature_engineering import fit_stationarity, apply_stationarity
+from feature_store import FeatureStore, CUMULATIVE_ADD, CUMULATIVE_MUL
+from lookback import required_bars
+from ohlcv_store import to_epoch_ms
+from label_engineering import triple_barrier_events, average_uniqueness
+from intrabar import IntrabarResolver
 from model_training import train_model, optimize_hyperparams, BEST_PARAMS_XRP
 
 # 기존 모듈 유지
 from data_fetcher import fetch_historical_data
+from data_sync import sync_historical_data
 
-def train_xrp_xgboost_model_v4(symbol='XRPUSDT', use_optuna=False):
+def train_xrp_xgboost_model_v4(symbol='XRPUSDT', use_optuna=False, use_uniqueness=False, use_intrabar=False):
+    """
+    use_intrabar=True: 같은 1시간봉에서 TP/SL이 모두 닿은 레이블을 1m 봉으로 판정
+    (학습 구간의 1m 봉을 동기화해 바이너리 파일에 반영한 뒤 사용, 처음 한 번은 1m 백필 시간이 걸림)
+    """
     print(f"\n--- {symbol} (USD-M) 1시간봉 기반 정밀 학습 시작 (V4.2) ---")
     
     # 1. 데이터 수집 (1시간봉 기준 3년치 - 가이드 권장)
@@ -26,12 +35,28 @@ def train_xrp_xgboost_model_v4(symbol='XRPUSDT', use_optuna=False):
     
     # 2. 피처 엔지니어링 및 레이블링
     print("피처 생성 및 정상성 검정 중...")
-    df = build_features(data)
-    df = ensure_stationarity(df)
-    
+    # 피처 저장소: 지난 학습 이후 새로 마감된 봉의 피처만 계산 (피처 코드가 바뀌면 전체 재계산)
+    df = FeatureStore().update(symbol, '1h', data)
+    raw_last = df.iloc[-1] # 정상성 변환 전 마지막 봉 (누적 지표 기준값)
+
     print("Triple Barrier 레이블링 생성 중...")
+    # 배리어 가격/실현 수익률은 원본 가격 단위여야 하므로 정상성 변환 전 봉으로 계산 (변환 후 행과는 index로 맞춤)
+    intrabar = None
+    if use_intrabar:
+        # 1m 동기화가 바이너리 파일(memmap)까지 갱신 → 충돌 봉의 1m 행만 읽어 판정
+        sync_historical_data(symbol, interval='1m', start_str=to_epoch_ms(df['open time'].iloc[0]))
+        intrabar = IntrabarResolver(symbol)
     # 가이드 권장 파라미터: max_holding=20 (20시간)
-    df['target'] = label_triple_barrier(df, atr_multiplier_tp=1.5, atr_multiplier_sl=1.0, max_holding=20)
+    events = triple_barrier_events(df, atr_multiplier_tp=1.5, atr_multiplier_sl=1.0, max_holding=20, intrabar=intrabar)
+    if intrabar is not None:
+        print(f"봉 내부 판정: {intrabar.resolved}건 / 판정 불가(익절 우선) {intrabar.unresolved}건")
+
+    # 정상성 변환 계획은 학습 데이터로 1회 정하고 모델 패키지에 저장 (추론은 같은 계획을 ADF 없이 적용)
+    stationarity_plan = fit_stationarity(df)
+    df = apply_stationarity(df, stationarity_plan)
+    events = events.loc[df.index] # 변환으로 빠진 앞쪽 행 제외
+    print(f"정상성 변환 컬럼: {len(stationarity_plan['diff_columns'])}개")
+    df['target'] = events['label']
     
     # 레이블이 -1인 데이터(계산 불가 구간) 제거
     df = df[df['target'] != -1]
@@ -45,6 +70,16 @@ def train_xrp_xgboost_model_v4(symbol='XRPUSDT', use_optuna=False):
     X = X.replace([np.inf, -np.inf], np.nan).fillna(0)
     
     print(f"총 피처 수: {len(features)}")
+
+    # 실시간 피처 엔진의 워밍업 봉 수는 학습 때 1회 계산해 패키지에 저장 (예측 때 lookback 측정 없음)
+    # 누적 지표(OBV/NVI)는 어떤 길이로도 수렴하지 않으므로 lookback에서 빼고, 마지막 학습 봉의 수준을 기준값으로 저장
+    # → 실시간 엔진이 그 봉에서 학습 데이터와 같은 수준으로 맞춘 뒤 이어서 계산
+    cumulative = [c for c in CUMULATIVE_ADD + CUMULATIVE_MUL if c in features]
+    lookback_bars = required_bars(features, diff=1, skip=cumulative, verbose=False)
+    cumulative_anchor = None
+    if cumulative:
+        cumulative_anchor = {'open_ms': to_epoch_ms(raw_last['open time']), **{c: float(raw_last[c]) for c in cumulative}}
+    print(f"실시간 워밍업: {lookback_bars}봉 | 누적 피처 기준값: {cumulative or '없음'}")
     print(f"레이블 분포:\n{y.value_counts(normalize=True)}")
 
     # 4. Walk-Forward Split (순차 분리)
@@ -54,15 +89,25 @@ def train_xrp_xgboost_model_v4(symbol='XRPUSDT', use_optuna=False):
     
     print(f"훈련 데이터: {len(X_train)}건 | 테스트 데이터: {len(X_test)}건")
 
+    # 겹치는 배리어 구간의 평균 고유도 (use_uniqueness=True면 학습 가중치에 반영)
+    # 학습 구간 레이블만으로 계산: 테스트 구간 이벤트는 -1로 빼서 동시 레이블 수에 섞이지 않게 함
+    uniqueness = None
+    if use_uniqueness:
+        train_events = events.copy()
+        train_events.iloc[events.index.get_loc(X_test.index[0]):, train_events.columns.get_loc('label')] = -1
+        uniqueness = average_uniqueness(train_events).loc[X_train.index]
+
     # 5. 하이퍼파라미터 최적화 (Optuna)
     params = BEST_PARAMS_XRP
     if use_optuna:
         print("Optuna 하이퍼파라미터 최적화 수행 중...")
-        params = optimize_hyperparams(X_train, y_train, n_trials=30)
+        params = optimize_hyperparams(X_train, y_train, n_trials=30, study_prefix='XRPUSD_PERP',
+                                      last_bar=df['open time'].loc[X_train.index[-1]])
 
     # 6. 모델 학습 (PCA 포함된 통합 파이프라인 사용)
     print("XGBoost 모델 및 PCA 학습 중... (3번 전략: 숏 가중치 강화 적용)")
-    model, scaler, pca = train_model(X_train, y_train, params=params, use_pca=True, n_components=25, use_weight=True)
+    model, scaler, pca = train_model(X_train, y_train, params=params, use_pca=True, n_components=25, use_weight=True,
+                                     uniqueness=uniqueness)
     
     # 7. 평가
     # 테스트 데이터 전처리
@@ -84,6 +129,9 @@ def train_xrp_xgboost_model_v4(symbol='XRPUSDT', use_optuna=False):
         'scaler': scaler,
         'pca': pca,
         'features': features,
+        'stationarity': stationarity_plan,
+        'lookback_bars': lookback_bars,
+        'cumulative_anchor': cumulative_anchor,
         'params': BEST_PARAMS_XRP
     }
     joblib.dump(save_data, model_path)
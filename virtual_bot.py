@@ -18,6 +18,7 @@ from data_fetcher import fetch_historical_data
 from risk_manager import RiskManager
 from performance_tracker import PerformanceTracker
 from wfo_pipeline import WFOPipeline
+from binance_pool import report_stats as report_api_stats
 
 # 설정값 (절대 경로로 변경하여 안정성 확보)
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -129,7 +130,12 @@ def is_market_suitable(df_last):
         
     return True, "Market OK"
 
-def run_virtual_bot_cycle():
+def run_virtual_bot_cycle(current_price=None, live=None, signal=None):
+    """
+    봇 1회 사이클. current_price가 주어지면(스트리밍 모드의 마감 봉 종가) REST 가격 조회를 생략합니다.
+    live: 스트리밍 모드에서 1시간봉 마감마다 갱신하는 LiveFeatureEngine (예측은 이 엔진의 마지막 행 사용)
+    signal: 이미 계산한 get_switching_prediction 결과 (스트리밍 모드의 1분봉 사이클은 마지막 1시간봉 예측을 재사용)
+    """
     state = load_bot_state()
     # 모델 학습 데이터와 일치시키기 위해 XRPUSDT 사용
     symbol = 'XRPUSDT'
@@ -144,16 +150,17 @@ def run_virtual_bot_cycle():
         return "NO_REPLY" # [수정] 무조건 루프 중단
 
     # 현재가 확인
-    try:
-        data = fetch_historical_data('XRPUSDT', interval='1m', start_str='10 minutes ago UTC', klines_type=HistoricalKlinesType.SPOT)
-        if data.empty: return "⚠️ **[데이터 오류]** 가격 수집 실패"
-        current_price = data['Close'].iloc[-1]
-    except Exception as e:
-        return f"⚠️ **[데이터 오류]** {e}"
+    if current_price is None:
+        try:
+            data = fetch_historical_data('XRPUSDT', interval='1m', start_str='10 minutes ago UTC', klines_type=HistoricalKlinesType.SPOT)
+            if data.empty: return "⚠️ **[데이터 오류]** 가격 수집 실패"
+            current_price = data['Close'].iloc[-1]
+        except Exception as e:
+            return f"⚠️ **[데이터 오류]** {e}"
 
     # 1. AI 예측값 가져오기
     try:
-        prediction, probabilities, df_last = get_switching_prediction(symbol)
+        prediction, probabilities, df_last = signal if signal is not None else get_switching_prediction(symbol, live=live)
         if prediction is None:
             return "⚠️ **[AI 분석 오류]** 예측 실패"
             
@@ -277,6 +284,7 @@ def run_virtual_bot_cycle():
             print(f"- 승률: {perf['win_rate']:.2%}")
             print(f"- 손익비: {perf['profit_factor']:.2f}")
             print("="*40 + "\n")
+        report_api_stats()
 
     # AGENT TASK 7: 재학습 트리거 체크 (WFO 파이프라인)
     recent_acc = tracker.get_recent_accuracy(window=50)
@@ -291,10 +299,62 @@ def run_once():
     if msg != "NO_REPLY":
         print(msg)
 
+def run_streaming(ws_url=None):
+    """
+    웹소켓 스트리밍 모드: 1분봉/1시간봉 마감 이벤트를 받아 저장하고,
+    - 1시간봉 마감: 펀딩비를 붙여 LiveFeatureEngine에 반영(스냅샷 저장)하고 그 봉의 피처로 새로 예측한 뒤 사이클 실행
+    - 1분봉 마감: 마지막 1시간봉 예측을 재사용해 현재가로 사이클 실행 (손절/트레일링 체크, 60초 폴링 대기 없음)
+    피처 엔진은 시작 시 스냅샷에서 복원하므로 사이클마다 이력을 다시 받지 않습니다.
+    엔진은 매번 live_engine에서 가져오므로 사이클 안에서 재학습되면 새 모델 패키지 기준 엔진으로 바뀝니다.
+    """
+    from stream_ingest import KlineStreamer, FUTURES_WS_URL
+    from xrp_realtime_predictor import live_engine
+    from data_fetcher import add_funding_column
+
+    def started_engine():
+        live = live_engine('XRPUSDT')
+        if live.engine is None:
+            live.start() # 스냅샷 복원 + 꺼져 있던 동안의 1시간봉 따라잡기 (스냅샷이 없거나 기준이 바뀌었으면 콜드 스타트)
+        return live
+
+    latest = {'signal': get_switching_prediction('XRPUSDT', live=started_engine())} # 마지막 1시간봉 마감 기준 예측 (실패 시 None → 사이클에서 다시 예측)
+
+    def run_cycle(price):
+        live = started_engine()
+        msg = run_virtual_bot_cycle(current_price=price, live=live, signal=latest['signal'])
+        if live_engine('XRPUSDT') is not live: # 사이클 안에서 재학습됨 → 새 모델/엔진으로 다시 예측
+            latest['signal'] = get_switching_prediction('XRPUSDT', live=started_engine())
+        if msg != "NO_REPLY":
+            print(msg)
+
+    def on_hour_close(symbol, bar):
+        live = started_engine()
+        # 스트림 봉에는 펀딩비가 없으므로 학습 데이터(fetch_historical_data)와 같은 경로로 붙여서 반영
+        hour = add_funding_column(pd.DataFrame([bar]), symbol, '1h', int(bar['Open time'].value // 1_000_000))
+        if 'fundingRate' not in hour.columns:
+            print("⚠️ 펀딩비를 붙이지 못해 REST로 1시간봉을 다시 받아 반영합니다.")
+            live.refresh()
+        else:
+            live.on_bar(hour.iloc[0].to_dict())
+        latest['signal'] = get_switching_prediction(symbol, live=live)
+        run_cycle(bar['Close'])
+
+    def on_minute_close(symbol, bar):
+        run_cycle(bar['Close'])
+
+    streamer = KlineStreamer(['XRPUSDT'], intervals=['1m', '1h'], ws_url=ws_url or FUTURES_WS_URL,
+                             callbacks={'1h': on_hour_close, '1m': on_minute_close})
+    try:
+        streamer.run_forever()
+    except KeyboardInterrupt:
+        streamer.stop()
+
 if __name__ == "__main__":
     import sys
     if "--once" in sys.argv:
         run_once()
+    elif "--stream" in sys.argv:
+        run_streaming()
     else:
         while True:
             try:
@@ -6,6 +6,7 @@ from datetime import datetime, timedelta
 import plotly.express as px
 import plotly.graph_objects as go
 from dotenv import load_dotenv
+from binance_pool import get_session
 
 # [V7.2] AI 알고리즘 판단 정밀 반영 및 가상 계좌 그래프 추가
 st.set_page_config(page_title="클로이 AI 프리미엄 관제", layout="wide", page_icon="💎")
@@ -63,7 +64,7 @@ def load_simple_csv(path, date_col):
 
 def get_live_price():
     try:
-        r = requests.get("https://api.binance.com/api/v3/ticker/price?symbol=XRPUSDT", timeout=2)
+        r = get_session().get("https://api.binance.com/api/v3/ticker/price?symbol=XRPUSDT", timeout=2)
         return float(r.json()['price'])
     except: return 0.0
 
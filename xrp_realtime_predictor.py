@@ -8,47 +8,114 @@ from binance.enums import HistoricalKlinesType
 from dotenv import load_dotenv
 from data_fetcher import fetch_historical_data
 from analyzer import add_all_indicators
-from macro_fetcher import fetch_macro_data, merge_with_binance_data
+from streaming_features import LiveFeatureEngine
+from lookback import lookback_start_ms
 
 load_dotenv()
 
-def get_switching_prediction(symbol='XRPUSD_PERP'):
+# 심볼별 증분 피처 엔진 (프로세스당 1개, 첫 refresh/start 때 스냅샷 복원)
+_live_engines = {} # (symbol, interval) → (모델 파일 스탬프, LiveFeatureEngine)
+
+def model_path_for(symbol):
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(current_dir, f"model_{symbol}_xgboost.pkl")
+
+def _model_stamp(symbol):
+    """모델 파일 (mtime_ns, size). 재학습으로 패키지가 바뀌었는지 판단하는 데 사용 (파일이 없으면 None)"""
+    try:
+        st = os.stat(model_path_for(symbol))
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+def live_engine(symbol, interval='1h', package=None):
+    """
+    symbol의 LiveFeatureEngine (프로세스 안에서 공유, 모델 파일이 바뀌면 새로 만듦)
+    콜드 스타트 수집 구간과 누적 지표(OBV/NVI) 기준값은 학습 때 모델 패키지에 저장한 값을 사용
+    (lookback_bars가 없는 구형 패키지는 60일치). 새로 만든 엔진은 첫 refresh/on_bar에서 시작됨
+    """
+    key = (symbol, interval)
+    stamp = _model_stamp(symbol)
+    cached = _live_engines.get(key)
+    if cached is None or cached[0] != stamp:
+        if cached is not None:
+            print(f"ℹ️ [{symbol} {interval}] 모델 패키지가 바뀌어 피처 엔진을 새 lookback/누적 지표 기준으로 다시 만듭니다.")
+            package = None # 호출 측 패키지는 바뀌기 전에 읽었을 수 있음
+        if package is None:
+            path = model_path_for(symbol)
+            package = joblib.load(path) if os.path.exists(path) else {}
+        package = package if isinstance(package, dict) else {}
+        lookback_bars = package.get('lookback_bars')
+        anchor = package.get('cumulative_anchor')
+        warmup_start = '60 days ago UTC'
+        if lookback_bars:
+            warmup_start = lookback_start_ms(lookback_bars + 1, interval) # 진행 중인 봉 제외 lookback_bars개 마감 봉
+            if anchor is not None: # 누적 지표는 기준 봉부터 이어 계산
+                warmup_start = min(warmup_start, anchor['open_ms'])
+        _live_engines[key] = (stamp, LiveFeatureEngine(symbol, interval, warmup_start=warmup_start, anchor=anchor))
+    return _live_engines[key][1]
+
+def get_switching_prediction(symbol='XRPUSD_PERP', live=None):
     """
     XRP COIN-M 스위칭 전략용 실시간 AI 분석
+    live: 호출 측에서 갱신하는 LiveFeatureEngine (스트리밍 모드). 없으면 모듈의 엔진을 REST로 따라잡아 사용
     """
     print(f"\n--- {symbol} COIN-M 스위칭 AI 분석 시작 ---")
     
     # 모델 파일 경로 설정 (절대 경로로 변경하여 실행 위치에 상관없이 로드 가능하게 함)
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    model_path = os.path.join(current_dir, f"model_{symbol}_xgboost.pkl")
+    model_path = model_path_for(symbol)
     
     if not os.path.exists(model_path):
         print(f"❌ 모델 파일({model_path})이 없습니다.")
         return None
     
     model = joblib.load(model_path)
+    package = model
+    stationarity_plan = None
+    features = None
     # 모델 패키지 형식(dict)인 경우 처리
     if isinstance(model, dict):
         scaler = model.get('scaler')
         pca = model.get('pca')
         features = model.get('features')
+        stationarity_plan = model.get('stationarity')
         model = model.get('model')
     
-    # 1. 데이터 수집 (가이드 권장: 1시간봉 기준)
-    binance_data = fetch_historical_data(symbol, interval='1h', start_str='60 days ago UTC')
-    macro_data = fetch_macro_data(years=0.1)
-    
-    # 2. 지표 결합
-    from feature_engineering import build_features, ensure_stationarity
-    df = build_features(binance_data)
-    df = ensure_stationarity(df)
+    # 1. 피처 계산 (가이드 권장: 1시간봉 기준)
+    from feature_engineering import build_features, ensure_stationarity, apply_stationarity
+    if stationarity_plan is not None:
+        # 증분 피처 엔진의 최근 마감 봉 행만 사용 (매 사이클 build_features/긴 이력 재수집 없음)
+        # 스트리밍 모드는 봇이 1시간봉 마감마다 live를 갱신해 넘기고, 그 밖에는 마지막 반영 봉 이후만 받아 반영
+        if live is None:
+            live = live_engine(symbol, package=package)
+            live.refresh()
+        recent = live.frame()
+        if recent.empty:
+            print("❌ 피처 엔진에 반영된 봉이 없습니다.")
+            return None
+        # 학습 때 정한 변환 계획을 그대로 적용 (ADF 재검정 없음 → 학습/추론 피처 정의 일치, pct_change는 직전 행 기준)
+        df = apply_stationarity(recent, stationarity_plan)
+        if df.empty:
+            print("❌ 피처 엔진 워밍업이 끝나지 않아 예측할 행이 없습니다.")
+            return None
+        current_price = recent['close'].iloc[-1]
+    else:
+        # 변환 계획이 없는 구형 모델은 ADF를 다시 돌려야 하므로 기존처럼 60일치를 받아 전체 계산
+        binance_data = fetch_historical_data(symbol, interval='1h', start_str='60 days ago UTC')
+        # 모델이 쓰는 피처와 그 의존 지표만 계산 (피처 목록이 없는 구형 모델은 전체 계산)
+        df = build_features(binance_data, columns=features)
+        print("⚠️ 모델 패키지에 정상성 변환 계획이 없어 ADF 검정을 다시 수행합니다. (재학습 권장)")
+        df = ensure_stationarity(df)
+        current_price = binance_data['Close'].iloc[-1]
     
     # 모델 학습 시 사용한 피처 리스트 (train_xrp_v4.py의 로직과 일치)
     if 'features' not in locals() or features is None:
         exclude = ['open', 'high', 'low', 'close', 'volume', 'target', 'open time', 'close time', 'timestamp', 'fundingRate']
         features = [c for c in df.columns if c not in exclude]
     
-    current_data = df[features].tail(1)
+    # 학습과 같은 결측/무한대 처리 (스트림 봉에 없는 원본 컬럼은 0)
+    current_data = df.reindex(columns=features).tail(1)
+    current_data = current_data.apply(pd.to_numeric, errors='coerce').replace([np.inf, -np.inf], np.nan).fillna(0)
     
     # 전처리 적용
     if 'scaler' in locals() and scaler:
@@ -62,8 +129,6 @@ def get_switching_prediction(symbol='XRPUSD_PERP'):
     prediction = model.predict(current_data_scaled)[0]
     probabilities = model.predict_proba(current_data_scaled)[0]
     
-    current_price = binance_data['Close'].iloc[-1]
-    
     print("\n" + "="*45)
     print(f"🕵️  XRP 스위칭 전략 AI 리포트")
     print(f"⏰ 시각: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} (KST)")